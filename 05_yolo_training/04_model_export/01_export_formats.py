@@ -6,7 +6,7 @@
 - 将 PyTorch 模型导出为其他格式
 - ONNX (通用格式)
 - CoreML (Apple 设备优化)
-- Benchmark (性能基准测试)
+- Benchmark (性能基准测试，见 02_benchmark_formats.py)
 """
 
 from pathlib import Path
@@ -72,6 +72,8 @@ def main():
     | TFLite   | 'tflite'     | Android Edge     |
     | TensorRT | 'engine'     | Nvidia GPU 加速   |
     """)
+    
+    print("💡 各格式的速度 / 精度对比请运行: python 02_benchmark_formats.py")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,296 @@
+"""
+导出格式基准测试
+==============
+
+学习目标:
+- 把模型导出为本地可在 CPU 上运行的所有格式 (PyTorch / TorchScript / ONNX / OpenVINO)
+- 对比不同格式、输入尺寸 (imgsz)、批大小 (batch) 下的性能
+- 同时检查精度 (coco8 mAP)，选出"又快又准"的部署格式
+
+测量指标 (每个 格式 × imgsz 组合都在独立子进程中运行，互不干扰):
+- 预热后的 p50 / p95 延迟
+- batch 1 / 4 / 8 / 16 的吞吐量 (图像/秒，TorchScript 按固定 batch 导出，只测 batch 1)
+- 子进程峰值内存 (RSS)
+- coco8 验证集 mAP50 / mAP50-95
+
+结果保存为 outputs/benchmark/benchmark.json 和 benchmark.csv
+"""
+
+from pathlib import Path
+import csv
+import importlib.util
+import json
+import multiprocessing as mp
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from utils.image_loader import DATASETS_DIR, get_coco8_data_yaml
+
+
+# ==========================================
+# 基准测试配置
+# ==========================================
+
+MODEL_NAME = "yolo11n.pt"
+IMGSZ_LIST = [320, 480, 640]
+BATCH_SIZES = [1, 4, 8, 16]
+WARMUP_RUNS = 3
+TIMED_RUNS = 20
+
+# 允许的 mAP50-95 下降 (相对 PyTorch)，超过则不推荐该格式
+MAP_TOLERANCE = 0.01
+
+# 格式名 -> (export 参数 format, 依赖的 Python 包)
+FORMATS = {
+    "pytorch": (None, "torch"),
+    "torchscript": ("torchscript", "torch"),
+    "onnx": ("onnx", "onnxruntime"),
+    "openvino": ("openvino", "openvino"),
+}
+
+# Ultralytics 的 TorchScript 导出是按固定 batch (=1) trace 的，其它 batch 会报错，只测 batch 1
+FIXED_BATCH_FORMATS = {"torchscript"}
+
+OUTPUT_DIR = Path(__file__).parent / "outputs" / "benchmark"
+COCO8_DIR = DATASETS_DIR / "coco8"
+VAL_IMAGES_DIR = COCO8_DIR / "images" / "val"
+
+
+def available_formats() -> list:
+    """返回本地已安装依赖、可以在 CPU 上运行的格式"""
+    return [name for name, (_, package) in FORMATS.items() if importlib.util.find_spec(package) is not None]
+
+
+def export_model(fmt: str, imgsz: int) -> Path:
+    """
+    导出指定格式和输入尺寸的模型，并重命名为 <stem>_<imgsz> 避免互相覆盖
+
+    Returns:
+        导出文件 (或 OpenVINO 目录) 路径
+    """
+    from utils.model_loader import load_yolo_model, get_model_path
+
+    export_format, _ = FORMATS[fmt]
+    if export_format is None:
+        # PyTorch 原生格式不需要导出，imgsz 在推理时指定
+        load_yolo_model(MODEL_NAME)
+        return get_model_path(MODEL_NAME)
+
+    export_dir = OUTPUT_DIR / "exports"
+    export_dir.mkdir(parents=True, exist_ok=True)
+
+    # export 会把结果写在权重文件旁边: 先把权重复制到导出目录，避免覆盖 / 移走 models/yolo 下已有的导出文件
+    load_yolo_model(MODEL_NAME)
+    weights = export_dir / "weights" / MODEL_NAME
+    weights.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(get_model_path(MODEL_NAME), weights)
+
+    from ultralytics import YOLO
+
+    model = YOLO(str(weights))
+    # ONNX / OpenVINO 使用动态 batch；TorchScript 按 batch 1 trace (见 FIXED_BATCH_FORMATS)
+    dynamic = fmt in ("onnx", "openvino")
+    exported = Path(model.export(format=export_format, imgsz=imgsz, dynamic=dynamic, device="cpu"))
+
+    stem = Path(MODEL_NAME).stem
+    if exported.is_dir():
+        # Ultralytics 通过目录名后缀 "_openvino_model" 识别 OpenVINO 模型
+        target = export_dir / f"{stem}_{imgsz}_{fmt}_model"
+    else:
+        target = export_dir / f"{stem}_{imgsz}{exported.suffix}"
+
+    if target.exists():
+        shutil.rmtree(target) if target.is_dir() else target.unlink()
+    shutil.move(str(exported), str(target))
+    return target
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存 (MB)"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _benchmark_worker(fmt: str, model_path: str, imgsz: int, data_yaml: str) -> list:
+    """
+    子进程: 测量一个 格式 × imgsz 组合的延迟、吞吐、内存和 mAP
+
+    Returns:
+        每个 batch 大小一行结果
+    """
+    import cv2
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task="detect")
+    images = [cv2.imread(str(p)) for p in sorted(VAL_IMAGES_DIR.glob("*.jpg"))]
+
+    rows = []
+    batch_sizes = [1] if fmt in FIXED_BATCH_FORMATS else BATCH_SIZES
+    for batch in batch_sizes:
+        frames = [images[i % len(images)] for i in range(batch)]
+        kwargs = {"imgsz": imgsz, "device": "cpu", "verbose": False}
+
+        try:
+            for _ in range(WARMUP_RUNS):
+                model.predict(frames, **kwargs)
+
+            latencies = []
+            for _ in range(TIMED_RUNS):
+                t0 = time.perf_counter()
+                model.predict(frames, **kwargs)
+                latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            rows.append({"format": fmt, "imgsz": imgsz, "batch": batch, "error": str(e)})
+            continue
+
+        latencies = np.array(latencies) * 1000
+        rows.append({
+            "format": fmt,
+            "imgsz": imgsz,
+            "batch": batch,
+            "latency_p50_ms": float(np.percentile(latencies, 50)),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+            "throughput_fps": float(batch * 1000 / latencies.mean()),
+        })
+
+    # 精度: coco8 验证集 mAP (与 batch 无关，每个组合只测一次)
+    try:
+        metrics = model.val(data=data_yaml, imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False)
+        map50, map50_95 = float(metrics.box.map50), float(metrics.box.map)
+    except Exception as e:
+        print(f"  ⚠️ {fmt}@{imgsz} 验证失败: {e}")
+        map50, map50_95 = None, None
+
+    size_path = Path(model_path)
+    if size_path.is_dir():
+        size_mb = sum(f.stat().st_size for f in size_path.rglob("*") if f.is_file()) / 1024 / 1024
+    else:
+        size_mb = size_path.stat().st_size / 1024 / 1024
+
+    peak_rss = _peak_rss_mb()
+    for row in rows:
+        row.update({"peak_rss_mb": peak_rss, "map50": map50, "map50_95": map50_95, "size_mb": size_mb})
+    return rows
+
+
+def run_benchmark(formats: list = None, imgsz_list: list = None) -> list:
+    """
+    运行完整的 格式 × imgsz × batch 矩阵
+
+    Returns:
+        结果行列表
+    """
+    formats = formats or available_formats()
+    imgsz_list = imgsz_list or IMGSZ_LIST
+    data_yaml = get_coco8_data_yaml(OUTPUT_DIR)
+
+    # spawn: 每个组合使用全新的解释器，峰值内存互不影响
+    ctx = mp.get_context("spawn")
+    results = []
+
+    for fmt in formats:
+        for imgsz in imgsz_list:
+            print(f"\n🔄 {fmt} @ imgsz={imgsz}")
+            try:
+                model_path = export_model(fmt, imgsz)
+            except Exception as e:
+                print(f"  ❌ 导出失败: {e}")
+                results.append({"format": fmt, "imgsz": imgsz, "error": f"export: {e}"})
+                continue
+
+            with ctx.Pool(processes=1) as pool:
+                rows = pool.apply(_benchmark_worker, (fmt, str(model_path), imgsz, str(data_yaml)))
+
+            for row in rows:
+                if "error" in row:
+                    print(f"  batch={row['batch']:>2}  ❌ {row['error']}")
+                else:
+                    print(
+                        f"  batch={row['batch']:>2}  p50={row['latency_p50_ms']:7.1f}ms  "
+                        f"p95={row['latency_p95_ms']:7.1f}ms  {row['throughput_fps']:6.1f} img/s"
+                    )
+            results.extend(rows)
+
+    return results
+
+
+def save_report(results: list) -> tuple:
+    """保存 JSON 和 CSV 报告"""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    json_path = OUTPUT_DIR / "benchmark.json"
+    csv_path = OUTPUT_DIR / "benchmark.csv"
+
+    json_path.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    fields = [
+        "format", "imgsz", "batch", "latency_p50_ms", "latency_p95_ms", "throughput_fps",
+        "peak_rss_mb", "size_mb", "map50", "map50_95", "error",
+    ]
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+    return json_path, csv_path
+
+
+def recommend(results: list, tolerance: float = MAP_TOLERANCE) -> dict:
+    """
+    为每个 imgsz 选出 batch=1 延迟最低、且 mAP 下降不超过 tolerance 的格式
+
+    Returns:
+        {imgsz: 结果行}
+    """
+    picks = {}
+    for imgsz in sorted({r["imgsz"] for r in results}):
+        rows = [r for r in results if r["imgsz"] == imgsz and r.get("batch") == 1 and "error" not in r]
+        baseline = next((r for r in rows if r["format"] == "pytorch" and r["map50_95"] is not None), None)
+
+        candidates = [
+            r for r in rows
+            if baseline is None or (r["map50_95"] is not None and baseline["map50_95"] - r["map50_95"] <= tolerance)
+        ]
+        if candidates:
+            picks[imgsz] = min(candidates, key=lambda r: r["latency_p50_ms"])
+    return picks
+
+
+def main():
+    print("=" * 60)
+    print("📊 导出格式基准测试")
+    print("=" * 60)
+
+    formats = available_formats()
+    print(f"\n🧰 本地可用格式: {', '.join(formats)}")
+    skipped = [name for name in FORMATS if name not in formats]
+    if skipped:
+        print(f"   跳过 (未安装依赖): {', '.join(skipped)}")
+    print(f"📐 imgsz: {IMGSZ_LIST}   batch: {BATCH_SIZES} ({', '.join(sorted(FIXED_BATCH_FORMATS))} 只测 batch 1)")
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    results = run_benchmark(formats)
+    json_path, csv_path = save_report(results)
+
+    print("\n🏆 推荐格式 (batch=1 延迟最低，且 mAP50-95 下降 ≤ "
+          f"{MAP_TOLERANCE}):")
+    for imgsz, row in recommend(results).items():
+        print(
+            f"  imgsz={imgsz}: {row['format']:<12} p50={row['latency_p50_ms']:.1f}ms  "
+            f"mAP50-95={row['map50_95']}  RSS={row['peak_rss_mb']:.0f}MB"
+        )
+
+    print(f"\n💾 报告已保存:")
+    print(f"  {json_path}")
+    print(f"  {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
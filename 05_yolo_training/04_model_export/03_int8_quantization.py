@@ -0,0 +1,259 @@
+"""
+INT8 训练后量化 (PTQ)
+===================
+
+学习目标:
+- 使用 coco8 训练图像做校准，生成静态 INT8 ONNX 模型
+- 在 coco8 验证集上对比 FP32 / INT8 的精度 (mAP)
+- 统计加速比和模型体积变化
+- 精度下降超过阈值时拒绝发布量化模型
+
+流程:
+FP32 ONNX → 预处理 (shape inference) → 静态量化 (QDQ, 校准) → 精度 / 速度对比 → 发布到 models/yolo/
+
+依赖: pip install onnx onnxruntime
+"""
+
+from pathlib import Path
+import json
+import re
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from utils.image_loader import DATASETS_DIR, get_coco8_data_yaml
+from utils.onnx_backend import OnnxDetector, preprocess, MODELS_DIR
+
+try:
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    HAS_ORT_QUANT = True
+except ImportError:
+    HAS_ORT_QUANT = False
+    CalibrationDataReader = object
+
+
+# ==========================================
+# 量化配置
+# ==========================================
+
+MODEL_NAME = "yolo11n.pt"
+IMGSZ = 640
+
+# 允许的 mAP50-95 最大下降，超过则不发布
+MAX_MAP_DROP = 0.02
+
+# 检测头的解码部分 (DFL、sigmoid、坐标计算) 对量化非常敏感，保持 FP32
+EXCLUDE_HEAD_DECODE = True
+
+CALIB_IMAGES_DIR = DATASETS_DIR / "coco8" / "images" / "train"
+VAL_IMAGES_DIR = DATASETS_DIR / "coco8" / "images" / "val"
+OUTPUT_DIR = Path(__file__).parent / "outputs" / "quantization"
+
+TIMED_RUNS = 20
+
+
+class Coco8CalibrationReader(CalibrationDataReader):
+    """用 coco8 训练图像 (与推理相同的 letterbox 预处理) 提供校准数据"""
+
+    def __init__(self, image_dir: Path, input_name: str, imgsz: int):
+        self.input_name = input_name
+        self.imgsz = (imgsz, imgsz)
+        self.image_paths = sorted(image_dir.glob("*.jpg"))
+        self._iter = iter(self.image_paths)
+
+    def get_next(self):
+        path = next(self._iter, None)
+        if path is None:
+            return None
+        tensor, _ = preprocess([cv2.imread(str(path))], self.imgsz)
+        return {self.input_name: tensor}
+
+    def rewind(self):
+        self._iter = iter(self.image_paths)
+
+
+def export_fp32(imgsz: int = IMGSZ) -> Path:
+    """导出静态输入尺寸的 FP32 ONNX 模型"""
+    from ultralytics import YOLO
+    from utils.model_loader import load_yolo_model, get_model_path
+
+    # export 会把结果写在权重文件旁边: 从 OUTPUT_DIR 中的权重副本导出，不覆盖 models/yolo 下已有的 ONNX
+    load_yolo_model(MODEL_NAME)
+    weights = OUTPUT_DIR / "weights" / MODEL_NAME
+    weights.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(get_model_path(MODEL_NAME), weights)
+    exported = Path(YOLO(str(weights)).export(format="onnx", imgsz=imgsz, simplify=True, device="cpu"))
+
+    fp32_path = OUTPUT_DIR / f"{Path(MODEL_NAME).stem}_fp32.onnx"
+    shutil.move(str(exported), str(fp32_path))
+    return fp32_path
+
+
+def head_decode_nodes(model_path: Path) -> list:
+    """
+    找出检测头 (最后一个 /model.N/ 模块) 中负责解码的节点: 除卷积以外的节点，
+    以及 DFL 的投影卷积 (/model.N/dfl/conv，把分布积分成距离)
+    这些节点负责把特征解码成像素坐标，量化为 uint8 会严重损失精度
+    """
+    model = onnx.load(str(model_path))
+    pattern = re.compile(r"/model\.(\d+)/")
+    indices = [int(m.group(1)) for node in model.graph.node if (m := pattern.search(node.name))]
+    if not indices:
+        return []
+
+    head_prefix = f"/model.{max(indices)}/"
+    return [
+        node.name for node in model.graph.node
+        if node.name.startswith(head_prefix)
+        and (node.op_type not in ("Conv", "MatMul") or "/dfl/" in node.name)
+    ]
+
+
+def quantize_int8(fp32_path: Path, imgsz: int = IMGSZ) -> Path:
+    """
+    静态 INT8 量化 (QDQ 格式，权重按通道量化)
+
+    Returns:
+        INT8 模型路径
+    """
+    prep_path = fp32_path.with_name(fp32_path.stem + "_prep.onnx")
+    int8_path = fp32_path.with_name(fp32_path.stem.replace("_fp32", "") + "_int8.onnx")
+
+    # 量化前先做 shape inference / 图优化，量化效果更稳定
+    quant_pre_process(str(fp32_path), str(prep_path))
+
+    input_name = onnx.load(str(prep_path)).graph.input[0].name
+    reader = Coco8CalibrationReader(CALIB_IMAGES_DIR, input_name, imgsz)
+    exclude = head_decode_nodes(prep_path) if EXCLUDE_HEAD_DECODE else []
+    print(f"  校准图像: {len(reader.image_paths)} 张，保持 FP32 的检测头节点: {len(exclude)} 个")
+
+    quantize_static(
+        str(prep_path),
+        str(int8_path),
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=exclude,
+    )
+
+    # 保留 Ultralytics 写入的元数据 (names / imgsz / task)，推理和验证都依赖它
+    fp32_model = onnx.load(str(fp32_path))
+    int8_model = onnx.load(str(int8_path))
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, str(int8_path))
+
+    prep_path.unlink(missing_ok=True)
+    return int8_path
+
+
+def evaluate_map(model_path: Path, data_yaml: Path, imgsz: int = IMGSZ) -> tuple:
+    """在 coco8 验证集上计算 (mAP50, mAP50-95)"""
+    from ultralytics import YOLO
+
+    model = YOLO(str(model_path), task="detect")
+    metrics = model.val(data=str(data_yaml), imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False)
+    return float(metrics.box.map50), float(metrics.box.map)
+
+
+def measure_latency(model_path: Path, runs: int = TIMED_RUNS) -> float:
+    """ONNX Runtime CPU 推理的中位延迟 (ms，仅模型前向部分)"""
+    detector = OnnxDetector(model_path)
+    images = [cv2.imread(str(p)) for p in sorted(VAL_IMAGES_DIR.glob("*.jpg"))]
+    tensor, _ = preprocess(images[:1], detector.imgsz)
+    feed = {detector.input_name: tensor}
+
+    for _ in range(3):
+        detector.session.run(None, feed)
+
+    latencies = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        detector.session.run(None, feed)
+        latencies.append(time.perf_counter() - t0)
+    return float(np.median(latencies) * 1000)
+
+
+def main():
+    print("=" * 60)
+    print("🗜️ INT8 训练后量化")
+    print("=" * 60)
+
+    if not HAS_ORT_QUANT:
+        print("❌ 需要安装量化依赖: pip install onnx onnxruntime")
+        return
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    data_yaml = get_coco8_data_yaml(OUTPUT_DIR)
+
+    # 1. FP32 导出
+    print("\n📤 导出 FP32 ONNX...")
+    fp32_path = export_fp32()
+    print(f"  ✅ {fp32_path}")
+
+    # 2. 静态量化
+    print("\n🗜️ 静态 INT8 量化 (coco8/train 校准)...")
+    int8_path = quantize_int8(fp32_path)
+    print(f"  ✅ {int8_path}")
+
+    # 3. 精度 / 速度 / 体积对比
+    print("\n📏 精度对比 (coco8/val)...")
+    fp32_map50, fp32_map = evaluate_map(fp32_path, data_yaml)
+    int8_map50, int8_map = evaluate_map(int8_path, data_yaml)
+
+    print("\n⏱️ 速度对比 (ONNX Runtime CPU, batch=1)...")
+    fp32_ms = measure_latency(fp32_path)
+    int8_ms = measure_latency(int8_path)
+
+    fp32_mb = fp32_path.stat().st_size / 1024 / 1024
+    int8_mb = int8_path.stat().st_size / 1024 / 1024
+    map_drop = fp32_map - int8_map
+
+    report = {
+        "imgsz": IMGSZ,
+        "fp32": {"path": str(fp32_path), "size_mb": fp32_mb, "latency_ms": fp32_ms, "map50": fp32_map50, "map50_95": fp32_map},
+        "int8": {"path": str(int8_path), "size_mb": int8_mb, "latency_ms": int8_ms, "map50": int8_map50, "map50_95": int8_map},
+        "speedup": fp32_ms / int8_ms,
+        "size_reduction": 1 - int8_mb / fp32_mb,
+        "map50_95_drop": map_drop,
+        "max_map_drop": MAX_MAP_DROP,
+        "published": map_drop <= MAX_MAP_DROP,
+    }
+
+    print(f"\n{'':<8}{'体积':>10}{'延迟':>12}{'mAP50':>10}{'mAP50-95':>10}")
+    print(f"{'FP32':<8}{fp32_mb:>8.1f}MB{fp32_ms:>10.1f}ms{fp32_map50:>10.3f}{fp32_map:>10.3f}")
+    print(f"{'INT8':<8}{int8_mb:>8.1f}MB{int8_ms:>10.1f}ms{int8_map50:>10.3f}{int8_map:>10.3f}")
+    print(f"\n  加速比: {report['speedup']:.2f}x")
+    print(f"  体积减少: {report['size_reduction']:.1%}")
+    print(f"  mAP50-95 变化: {-map_drop:+.4f} (允许下降 ≤ {MAX_MAP_DROP})")
+
+    report_path = OUTPUT_DIR / "quantization_report.json"
+    report_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n💾 报告: {report_path}")
+
+    # 4. 发布 (精度达标才复制到 models/yolo/)
+    if not report["published"]:
+        print(f"\n❌ 精度下降 {map_drop:.4f} 超过阈值 {MAX_MAP_DROP}，拒绝发布 INT8 模型")
+        print(f"  量化结果仅保留在: {int8_path}")
+        sys.exit(1)
+
+    publish_path = MODELS_DIR / int8_path.name
+    shutil.copy2(int8_path, publish_path)
+    print(f"\n✅ INT8 模型已发布: {publish_path}")
+    print(f"  使用: load_onnx_detector('{publish_path.name}')")
+
+
+if __name__ == "__main__":
+    main()
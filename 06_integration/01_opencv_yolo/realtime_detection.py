@@ -6,26 +6,46 @@ OpenCV + YOLO 实时检测 (macOS 版)
 - 结合 OpenCV 视频捕获和 YOLO 检测
 - 实现实时目标检测
 - 自定义可视化效果
+- 最新帧优先采集: 推理慢于摄像头时丢弃旧帧，避免延迟累积
+- 分阶段延迟统计: 采集 / 预处理 / 推理 / 后处理 / 绘制 / 显示的 p50 / p95 / p99
+- 无界面模式: 没有显示环境的服务器上通过 MJPEG HTTP 推流，在浏览器中查看
 
 macOS 说明:
 - 首次运行会请求摄像头权限
 - Apple Silicon 使用 MPS 加速
+
+推理后端:
+- "pytorch": Ultralytics YOLO (默认)
+- "onnx": ONNX Runtime (CPU，不导入 torch)，需先运行 01_export_formats.py 导出 yolo11n.onnx
 """
 
 import cv2
 import numpy as np
-import torch
 import time
 import sys
 from pathlib import Path
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from utils.model_loader import load_yolo_model
+from utils.capture import LatestFrameCapture
+from utils.detections import to_detections
+from utils.latency import LatencyTracker, print_latency_stats
+from utils.mjpeg_server import MjpegServer
+
+# 推理后端: "pytorch" 或 "onnx"
+BACKEND = "pytorch"
+ONNX_MODEL = "yolo11n.onnx"
+
+# 无界面模式: 不调用 cv2.imshow，改为在 http://MJPEG_HOST:MJPEG_PORT/ 推流 (Ctrl+C 退出)
+HEADLESS = False
+MJPEG_HOST = "127.0.0.1"  # "0.0.0.0" 允许局域网访问
+MJPEG_PORT = 8080
 
 
 def get_device():
     """获取最佳可用设备 (macOS 优化)"""
+    import torch
+
     if torch.backends.mps.is_available():
         return "mps"
     elif torch.cuda.is_available():
@@ -34,20 +54,34 @@ def get_device():
         return "cpu"
 
 
+def load_detector(backend: str = BACKEND):
+    """
+    按后端加载检测模型
+
+    Returns:
+        (模型, 设备)
+    """
+    if backend == "onnx":
+        from utils.onnx_backend import load_onnx_detector
+        return load_onnx_detector(ONNX_MODEL), "cpu"
+
+    from utils.model_loader import load_yolo_model
+    # 加载模型 (优先从本地 models/yolo/ 目录加载)
+    # 选择较小的模型以保证速度
+    return load_yolo_model("yolo11n.pt"), get_device()
+
+
 def main():
     print("=" * 60)
     print("🎥 实时目标检测 (macOS)")
     print("=" * 60)
     
-    # 检测设备
-    device = get_device()
+    # 加载模型并检测设备
+    model, device = load_detector(BACKEND)
     device_names = {"mps": "Apple Silicon GPU", "cpu": "CPU", "0": "NVIDIA GPU"}
+    print(f"🧠 推理后端: {BACKEND}")
     print(f"💻 使用设备: {device_names.get(device, device)}")
     
-    # 加载模型 (优先从本地 models/yolo/ 目录加载)
-    # 选择较小的模型以保证速度
-    model = load_yolo_model("yolo11n.pt")
-    
     # ==========================================
     # 1. 初始化视频捕获
     # ==========================================
@@ -57,9 +91,10 @@ def main():
     print("\n📷 正在访问摄像头...")
     print("   如果弹出权限请求，请点击'允许'")
     
-    cap = cv2.VideoCapture(0)
+    # 后台线程采集，只保留最新一帧 (分辨率需在采集线程启动前设置，降低分辨率可提高帧率)
+    cap = LatestFrameCapture(0, width=640, height=480)
     
-    # 如果没有摄像头，使用视频文件
+    # 如果没有摄像头，使用视频文件 (离线处理不需要丢帧，直接用 cv2.VideoCapture)
     # cap = cv2.VideoCapture("path/to/video.mp4")
     
     if not cap.isOpened():
@@ -70,92 +105,149 @@ def main():
         print("   3. 或修改代码使用视频文件")
         return
     
-    # 设置分辨率 (降低分辨率可提高帧率)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    
     print("✅ 摄像头已打开")
     
     # ==========================================
     # 2. 主循环
     # ==========================================
     
-    print("\n🎬 按 'q' 退出")
-    print("   按 's' 截图")
-    print("   按 'p' 暂停/继续")
+    server = None
+    if HEADLESS:
+        server = MjpegServer(MJPEG_HOST, MJPEG_PORT, title="YOLO Realtime Detection").start()
+        print(f"\n🌐 无界面模式，在浏览器中打开: {server.url}")
+        print("   按 Ctrl+C 退出")
+    else:
+        print("\n🎬 按 'q' 退出")
+        print("   按 's' 截图")
+        print("   按 'p' 暂停/继续")
+        print("   按 'l' 显示/隐藏延迟统计")
     
     paused = False
     frame_count = 0
     fps_start_time = time.time()
     fps = 0
     
-    while True:
-        if not paused:
-            ret, frame = cap.read()
-            if not ret:
-                print("❌ 无法读取帧")
-                break
+    # 分阶段延迟统计 (退出时写入 outputs/latency_stats.json)
+    latency = LatencyTracker()
+    show_latency = True
+    
+    try:
+        while True:
+            if not paused:
+                ret, frame, capture_time = cap.read_latest()
+                if not ret:
+                    if cap.ended:
+                        print("❌ 无法读取帧")
+                        break
+                    continue  # 摄像头启动慢 / 短暂卡顿: 超时后继续等待
+                latency.start_frame(capture_time)
+                
+                # 运行 YOLO 检测 (使用最佳设备)
+                results = model(frame, verbose=False, device=device)
+                result = results[0]
+                latency.add_speed(result.speed)
+                
+                # ==========================================
+                # 3. 自定义可视化
+                # ==========================================
+                
+                with latency.stage("draw"):
+                    annotated_frame = custom_visualization(frame, result, model.names)
+                
+                # 计算 FPS
+                frame_count += 1
+                if frame_count % 30 == 0:
+                    fps = 30 / (time.time() - fps_start_time)
+                    fps_start_time = time.time()
+                
+                # 显示 FPS
+                cv2.putText(
+                    annotated_frame, 
+                    f"FPS: {fps:.1f}", 
+                    (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 
+                    1, (0, 255, 0), 2
+                )
+                
+                # 显示检测数量
+                num_detections = len(result.boxes)
+                cv2.putText(
+                    annotated_frame, 
+                    f"Detections: {num_detections}", 
+                    (10, 70),
+                    cv2.FONT_HERSHEY_SIMPLEX, 
+                    1, (0, 255, 0), 2
+                )
+                
+                # 显示丢帧数和 采集 → 显示 延迟
+                capture_stats = cap.stats()
+                cv2.putText(
+                    annotated_frame, 
+                    f"Dropped: {capture_stats['dropped']}  Latency: {capture_stats['latency_ms']:.0f}ms", 
+                    (10, 110),
+                    cv2.FONT_HERSHEY_SIMPLEX, 
+                    0.7, (0, 255, 255), 2
+                )
+                
+                if show_latency:
+                    latency.draw_overlay(annotated_frame, origin=(10, 150))
             
-            # 运行 YOLO 检测 (使用最佳设备)
-            results = model(frame, verbose=False, device=device)
-            result = results[0]
+            display_start = time.perf_counter()
+            if server is not None:
+                # 无界面模式: 编码一次后推送给所有浏览器客户端
+                server.publish(annotated_frame)
+            else:
+                # macOS: 使用 WINDOW_NORMAL 可以调整窗口大小
+                cv2.namedWindow("YOLO Realtime Detection", cv2.WINDOW_NORMAL)
+                cv2.imshow("YOLO Realtime Detection", annotated_frame)
             
             # ==========================================
-            # 3. 自定义可视化
+            # 4. 键盘控制
             # ==========================================
             
-            annotated_frame = custom_visualization(frame, result, model.names)
-            
-            # 计算 FPS
-            frame_count += 1
-            if frame_count % 30 == 0:
-                fps = 30 / (time.time() - fps_start_time)
-                fps_start_time = time.time()
+            key = cv2.waitKey(1) & 0xFF if server is None else 0xFF
+            if not paused:
+                # imshow 的实际绘制发生在 waitKey 中，两者一起计为显示耗时
+                latency.add("display", time.perf_counter() - display_start)
+                latency.end_frame()
+                cap.record_display(capture_time)
             
-            # 显示 FPS
-            cv2.putText(
-                annotated_frame, 
-                f"FPS: {fps:.1f}", 
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                1, (0, 255, 0), 2
-            )
-            
-            # 显示检测数量
-            num_detections = len(result.boxes)
-            cv2.putText(
-                annotated_frame, 
-                f"Detections: {num_detections}", 
-                (10, 70),
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                1, (0, 255, 0), 2
-            )
-        
-        # macOS: 使用 WINDOW_NORMAL 可以调整窗口大小
-        cv2.namedWindow("YOLO Realtime Detection", cv2.WINDOW_NORMAL)
-        cv2.imshow("YOLO Realtime Detection", annotated_frame)
-        
-        # ==========================================
-        # 4. 键盘控制
-        # ==========================================
-        
-        key = cv2.waitKey(1) & 0xFF
-        
-        if key == ord('q'):
-            break
-        elif key == ord('s'):
-            # 截图
-            screenshot_path = f"screenshot_{int(time.time())}.jpg"
-            cv2.imwrite(screenshot_path, annotated_frame)
-            print(f"📸 截图保存: {screenshot_path}")
-        elif key == ord('p'):
-            paused = not paused
-            print("⏸️ 暂停" if paused else "▶️ 继续")
+            if key == ord('q'):
+                break
+            elif key == ord('s'):
+                # 截图
+                screenshot_path = f"screenshot_{int(time.time())}.jpg"
+                cv2.imwrite(screenshot_path, annotated_frame)
+                print(f"📸 截图保存: {screenshot_path}")
+            elif key == ord('p'):
+                paused = not paused
+                print("⏸️ 暂停" if paused else "▶️ 继续")
+            elif key == ord('l'):
+                show_latency = not show_latency
+    except KeyboardInterrupt:
+        print("\n🛑 用户中断")
     
     # 清理
+    capture_stats = cap.stats()
     cap.release()
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # macOS 需要额外的 waitKey 来完全关闭窗口
+    if server is not None:
+        server.stop()
+        stream_stats = server.stats()
+        print(f"\n🌐 推流统计: 编码 {stream_stats['encoded']} 帧，发送 {stream_stats['sent']} 帧，"
+              f"慢客户端跳过 {stream_stats['dropped']} 帧")
+    else:
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)  # macOS 需要额外的 waitKey 来完全关闭窗口
+    
+    print(f"\n📊 采集统计:")
+    print(f"  采集帧数: {capture_stats['captured']}，处理帧数: {capture_stats['consumed']}")
+    print(f"  丢弃旧帧: {capture_stats['dropped']} ({capture_stats['drop_ratio']:.1%})")
+    print(f"  采集 → 显示延迟: 平均 {capture_stats['latency_ms']:.1f}ms，p95 {capture_stats['latency_p95_ms']:.1f}ms")
+    
+    if latency.frames:
+        print_latency_stats(latency.summary())
+        latency_path = latency.dump_json(Path(__file__).parent / "outputs" / "latency_stats.json")
+        print(f"  已保存: {latency_path}")
     print("\n👋 检测结束")
 
 
@@ -172,7 +264,10 @@ def custom_visualization(frame: np.ndarray, result, class_names: dict) -> np.nda
         带标注的帧
     """
     annotated = frame.copy()
-    boxes = result.boxes
+    # 一次性转换为 numpy，循环中不再逐个访问张量
+    det = to_detections(result)
+    boxes_int = det.xyxy.astype(int).tolist()
+    centers = det.centers.astype(int).tolist()
     
     # 为不同类别定义颜色
     colors = {
@@ -183,11 +278,7 @@ def custom_visualization(frame: np.ndarray, result, class_names: dict) -> np.nda
     }
     default_color = (128, 128, 128)
     
-    for box in boxes:
-        # 获取信息
-        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-        conf = box.conf[0].item()
-        cls_id = int(box.cls[0].item())
+    for (x1, y1, x2, y2), (cx, cy), conf, cls_id in zip(boxes_int, centers, det.conf.tolist(), det.cls.tolist()):
         cls_name = class_names[cls_id]
         
         # 选择颜色
@@ -218,7 +309,6 @@ def custom_visualization(frame: np.ndarray, result, class_names: dict) -> np.nda
         )
         
         # 可选: 绘制中心点
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
         cv2.circle(annotated, (cx, cy), 4, color, -1)
     
     return annotated
@@ -6,6 +6,10 @@
 - 打开并读取摄像头视频流
 - 实现实时推理循环
 - 性能优化技巧 (跳帧、分辨率调整)
+- 自适应跳帧: 根据目标帧率和实测推理耗时自动选择跳帧数 / 输入尺寸
+- 运动补偿: 跳过的帧上用光流把检测框推算到当前位置，避免框"拖影"
+- 分阶段延迟统计: 定位瓶颈在采集、推理还是绘制 / 显示
+- 无界面模式: 通过 MJPEG HTTP 推流，在浏览器中查看
 """
 
 from pathlib import Path
@@ -16,6 +20,21 @@ import sys
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from utils.model_loader import load_yolo_model
+from utils.adaptive_skip import AdaptiveSkipController
+from utils.box_propagation import BoxPropagator, shift_result
+from utils.detections import to_detections
+from utils.latency import LatencyTracker, print_latency_stats
+from utils.mjpeg_server import MjpegServer
+
+# 目标显示帧率 (控制器据此决定跳帧数和输入尺寸)
+TARGET_FPS = 30
+
+# 跳帧时的检测框运动补偿: "flow" (LK 光流)、"velocity" (匀速预测) 或 None (直接复用旧结果)
+PROPAGATION = "flow"
+
+# 无界面模式: 不调用 cv2.imshow，改为在 http://127.0.0.1:MJPEG_PORT/ 推流 (Ctrl+C 退出)
+HEADLESS = False
+MJPEG_PORT = 8080
 
 
 def main():
@@ -38,21 +57,40 @@ def main():
         return
         
     print(f"✅ 摄像头已打开")
-    print("  按 'q' 键退出...")
-    print("  按 's' 键保存截图...")
+    server = None
+    if HEADLESS:
+        server = MjpegServer(port=MJPEG_PORT, title="YOLO Real-time Detection").start()
+        print(f"  🌐 无界面模式，在浏览器中打开: {server.url}")
+        print("  按 Ctrl+C 退出...")
+    else:
+        print("  按 'q' 键退出...")
+        print("  按 's' 键保存截图...")
+        print("  按 'l' 键显示/隐藏延迟统计...")
     
     # 3. 性能参数
     prev_time = 0
     fps_history = []
-    skip_frames = 2  # 每隔 N 帧处理一次 (优化性能)
     frame_count = 0
     
+    # 自适应跳帧: 繁忙场景多推理、空闲场景多跳帧、CPU 饱和时退让
+    # 决策日志写入 outputs/skip_controller.jsonl，便于按摄像头调参
+    output_dir = Path(__file__).parent / "outputs"
+    output_dir.mkdir(exist_ok=True)
+    controller = AdaptiveSkipController(target_fps=TARGET_FPS, log_path=output_dir / "skip_controller.jsonl")
+    
     # 存储上一帧的检测结果，用于跳帧时的平滑显示
     last_results = None
+    propagator = BoxPropagator(method=PROPAGATION) if PROPAGATION else None
+    
+    # 分阶段延迟: capture / preprocess / inference / postprocess / propagate / draw / display / total
+    latency = LatencyTracker()
+    show_latency = False
     
     try:
         while True:
-            ret, frame = cap.read()
+            latency.start_frame()
+            with latency.stage("capture"):
+                ret, frame = cap.read()
             if not ret:
                 print("❌ 无法读取视频帧")
                 break
@@ -63,17 +101,32 @@ def main():
             frame = cv2.flip(frame, 1)
             
             # --- 推理逻辑 ---
-            # 仅在非跳过帧时进行推理
-            if frame_count % (skip_frames + 1) == 0:
-                results = model(frame, verbose=False)
+            # 由控制器决定当前帧是否推理 (以及输入尺寸)
+            inferred = controller.should_infer()
+            if inferred:
+                infer_start = time.perf_counter()
+                results = model(frame, verbose=False, imgsz=controller.imgsz)
                 last_results = results[0]
+                controller.update(time.perf_counter() - infer_start, len(last_results.boxes))
+                latency.add_speed(last_results.speed)
+                if propagator is not None:
+                    # 一次设备拷贝得到 numpy 数组
+                    det = to_detections(last_results)
+                    propagator.reset(frame, det.xyxy, det.cls)
             
             # --- 绘制逻辑 ---
             annotated_frame = frame.copy()
             
-            if last_results:
+            if last_results and not inferred and propagator is not None:
+                # 把上一次的检测框推算到当前帧，画在当前帧上
+                with latency.stage("propagate"):
+                    propagated = shift_result(last_results, propagator.propagate(frame))
+                with latency.stage("draw"):
+                    annotated_frame = propagated.plot(img=frame)
+            elif last_results:
                 # 使用 YOLO 自带的 plot 绘制，或参考 01_cv2_yolo_basic.py 手动绘制
-                annotated_frame = last_results.plot()
+                with latency.stage("draw"):
+                    annotated_frame = last_results.plot()
             
             # --- 计算 FPS ---
             curr_time = time.time()
@@ -90,15 +143,26 @@ def main():
             cv2.putText(annotated_frame, f"FPS: {avg_fps:.1f}", (20, 40),
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             
-            if frame_count % (skip_frames + 1) != 0:
-                cv2.putText(annotated_frame, "(Cached)", (20, 70),
+            if not inferred:
+                cv2.putText(annotated_frame, "(Propagated)" if propagator is not None else "(Cached)", (20, 70),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1)
+            cv2.putText(annotated_frame, f"skip={controller.skip} imgsz={controller.imgsz}", (20, 95),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1)
+            if show_latency:
+                latency.draw_overlay(annotated_frame, origin=(20, 130))
 
             # --- 显示结果 ---
-            cv2.imshow("YOLO Real-time Detection", annotated_frame)
+            display_start = time.perf_counter()
+            if server is not None:
+                # 每帧只编码一次，慢客户端跳帧，不阻塞推理循环
+                server.publish(annotated_frame)
+            else:
+                cv2.imshow("YOLO Real-time Detection", annotated_frame)
             
             # --- 键盘控制 ---
-            key = cv2.waitKey(1) & 0xFF
+            key = cv2.waitKey(1) & 0xFF if server is None else 0xFF
+            latency.add("display", time.perf_counter() - display_start)
+            latency.end_frame()
             if key == ord('q'):
                 break
             elif key == ord('s'):
@@ -106,12 +170,21 @@ def main():
                 save_path = f"webcam_capture_{timestamp}.jpg"
                 cv2.imwrite(save_path, annotated_frame)
                 print(f"📸 截图已保存: {save_path}")
+            elif key == ord('l'):
+                show_latency = not show_latency
 
     except KeyboardInterrupt:
         print("\n🛑 用户中断")
     finally:
         cap.release()
-        cv2.destroyAllWindows()
+        if server is not None:
+            server.stop()
+        else:
+            cv2.destroyAllWindows()
+        if latency.frames:
+            print_latency_stats(latency.summary())
+            latency_path = latency.dump_json(Path(__file__).parent / "outputs" / "latency_stats.json")
+            print(f"  已保存: {latency_path}")
         print("\n✅ 程序结束")
 
 
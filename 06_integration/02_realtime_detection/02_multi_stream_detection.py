@@ -0,0 +1,97 @@
+"""
+多路视频流检测
+============
+
+学习目标:
+- 一个进程、一个模型同时处理多路摄像头 / 视频流
+- 跨流批量推理: 各路流的最新帧组成一个批次
+- 公平调度与每路流的 FPS / 丢帧统计
+"""
+
+from pathlib import Path
+import cv2
+import numpy as np
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from utils.model_loader import load_yolo_model
+from utils.multi_stream import MultiStreamScheduler, print_stream_stats
+from utils.image_loader import VIDEOS_DIR
+
+# 视频源: 摄像头 ID 或视频文件 / 流地址，默认使用 datasets/videos 下的视频
+SOURCES = None
+
+# 每批最多几路流 (None 表示所有流一批)
+BATCH_SIZE = None
+
+# 拼接显示时每路画面的尺寸
+TILE_SIZE = (480, 270)
+
+
+def make_mosaic(tiles: list, tile_size: tuple) -> np.ndarray:
+    """把各路画面拼成网格"""
+    cols = int(np.ceil(np.sqrt(len(tiles))))
+    rows = int(np.ceil(len(tiles) / cols))
+    w, h = tile_size
+    mosaic = np.zeros((rows * h, cols * w, 3), dtype=np.uint8)
+    for i, tile in enumerate(tiles):
+        if tile is None:
+            continue
+        r, c = divmod(i, cols)
+        mosaic[r * h:(r + 1) * h, c * w:(c + 1) * w] = cv2.resize(tile, tile_size)
+    return mosaic
+
+
+def main():
+    print("=" * 60)
+    print("📹 多路视频流检测")
+    print("=" * 60)
+
+    sources = SOURCES
+    if sources is None:
+        sources = [str(p) for p in sorted(VIDEOS_DIR.glob("*.mp4"))]
+    if not sources:
+        print(f"⚠️ 在 {VIDEOS_DIR} 中未找到 .mp4 视频")
+        print("  请放入测试视频，或在 SOURCES 中指定摄像头 ID / 流地址")
+        return
+
+    print(f"\n📂 视频源 ({len(sources)} 路):")
+    for i, source in enumerate(sources):
+        print(f"  [{i}] {source}")
+
+    # 所有流共享一个模型
+    model = load_yolo_model("yolo11n.pt")
+    scheduler = MultiStreamScheduler(model, sources, batch_size=BATCH_SIZE)
+
+    tiles = [None] * len(sources)
+    print("\n  按 'q' 键退出...")
+
+    def on_result(stream_id, frame, result):
+        annotated = result.plot(img=frame)
+        fps = scheduler.stats[stream_id].fps
+        cv2.putText(annotated, f"[{stream_id}] FPS: {fps:.1f}", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        tiles[stream_id] = annotated
+
+    def on_batch():
+        # 每批只拼接、刷新一次画面 (不在每路结果上重复)
+        cv2.imshow("YOLO Multi-Stream Detection", make_mosaic(tiles, TILE_SIZE))
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            scheduler.stop()
+
+    try:
+        stats = scheduler.run(on_result, on_batch=on_batch)
+    except KeyboardInterrupt:
+        print("\n🛑 用户中断")
+        stats = None
+    finally:
+        cv2.destroyAllWindows()
+
+    if stats:
+        print_stream_stats(stats)
+    print("\n✅ 程序结束")
+
+
+if __name__ == "__main__":
+    main()
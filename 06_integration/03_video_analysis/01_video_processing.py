@@ -6,6 +6,10 @@
 - 使用生成器逐帧处理视频
 - 保存处理后的视频文件
 - 进度条显示处理进度
+- 多线程流水线: 解码 / 推理 / 编码并行，总耗时接近纯推理耗时
+- 批量推理: 攒够 N 帧一次前向，摊薄每次调用的固定开销
+- 场景变化门控: 固定机位画面没有变化时复用上一次检测结果
+- 多进程分段处理: 长视频切成多段并行处理，支持断点续跑
 """
 
 from pathlib import Path
@@ -17,6 +21,16 @@ import time
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from utils.model_loader import load_yolo_model
 from utils.image_loader import DATASETS_DIR
+from utils.video_pipeline import VideoPipeline, print_pipeline_stats
+from utils.frame_gate import SceneChangeGate
+from utils.chunked_video import process_video_chunked
+
+# 固定机位视频可开启场景变化门控 (画面变化小于阈值时跳过推理)
+USE_SCENE_GATE = False
+
+# 多进程分段处理的进程数 (> 1 时启用，适合数小时的长视频)
+PARALLEL_WORKERS = 1
+
 
 def main():
     print("=" * 60)
@@ -37,14 +51,48 @@ def main():
     input_video_path = video_files[0]
     print(f"\n📂 输入视频: {input_video_path}")
     
+    if PARALLEL_WORKERS > 1:
+        # 每个进程各自加载模型，中断后重新运行会跳过已完成的分段
+        print("\n🚀 多进程分段处理...")
+        summary = process_video_chunked(
+            input_video_path,
+            model_name="yolo11n.pt",
+            output_dir=Path(__file__).parent / "outputs",
+            num_workers=PARALLEL_WORKERS,
+        )
+        print(f"\n✅ 处理完成!")
+        print(f"  耗时: {summary['wall_time']:.2f} 秒 (续跑跳过 {summary['resumed']} 段)")
+        print(f"  输出文件: {summary['output_video']}")
+        print(f"  检测日志: {summary['output_log']}")
+        return
+    
     # 加载模型
     model = load_yolo_model("yolo11n.pt")
     
-    # 视频处理
-    process_video(model, input_video_path)
+    # 视频处理 (yolo11n 在 CPU 上每次调用的固定开销占比很高，批量推理收益明显)
+    gate = SceneChangeGate(method="diff", max_stale=30) if USE_SCENE_GATE else None
+    process_video(model, input_video_path, batch_size="auto", gate=gate)
 
 
-def process_video(model, video_path):
+def process_video(
+    model,
+    video_path,
+    threaded: bool = True,
+    queue_size: int = 8,
+    batch_size=1,
+    gate=None
+):
+    """
+    检测视频中的目标并保存标注后的视频
+    
+    Args:
+        model: YOLO 模型
+        video_path: 输入视频路径
+        threaded: 是否使用 解码 / 推理 / 编码 三线程流水线
+        queue_size: 流水线阶段之间的队列长度
+        batch_size: 每次前向的帧数 (仅流水线模式)，"auto" 表示自动调优
+        gate: 场景变化门控 (SceneChangeGate)，None 表示每帧都推理
+    """
     cap = cv2.VideoCapture(str(video_path))
     
     # 获取视频属性
@@ -67,31 +115,32 @@ def process_video(model, video_path):
     fourcc = cv2.VideoWriter_fourcc(*'avc1')
     out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
     
-    print("\n🚀 开始处理 (请稍候)...")
+    print(f"\n🚀 开始处理 ({'流水线' if threaded else '单线程'}，请稍候)...")
     start_time = time.time()
     
-    frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    if threaded:
+        pipeline = VideoPipeline(model, queue_size=queue_size, batch_size=batch_size, gate=gate)
+        stats = pipeline.run(cap, out, on_frame=lambda idx: print_progress(idx, total_frames))
+        frame_idx = stats["frames"]
+    else:
+        stats = None
+        frame_idx = 0
+        last_result = None
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+                
+            frame_idx += 1
             
-        frame_idx += 1
-        
-        # 推理
-        results = model(frame, verbose=False)
-        annotated_frame = results[0].plot()
-        
-        # 写入结果
-        out.write(annotated_frame)
-        
-        # 进度条
-        if frame_idx % 10 == 0:
-            percent = frame_idx / total_frames
-            bar_length = 30
-            filled = int(bar_length * percent)
-            bar = "█" * filled + "-" * (bar_length - filled)
-            print(f"\r  [{bar}] {percent:.1%} ({frame_idx}/{total_frames})", end="")
+            # 推理 (门控判定画面无变化时复用上一次结果)
+            if gate is None or gate.should_infer(frame):
+                last_result = model(frame, verbose=False)[0]
+            annotated_frame = last_result.plot(img=frame)
+            
+            # 写入结果
+            out.write(annotated_frame)
+            print_progress(frame_idx, total_frames)
             
     cap.release()
     out.release()
@@ -103,6 +152,23 @@ def process_video(model, video_path):
     print(f"  耗时: {duration:.2f} 秒")
     print(f"  平均 FPS: {frame_idx / duration:.1f}")
     print(f"  输出文件: {output_path}")
+    
+    if stats is not None:
+        print_pipeline_stats(stats)
+    elif gate is not None:
+        gate_stats = gate.stats()
+        print(f"  🚦 场景门控: 跳过 {gate_stats['skipped']} 帧 ({gate_stats['skip_ratio']:.1%})")
+
+
+def print_progress(frame_idx: int, total_frames: int):
+    """每 10 帧刷新一次进度条"""
+    if frame_idx % 10 != 0 or total_frames <= 0:
+        return
+    percent = min(frame_idx / total_frames, 1.0)
+    bar_length = 30
+    filled = int(bar_length * percent)
+    bar = "█" * filled + "-" * (bar_length - filled)
+    print(f"\r  [{bar}] {percent:.1%} ({frame_idx}/{total_frames})", end="")
 
 
 if __name__ == "__main__":
@@ -4,98 +4,208 @@
 
 描述:
 基于感兴趣区域 (ROI) 的车辆计数。
-检测车辆 -> 跟踪中心点 -> 判断是否穿越计数线。
+检测车辆 -> 多目标跟踪分配 ID -> 轨迹越过计数线时计数 (每个 ID 对每条线只计一次)。
+支持多条任意方向的计数线和多边形区域，按类别、按方向统计。
+默认只对计数线附近的带状区域和计数区域做裁剪推理 (USE_ROI)。
+
+输入:
+- datasets/videos 下有 .mp4 视频时处理视频
+- 否则用示例图片平移生成模拟视频流 (车辆"向下行驶"穿过计数线)
+
+推理后端:
+- "pytorch": Ultralytics YOLO (默认)
+- "onnx": ONNX Runtime (CPU，不导入 torch)，需先导出 yolo11n.onnx
 """
 
 from pathlib import Path
 import cv2
 import numpy as np
 import sys
+import time
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from utils.model_loader import load_yolo_model
-from utils.image_loader import get_sample_image
+from utils.image_loader import get_sample_image, VIDEOS_DIR
+from utils.detections import to_detections
+from utils.tracker import ByteTracker
+from utils.counting import CountingEngine
+from utils.roi_inference import RoiInference, line_band_roi, polygon_roi
+from utils.traffic_store import TrafficStore
+
+# 推理后端: "pytorch" 或 "onnx"
+BACKEND = "pytorch"
+
+# 定义车辆类别 ID (COCO 格式)
+# 2=car, 3=motorcycle, 5=bus, 7=truck
+VEHICLE_CLASSES = [2, 3, 5, 7]
+
+# 计数线 {名称: ((x1, y1), (x2, y2))} 和多边形区域 {名称: [(x, y), ...]}
+# 坐标为相对画面宽高的比例 (0~1)，运行时换算为像素
+COUNT_LINES = {
+    "main": ((0.0, 0.6), (1.0, 0.6)),
+}
+COUNT_ZONES = {
+    "lower": [(0.0, 0.75), (1.0, 0.75), (1.0, 1.0), (0.0, 1.0)],
+}
+
+# ROI 裁剪推理: 只检测计数线附近的带状区域和计数区域 (按原始分辨率推理，减少像素、提升小目标召回)
+# ROI_BAND 为计数线两侧带的半宽 (相对画面高度)，ROI_MARGIN 为每个 ROI 外扩的像素
+USE_ROI = True
+ROI_BAND = 0.15
+ROI_MARGIN = 32
+
+# 模拟视频流: 帧数、每帧平移的像素和帧率
+SIM_FRAMES = 30
+SIM_STEP = 6
+SIM_FPS = 15
+
+# 流量统计: 按 1 s / 1 min / 15 min 时间桶聚合，每隔 TRAFFIC_FLUSH_INTERVAL 秒 (视频时间) 追加写入 CSV
+TRAFFIC_FLUSH_INTERVAL = 60
+
+
+def load_detector(backend: str = BACKEND):
+    """按后端加载检测模型"""
+    if backend == "onnx":
+        from utils.onnx_backend import load_onnx_detector
+        return load_onnx_detector("yolo11n.onnx")
+
+    from utils.model_loader import load_yolo_model
+    return load_yolo_model("yolo11n.pt")
+
+
+def simulated_frames(base_frame: np.ndarray, num_frames: int, step: int):
+    """把静态图片逐帧向下平移，模拟车辆向下行驶的视频流"""
+    h, w = base_frame.shape[:2]
+    for i in range(num_frames):
+        M = np.float32([[1, 0, 0], [0, 1, i * step]])
+        yield cv2.warpAffine(base_frame, M, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+
+def video_frames(video_path: Path):
+    cap = cv2.VideoCapture(str(video_path))
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+    cap.release()
 
 
 def main():
     print("=" * 60)
-    print("🚗 车辆计数器 (ROI Loop Demo)")
+    print("🚗 车辆计数器 (跟踪 + 越线计数)")
     print("=" * 60)
     
-    model = load_yolo_model("yolo11n.pt")
+    model = load_detector(BACKEND)
     
-    # 使用静态图片模拟视频流 (循环处理同一张图并移动 ROI 线来演示)
-    # 在真实项目中，这里应读取视频流 (cv2.VideoCapture)
-    img_path = get_sample_image("bus.jpg")
-    base_frame = cv2.imread(str(img_path))
+    # 有测试视频时处理视频，否则用静态图片平移模拟视频流
+    video_files = sorted(VIDEOS_DIR.glob("*.mp4"))
+    if video_files:
+        print(f"\n🎥 视频输入: {video_files[0].name}")
+        cap = cv2.VideoCapture(str(video_files[0]))
+        w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or SIM_FPS
+        cap.release()
+        frames = video_frames(video_files[0])
+    else:
+        img_path = get_sample_image("bus.jpg")
+        base_frame = cv2.imread(str(img_path))
+        print(f"\n🎥 模拟视频流输入: {img_path.name} ({SIM_FRAMES} 帧)")
+        frames = simulated_frames(base_frame, SIM_FRAMES, SIM_STEP)
+        h, w = base_frame.shape[:2]
+        fps = SIM_FPS
     
-    print(f"\n🎥 模拟视频流输入: {img_path.name}")
+    # 计数线 / 区域: 比例坐标换算为像素
+    scale = np.array([w, h])
+    lines = {name: tuple(tuple(np.array(p) * scale) for p in line) for name, line in COUNT_LINES.items()}
+    zones = {name: np.array(poly) * scale for name, poly in COUNT_ZONES.items()}
+    counter = CountingEngine(lines=lines, zones=zones, anchor="center")
+    tracker = ByteTracker()
     
-    # 定义车辆类别 ID (COCO 格式)
-    # 2=car, 3=motorcycle, 5=bus, 7=truck
-    VEHICLE_CLASSES = [2, 3, 5, 7]
+    roi_infer = None
+    if USE_ROI:
+        rois = [line_band_roi(p0, p1, ROI_BAND * h) for p0, p1 in lines.values()]
+        rois += [polygon_roi(poly) for poly in zones.values()]
+        roi_infer = RoiInference(model, rois, margin=ROI_MARGIN)
     
-    # 定义计数线 (屏幕中间水平线)
-    h, w = base_frame.shape[:2]
-    line_y = int(h * 0.6)  # 60% 高度处
-    offset = 10  # 判定偏移量
+    output_dir = Path(__file__).parent / "outputs"
+    output_dir.mkdir(exist_ok=True)
+    writer = None
     
-    vehicle_count = 0
+    # 事件时间按帧号换算 (视频时间)，起点为当前墙上时间，导出的时间戳可直接用于看板
+    store = TrafficStore(counter.line_names, model.names, flush_dir=output_dir / "traffic",
+                         flush_interval=TRAFFIC_FLUSH_INTERVAL)
+    start_time = time.time()
+    t = start_time
     
-    # 模拟 3 帧的处理
-    for i in range(3):
-        print(f"\n--- Frame {i+1} ---")
-        frame = base_frame.copy()
+    for i, frame in enumerate(frames):
+        # 1. 检测车辆 (一次性转换为 numpy，按类别向量化筛选)
+        if roi_infer is not None:
+            det = roi_infer(frame)
+        else:
+            det = to_detections(model(frame, verbose=False)[0])
+        vehicles = det[np.isin(det.cls, VEHICLE_CLASSES)]
         
-        # 绘制计数线
-        cv2.line(frame, (0, line_y), (w, line_y), (0, 0, 255), 3)
+        # 2. 跟踪: 为每辆车分配稳定的 ID
+        tracks = tracker.update(vehicles.xyxy, vehicles.conf, vehicles.cls)
         
-        results = model(frame, verbose=False)
-        result = results[0]
+        # 3. 计数: 所有轨迹 × 所有计数线 / 区域一次向量化计算
+        events = counter.update(tracks["ids"], tracks["xyxy"], tracks["cls"])
+        crossed = events["crossed"]
+        t = start_time + i / fps
+        store.add_events(crossed, t)
+        store.maybe_flush(t)
+        for track_id, line, direction, cls_id in zip(
+            crossed["ids"].tolist(), crossed["line"].tolist(), crossed["direction"].tolist(), crossed["cls"].tolist()
+        ):
+            print(f"  ✨ Frame {i + 1}: 车辆 #{track_id} 穿越 {counter.line_names[line]} ({direction})，类型: {model.names[cls_id]}")
+        for track_id, zone in zip(events["entered"]["ids"].tolist(), events["entered"]["zone"].tolist()):
+            print(f"  📍 Frame {i + 1}: 车辆 #{track_id} 进入区域 {counter.zone_names[zone]}")
         
-        # 1. 检测车辆
-        detections = []
-        for box in result.boxes:
-            cls_id = int(box.cls[0].item())
-            if cls_id in VEHICLE_CLASSES:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                conf = float(box.conf[0].item())
-                
-                # 计算中心点
-                cx = (x1 + x2) // 2
-                cy = (y1 + y2) // 2
-                
-                detections.append((cx, cy, x1, y1, x2, y2, cls_id))
-                
-                # 绘制车辆框
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                cv2.circle(frame, (cx, cy), 5, (0, 255, 255), -1)
+        # 绘制车辆框和 ID (只在绘制时逐个遍历)
+        centers = ((tracks["xyxy"][:, :2] + tracks["xyxy"][:, 2:]) / 2).astype(int)
+        counted = counter.is_counted(tracks["ids"])
+        for (x1, y1, x2, y2), (cx, cy), track_id, is_counted in zip(
+            tracks["xyxy"].astype(int).tolist(), centers.tolist(), tracks["ids"].tolist(), counted.tolist()
+        ):
+            color = (0, 255, 0) if is_counted else (255, 0, 0)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.circle(frame, (cx, cy), 5, (0, 255, 255), -1)
+            cv2.putText(frame, f"#{track_id}", (x1, y1 - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
         
-        print(f"  当前帧检测到 {len(detections)} 辆车")
-        
-        # 2. 计数逻辑 (简化版)
-        for (cx, cy, _, _, _, _, cls_id) in detections:
-            # 判断是否在计数线附近 (实际项目需要 Object Tracking ID 来避免重复计数)
-            # 这里简单演示逻辑：如果在范围内则判定为"计数" (仅演示)
-            if line_y - offset < cy < line_y + offset:
-                # 假设这是被 Track 的对象首次经过
-                vehicle_count += 1
-                cv2.line(frame, (0, line_y), (w, line_y), (0, 255, 0), 3) # 变绿
-                print(f"  ✨ 车辆穿越! 类型: {result.names[cls_id]}")
-        
-        # 显示计数
-        cv2.putText(frame, f"Count: {vehicle_count}", (30, 80), 
+        # 绘制 ROI、计数线 / 区域和计数
+        if roi_infer is not None:
+            for x1, y1, x2, y2 in roi_infer.last_boxes.tolist():
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 0), 1)
+        counter.draw(frame, color=(0, 255, 0) if len(crossed["ids"]) else (0, 0, 255))
+        cv2.putText(frame, f"Count: {int(counter.line_counts.sum())}", (30, 80), 
                     cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3)
-                    
-        # 保存演示帧
-        output_dir = Path(__file__).parent / "outputs"
-        output_dir.mkdir(exist_ok=True)
-        cv2.imwrite(str(output_dir / f"count_frame_{i}.jpg"), frame)
+        
+        # 保存标注视频
+        if writer is None:
+            writer = cv2.VideoWriter(str(output_dir / "count_result.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+        writer.write(frame)
+    
+    if writer is not None:
+        writer.release()
+    
+    print(f"\n✅ 处理结束")
+    if roi_infer is not None:
+        print(f"  ROI 推理: 模型输入像素为整帧推理的 {roi_infer.pixel_ratio:.0%}，"
+              f"裁剪面积为整帧的 {roi_infer.crop_area_ratio:.0%}")
+    summary = counter.summary(model.names)
+    for name, line in summary["lines"].items():
+        print(f"  计数线 {name}: 共 {line['total']}，in {line['in']}，out {line['out']}")
+    for name, zone in summary["zones"].items():
+        print(f"  区域 {name}: 进入 {zone['entered']}，离开 {zone['exited']}")
     
-    print(f"\n✅ 模拟结束")
-    print(f"  总计数: {vehicle_count}")
-    print(f"  演示帧保存在: {output_dir}")
+    # 最近 1 分钟的流量 (速率直接由时间桶求和得到，不需要回放事件)
+    for name, line in store.summary(60, now=t).items():
+        print(f"  最近 1 分钟 {name}: in {line['in']}，out {line['out']}")
+    print(f"  最近 1 分钟总流量: {store.rates(60, now=t).sum():.1f} 辆/分钟")
+    store.flush(t, final=True)
+    print(f"  流量统计: {store.flush_dir}")
+    print(f"  结果视频: {output_dir / 'count_result.mp4'}")
 
 
 if __name__ == "__main__":
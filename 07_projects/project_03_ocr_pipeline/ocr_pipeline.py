@@ -16,6 +16,7 @@ import shutil
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from utils.model_loader import load_yolo_model
 from utils.image_loader import get_sample_image
+from utils.detections import to_detections
 
 # 尝试导入 pytesseract
 try:
@@ -56,42 +57,41 @@ def main():
     
     # 3. 提取目标并进行 OCR
     count = 0
-    for box in results[0].boxes:
-        cls_id = int(box.cls[0].item())
-        name = results[0].names[cls_id]
+    # 一次性转换为 numpy，按类别向量化筛选出公交车
+    det = to_detections(results[0])
+    bus_id = {name: cls_id for cls_id, name in det.names.items()}["bus"]
+    buses = det[det.cls == bus_id]
+    for x1, y1, x2, y2 in buses.xyxy.astype(int).tolist():
+        count += 1
+        # 提取 ROI
+        roi = frame[y1:y2, x1:x2]
         
-        if name == "bus":
-            count += 1
-            # 提取 ROI
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-            roi = frame[y1:y2, x1:x2]
-            
-            print(f"\n🚌 检测到公交车 #{count}，正在尝试 OCR...")
-            
-            # 预处理: 转灰度 -> 阈值化 -> 降噪
-            gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            # Otsu 阈值
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # 保存预处理图
-            cv2.imwrite(str(output_dir / f"roi_bus_{count}_binary.jpg"), binary)
-            
-            if tesseract_available:
-                try:
-                    # OCR 识别
-                    # --psm 6 表示假设单一文本块，普通英文
-                    text = pytesseract.image_to_string(binary, config='--psm 6')
-                    stripped_text = text.strip()
-                    
-                    if stripped_text:
-                        print(f"  📄 识别结果: \"{stripped_text}\"")
-                    else:
-                        print("  (OCR 未识别出清晰文字)")
-                except Exception as e:
-                    print(f"  OCR 出错: {e}")
-            else:
-                print("  ⏭️  跳过 OCR (未安装 tesseract)")
-                print("  已保存 ROI 图像供查看")
+        print(f"\n🚌 检测到公交车 #{count}，正在尝试 OCR...")
+        
+        # 预处理: 转灰度 -> 阈值化 -> 降噪
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        # Otsu 阈值
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # 保存预处理图
+        cv2.imwrite(str(output_dir / f"roi_bus_{count}_binary.jpg"), binary)
+        
+        if tesseract_available:
+            try:
+                # OCR 识别
+                # --psm 6 表示假设单一文本块，普通英文
+                text = pytesseract.image_to_string(binary, config='--psm 6')
+                stripped_text = text.strip()
+        
+                if stripped_text:
+                    print(f"  📄 识别结果: \"{stripped_text}\"")
+                else:
+                    print("  (OCR 未识别出清晰文字)")
+            except Exception as e:
+                print(f"  OCR 出错: {e}")
+        else:
+            print("  ⏭️  跳过 OCR (未安装 tesseract)")
+            print("  已保存 ROI 图像供查看")
     
     print("\n✅ OCR 流程演示完成")
     if not tesseract_available:
@@ -3,20 +3,138 @@
 =========================
 
 描述:
-简单的基于规则的异常检测。
+简单的基于规则的异常检测。规则写在 rules.yaml 中，由 utils.rule_engine 编译为向量化判定。
 场景: 
 1. 检测这一区域是否出现了不该出现的人 (闯入检测)。
-2. 检测某人是否未佩戴特定装备 (这里用"是否携带背包"模拟，假设 backpack 为安全装备)。
+2. 检测某人是否未佩戴特定装备 (这里用"是否携带背包"模拟，假设 backpack 为安全装备，utils.ppe)。
+3. 徘徊检测: 跟踪每个人，在区域内停留过久或反复进入时告警 (utils.dwell)。
 """
 
 from pathlib import Path
 import cv2
+import numpy as np
 import sys
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from utils.model_loader import load_yolo_model
-from utils.image_loader import get_sample_image
+from utils.image_loader import get_sample_image, VIDEOS_DIR
+from utils.detections import to_detections
+from utils.roi_inference import RoiInference, polygon_roi
+from utils.rule_engine import RuleEngine
+from utils.tracker import ByteTracker
+from utils.dwell import DwellMonitor
+from utils.frame_gate import ZoneMotionGate
+from utils.ppe import PPEMonitor
+
+# 规则配置 (区域 / 类别 / 置信度 / 生效时段)，格式见 utils/rule_engine.py
+RULES_PATH = Path(__file__).parent / "rules.yaml"
+
+# ROI 裁剪推理: 只检测规则区域 (外扩 ROI_MARGIN 像素，跨在区域边缘的人也能完整检测)
+# 区域外的目标不会被检测，适合只关心禁区的场景
+USE_ROI = False
+ROI_MARGIN = 48
+
+# 徘徊检测: 在 rules.yaml 的区域内连续停留超过 LOITER_SECONDS 秒，
+# 或 REVISIT_WINDOW 秒内进入同一区域 REVISIT_COUNT 次时告警
+LOITER_SECONDS = 2.0
+REVISIT_COUNT = 3
+REVISIT_WINDOW = 60.0
+
+# 区域运动门控: 背景建模后只有区域内有运动时才推理 (USE_ROI 时只裁剪有运动的区域)
+# MOTION_METHOD: "mog2" 或 "avg"
+USE_MOTION_GATE = True
+MOTION_METHOD = "mog2"
+
+# 装备检查: {装备类别: (上沿, 下沿)}，装备应出现在人员框的哪一段 (占框高的比例)
+# 视频中按 PPE_WINDOW 帧平滑，避免漏检导致告警闪烁
+PPE_REQUIRED = {"backpack": (0.1, 0.8)}
+PPE_WINDOW = 5
+
+# 没有测试视频时，用示例图片重复 SIM_FRAMES 帧模拟静止的人 (帧率 SIM_FPS)
+SIM_FRAMES = 45
+SIM_FPS = 15
+
+
+def stream_frames(img_path: Path):
+    """有测试视频时逐帧读取视频，否则重复示例图片；返回 (帧迭代器, 帧率)"""
+    video_files = sorted(VIDEOS_DIR.glob("*.mp4"))
+    if video_files:
+        cap = cv2.VideoCapture(str(video_files[0]))
+        fps = cap.get(cv2.CAP_PROP_FPS) or SIM_FPS
+        print(f"\n🎥 视频输入: {video_files[0].name}")
+
+        def frames():
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+            cap.release()
+
+        return frames(), fps
+
+    base_frame = cv2.imread(str(img_path))
+    print(f"\n🎥 模拟视频流输入: {img_path.name} ({SIM_FRAMES} 帧)")
+    return (base_frame.copy() for _ in range(SIM_FRAMES)), SIM_FPS
+
+
+def detect_loitering(model, engine: RuleEngine, img_path: Path):
+    """跟踪人员，按轨迹统计在各区域的停留时长"""
+    print("\n🕒 徘徊检测")
+    frames, fps = stream_frames(img_path)
+    tracker = ByteTracker()
+    person_id = {name: cls_id for cls_id, name in model.names.items()}["person"]
+    ppe = PPEMonitor(PPE_REQUIRED, window=PPE_WINDOW)
+    num_violations = 0
+    monitor = gate = roi_infer = None
+    tracks = {"ids": np.zeros(0, dtype=np.int64), "xyxy": np.zeros((0, 4), dtype=np.float32)}
+    
+    for i, frame in enumerate(frames):
+        t = i / fps  # 视频时间
+        if monitor is None:
+            h, w = frame.shape[:2]
+            scale = np.array([w, h]) if engine.normalized else np.ones(2)
+            zones = {name: np.asarray(points) * scale for name, points in engine.zones.items()}
+            monitor = DwellMonitor(zones, frame.shape, dwell_seconds=LOITER_SECONDS,
+                                   revisit_count=REVISIT_COUNT, revisit_window=REVISIT_WINDOW)
+            if USE_MOTION_GATE:
+                gate = ZoneMotionGate(zones, frame.shape, method=MOTION_METHOD)
+            if USE_ROI:
+                roi_infer = RoiInference(model, [], margin=ROI_MARGIN)
+        
+        # 区域内没有运动时跳过推理，沿用上一次的轨迹 (停留时长照常累计)
+        if gate is None or gate.should_infer(frame):
+            if roi_infer is not None:
+                roi_infer.set_rois(gate.active_rois() if gate is not None else [polygon_roi(p) for p in zones.values()])
+                det = roi_infer(frame)
+            else:
+                det = to_detections(model(frame, verbose=False)[0])
+            persons = det[det.cls == person_id]
+            tracks = tracker.update(persons.xyxy, persons.conf, persons.cls)
+            # 装备检查 (平滑后的违规人数变化时输出)
+            violation = ppe.update(det)["violation"]
+            if violation.sum() != num_violations:
+                num_violations = int(violation.sum())
+                print(f"  🦺 {t:6.1f}s: 未佩戴装备人数 {num_violations}/{len(violation)}")
+        events = monitor.update(tracks["ids"], tracks["xyxy"], t)
+        
+        loiter = events["loitering"]
+        for track_id, zone, dwell in zip(loiter["ids"].tolist(), loiter["zone"].tolist(), loiter["dwell"].tolist()):
+            print(f"  🚨 {t:6.1f}s: 人员 #{track_id} 在区域 {monitor.zone_names[zone]} 停留 {dwell:.1f}s")
+        revisit = events["revisit"]
+        for track_id, zone, visits in zip(revisit["ids"].tolist(), revisit["zone"].tolist(), revisit["visits"].tolist()):
+            print(f"  🚨 {t:6.1f}s: 人员 #{track_id} 第 {visits} 次进入区域 {monitor.zone_names[zone]}")
+    
+    if monitor is not None:
+        print(f"  跟踪槽位: {monitor.active}/{monitor.capacity}，已回收 {monitor.evicted}，"
+              f"缓冲区 {monitor.nbytes / 1024:.0f} KB (固定)")
+    if gate is not None:
+        stats = gate.stats()
+        print(f"  运动门控: 推理 {stats['inferred']}/{stats['frames']} 帧 (占空比 {stats['duty_cycle']:.0%}，"
+              f"节省 {1 - stats['duty_cycle']:.0%} 的推理)，门控耗时 {stats['gate_ms']:.2f} ms/帧")
+        for name, duty in stats["zone_duty"].items():
+            print(f"    区域 {name}: 推理占比 {duty:.0%}")
 
 
 def main():
@@ -34,53 +152,57 @@ def main():
     print(f"\n📷 场景: 公交车站 ({w}x{h})")
     
     # ==========================
-    # 规则 1: 禁区检测
+    # 规则: 从 YAML 加载并编译为向量化判定
     # ==========================
-    # 定义左侧 20% 区域为"禁止行人区"
-    restricted_x = int(w * 0.2)
-    
-    # 绘制禁区 (半透明红色)
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (0, 0), (restricted_x, h), (0, 0, 255), -1)
-    frame = cv2.addWeighted(overlay, 0.3, frame, 0.7, 0)
-    cv2.putText(frame, "RESTRICTED AREA", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+    engine = RuleEngine.from_yaml(RULES_PATH)
+    print(f"📜 规则: {len(engine)} 条 ({RULES_PATH.name})")
     
     # ==========================
     # 推理
     # ==========================
-    results = model(frame, verbose=False)
-    result = results[0]
+    # 一次性转换为 numpy，所有规则 × 所有目标一次性判定
+    if USE_ROI:
+        # 只检测规则区域 (外接矩形)
+        rois = [polygon_roi(poly) for poly in engine.zone_polygons(frame.shape)]
+        roi_infer = RoiInference(model, rois, margin=ROI_MARGIN)
+        det = roi_infer(frame)
+        print(f"  ROI 推理: 模型输入像素为整帧推理的 {roi_infer.pixel_ratio:.0%}，"
+              f"裁剪面积为整帧的 {roi_infer.crop_area_ratio:.0%}")
+    else:
+        det = to_detections(model(frame, verbose=False)[0])
     
-    alerts = []
+    out = engine.evaluate(det, frame.shape)
+    # 装备检查: 人员 × 装备包含度矩阵一次性关联 (单张图片不平滑，直接看本帧结果)
+    ppe = PPEMonitor(PPE_REQUIRED)
+    ppe_out = ppe.update(det)
+    unequipped = ~ppe_out["matched"].all(axis=1)
     
-    for box in result.boxes:
-        cls_id = int(box.cls[0].item())
-        name = result.names[cls_id]
-        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-        
-        # 1. 检查禁区闯入 (只针对 Person)
-        if name == "person":
-            # 计算人中心点
-            cx = (x1 + x2) // 2
-            
-            if cx < restricted_x:
-                alert_msg = f"🚨 警报: 人员闯入禁区! (ID: {cls_id})"
-                alerts.append(alert_msg)
-                
-                # 画红框
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
-                cv2.putText(frame, "INTRUDER", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-            else:
-                # 正常区域，画绿框
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    # 绘制规则区域 (半透明红色)
+    engine.draw_zones(frame)
+    cv2.putText(frame, "RESTRICTED AREA", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+    
+    # 人员画绿框，触发规则的目标画红框并标注规则名 (只遍历绘制用的列表)
+    person_id = {name: cls_id for cls_id, name in det.names.items()}["person"]
+    persons = det.cls == person_id
+    for x1, y1, x2, y2 in det.xyxy[persons].astype(int).tolist():
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    for alert in out["alerts"]:
+        for x1, y1, x2, y2 in det.xyxy[alert["indices"]].astype(int).tolist():
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+            cv2.putText(frame, alert["rule"], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
 
     # 显示警报
     print("\n📝 检测报告:")
-    if alerts:
-        for alert in alerts:
-            print(f"  {alert}")
+    if out["alerts"]:
+        for alert in out["alerts"]:
+            print(f"  🚨 [{alert['severity']}] {alert['rule']}: {alert['message']} (目标数: {len(alert['indices'])})")
     else:
         print("  ✅ 区域安全，无违规")
+    if unequipped.any():
+        print(f"  🦺 未佩戴装备 ({'/'.join(ppe.required)}): {int(unequipped.sum())}/{len(unequipped)} 人")
+    timing = engine.timing()
+    print(f"  ⏱️ 规则判定耗时: {timing['total']:.3f} ms (平均每条规则 {timing['per_rule_us']:.1f} µs)，"
+          f"装备关联耗时: {ppe.last_ms:.3f} ms")
         
     # 保存结果
     output_dir = Path(__file__).parent / "outputs"
@@ -88,6 +210,11 @@ def main():
     out_path = output_dir / "anomaly_result.jpg"
     cv2.imwrite(str(out_path), frame)
     print(f"\n💾 结果图: {out_path}")
+    
+    # ==========================
+    # 徘徊检测 (视频 / 模拟视频流)
+    # ==========================
+    detect_loitering(model, engine, img_path)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,104 @@
 """
 YOLO Playground 工具函数
+
+子模块按需加载: `import utils` 本身不会导入 torch / ultralytics，
+只有第一次访问对应属性 (如 `utils.load_yolo_model`) 时才导入所在子模块。
 """
 
-from .helpers import *
-from .model_loader import load_yolo_model, list_local_models, get_model_path
+import importlib
+
+# 属性名 -> 所在子模块
+_LAZY_ATTRS = {
+    # helpers.py (仅依赖 OpenCV / NumPy)
+    "get_device": "helpers",
+    "is_apple_silicon": "helpers",
+    "load_image": "helpers",
+    "save_image": "helpers",
+    "resize_image": "helpers",
+    "show_image": "helpers",
+    "show_images_grid": "helpers",
+    "draw_bbox": "helpers",
+    "get_image_info": "helpers",
+    "print_image_info": "helpers",
+    # model_loader.py (依赖 ultralytics / torch)
+    "load_yolo_model": "model_loader",
+    "list_local_models": "model_loader",
+    "get_model_path": "model_loader",
+    "ModelRegistry": "model_loader",
+    "get_model_registry": "model_loader",
+    "get_cached_model": "model_loader",
+    # onnx_backend.py (依赖 onnxruntime，不依赖 torch)
+    "OnnxDetector": "onnx_backend",
+    "load_onnx_detector": "onnx_backend",
+    # video_pipeline.py
+    "VideoPipeline": "video_pipeline",
+    # frame_gate.py
+    "SceneChangeGate": "frame_gate",
+    "ZoneMotionGate": "frame_gate",
+    # chunked_video.py
+    "process_video_chunked": "chunked_video",
+    # capture.py
+    "LatestFrameCapture": "capture",
+    # adaptive_skip.py
+    "AdaptiveSkipController": "adaptive_skip",
+    # box_propagation.py
+    "BoxPropagator": "box_propagation",
+    "shift_result": "box_propagation",
+    # detections.py
+    "Detections": "detections",
+    "to_detections": "detections",
+    # multi_stream.py
+    "MultiStreamScheduler": "multi_stream",
+    "print_stream_stats": "multi_stream",
+    # latency.py
+    "LatencyTracker": "latency",
+    "print_latency_stats": "latency",
+    # mjpeg_server.py
+    "MjpegServer": "mjpeg_server",
+    # tracker.py
+    "ByteTracker": "tracker",
+    # counting.py
+    "CountingEngine": "counting",
+    "LineCounter": "counting",
+    # roi_inference.py
+    "RoiInference": "roi_inference",
+    # traffic_store.py
+    "TrafficStore": "traffic_store",
+    # rule_engine.py
+    "RuleEngine": "rule_engine",
+    # zone_index.py
+    "ZoneIndex": "zone_index",
+    # dwell.py
+    "DwellMonitor": "dwell",
+    # ppe.py
+    "PPEMonitor": "ppe",
+}
+
+_SUBMODULES = {"helpers", "model_loader", "image_loader", "import_benchmark", "onnx_backend",
+    "video_pipeline", "frame_gate",
+    "chunked_video", "capture", "adaptive_skip",
+    "box_propagation", "detections", "multi_stream",
+    "latency", "mjpeg_server", "tracker", "counting",
+    "roi_inference", "traffic_store", "rule_engine",
+    "zone_index", "dwell", "ppe",
+}
+
+__all__ = sorted(_LAZY_ATTRS)
+
+
+def __getattr__(name: str):
+    """首次访问时导入子模块，并把结果缓存到包的命名空间"""
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(f".{_LAZY_ATTRS[name]}", __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
 
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | _SUBMODULES)
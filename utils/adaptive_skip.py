@@ -0,0 +1,184 @@
+"""
+自适应跳帧控制器
+根据目标帧率 (或目标延迟) 和实测推理耗时，在运行时决定每隔几帧推理一次、用多大的输入尺寸
+
+控制规则 (每次推理后更新，每 decide_every 次推理做一次决策，每次最多调整一档):
+1. 预算: 每个显示帧可用时间 = 1 / target_fps
+   满足预算所需的跳帧数 = ceil(推理耗时 / 预算) - 1
+2. 场景繁忙 (检测数多) 时只跳满足预算所需的帧 → 推理更频繁
+   场景空闲时额外多跳 quiet_extra_skip 帧 → 节省算力
+3. CPU 饱和 (需要 psutil) 时再多跳一帧 → 退让
+4. 跳到 max_skip 仍不满足预算时降低输入尺寸；推理耗时远低于预算时恢复尺寸
+
+每次决策变化都会记录到 history，并可写入 JSONL 日志，便于按摄像头调参
+"""
+
+from collections import deque
+from pathlib import Path
+from typing import Optional, Union
+import json
+import math
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class AdaptiveSkipController:
+    """
+    自适应跳帧 / 输入尺寸控制器
+
+    Examples:
+        >>> controller = AdaptiveSkipController(target_fps=30)
+        >>> if controller.should_infer():
+        ...     t0 = time.perf_counter()
+        ...     result = model(frame, imgsz=controller.imgsz)[0]
+        ...     controller.update(time.perf_counter() - t0, len(result.boxes))
+    """
+
+    def __init__(
+        self,
+        target_fps: Optional[float] = 30.0,
+        target_latency_ms: Optional[float] = None,
+        min_skip: int = 0,
+        max_skip: int = 8,
+        imgsz_levels: tuple = (640, 480, 320),
+        busy_detections: int = 3,
+        quiet_extra_skip: int = 2,
+        cpu_high: float = 90.0,
+        smoothing: float = 0.3,
+        decide_every: int = 5,
+        log_path: Optional[Union[str, Path]] = None,
+        verbose: bool = True
+    ):
+        """
+        Args:
+            target_fps: 目标显示帧率
+            target_latency_ms: 目标每帧耗时 (ms)，指定时优先于 target_fps
+            min_skip: 最少跳帧数 (0 = 每帧推理)
+            max_skip: 最多跳帧数
+            imgsz_levels: 可选输入尺寸，从大到小
+            busy_detections: 平均检测数达到该值视为繁忙场景
+            quiet_extra_skip: 空闲场景额外跳过的帧数
+            cpu_high: CPU 占用率 (%) 超过该值视为饱和
+            smoothing: 推理耗时 / 检测数的指数平滑系数
+            decide_every: 每多少次推理做一次决策
+            log_path: 决策日志 (JSONL) 路径，None 表示不写文件
+            verbose: 决策变化时是否打印
+        """
+        if target_latency_ms is not None:
+            self.budget = target_latency_ms / 1000
+        elif target_fps:
+            self.budget = 1.0 / target_fps
+        else:
+            raise ValueError("需要指定 target_fps 或 target_latency_ms")
+
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+        self.imgsz_levels = list(imgsz_levels)
+        self.busy_detections = busy_detections
+        self.quiet_extra_skip = quiet_extra_skip
+        self.cpu_high = cpu_high
+        self.smoothing = smoothing
+        self.decide_every = decide_every
+        self.log_path = Path(log_path) if log_path else None
+        self.verbose = verbose
+
+        self.skip = min_skip
+        self._level = 0
+        self._since_infer = None  # None 表示还没推理过，第一帧必须推理
+        self._updates = 0
+        self.ema_infer = None
+        self.ema_detections = 0.0
+        self.history = deque(maxlen=1000)
+
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)  # 第一次调用返回 0，先初始化
+
+    @property
+    def imgsz(self) -> int:
+        """当前推理输入尺寸"""
+        return self.imgsz_levels[self._level]
+
+    def should_infer(self) -> bool:
+        """每帧调用一次: 当前帧是否需要推理"""
+        if self._since_infer is None or self._since_infer >= self.skip:
+            self._since_infer = 0
+            return True
+        self._since_infer += 1
+        return False
+
+    def update(self, infer_time: float, num_detections: int):
+        """
+        推理后调用，上报本次推理耗时和检测数
+
+        Args:
+            infer_time: 推理耗时 (秒)
+            num_detections: 本次检测到的目标数
+        """
+        a = self.smoothing
+        self.ema_infer = infer_time if self.ema_infer is None else a * infer_time + (1 - a) * self.ema_infer
+        self.ema_detections = a * num_detections + (1 - a) * self.ema_detections
+
+        self._updates += 1
+        if self._updates % self.decide_every == 0:
+            self._decide()
+
+    def _decide(self):
+        cpu = psutil.cpu_percent(interval=None) if psutil is not None else None
+        busy = self.ema_detections >= self.busy_detections
+
+        # 满足帧率预算所需的跳帧数
+        needed = max(0, math.ceil(self.ema_infer / self.budget) - 1)
+        target = needed if busy else needed + self.quiet_extra_skip
+        reason = "busy" if busy else "quiet"
+        if cpu is not None and cpu >= self.cpu_high:
+            target += 1
+            reason += "+cpu_saturated"
+
+        # 每次最多调整一档，避免振荡
+        target = min(max(target, self.min_skip), self.max_skip)
+        new_skip = self.skip + (target > self.skip) - (target < self.skip)
+
+        # 跳帧到上限仍不满足预算 → 降低输入尺寸；推理很快 → 恢复尺寸
+        new_level = self._level
+        if needed > self.max_skip and self._level < len(self.imgsz_levels) - 1:
+            new_level += 1
+            reason += "+over_budget"
+        elif needed == 0 and self.ema_infer < 0.5 * self.budget and self._level > 0:
+            new_level -= 1
+            reason += "+headroom"
+
+        if new_skip == self.skip and new_level == self._level:
+            return
+
+        infer_ms = round(self.ema_infer * 1000, 2)
+        self.skip = new_skip
+        if new_level != self._level:
+            self._level = new_level
+            self.ema_infer = None  # 尺寸变化后推理耗时需要重新测量
+
+        self._log({
+            "time": time.time(),
+            "skip": self.skip,
+            "imgsz": self.imgsz,
+            "needed_skip": needed,
+            "infer_ms": infer_ms,
+            "detections": round(self.ema_detections, 2),
+            "cpu": cpu,
+            "reason": reason,
+        })
+
+    def _log(self, record: dict):
+        self.history.append(record)
+        if self.log_path is not None:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        if self.verbose:
+            cpu = f"{record['cpu']:.0f}%" if record["cpu"] is not None else "-"
+            print(
+                f"  🎛️ 跳帧={record['skip']} 尺寸={record['imgsz']} "
+                f"(推理 {record['infer_ms']}ms，检测 {record['detections']}，CPU {cpu}，{record['reason']})"
+            )
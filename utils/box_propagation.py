@@ -0,0 +1,239 @@
+"""
+跳帧时的检测框运动补偿
+跳过推理的帧直接复用上一次的检测框，运动中的目标会明显"拖影"。
+这里在未推理的帧上把上一次的检测框向前推算到当前帧，代价远低于一次推理:
+
+- "flow": 稀疏 Lucas-Kanade 光流。在每个框内取特征点，所有点一次性计算光流，
+  按框取位移中位数 (以及尺度变化) 平移 / 缩放框；可选前后向一致性检查剔除错误跟踪点
+- "velocity": 匀速运动预测。推理帧之间按 IoU 匹配同类目标估计每帧速度，
+  未推理帧上按速度外推，几乎零开销 (不看图像内容)
+"""
+
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from utils.detections import box_iou
+
+
+class BoxPropagator:
+    """
+    检测框运动补偿
+
+    Examples:
+        >>> propagator = BoxPropagator(method="flow")
+        >>> if inferred:
+        ...     result = model(frame)[0]
+        ...     propagator.reset(frame, result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy())
+        ... else:
+        ...     xyxy = propagator.propagate(frame)
+    """
+
+    def __init__(
+        self,
+        method: str = "flow",
+        max_points: int = 20,
+        min_points: int = 3,
+        win_size: int = 15,
+        max_level: int = 2,
+        fb_threshold: Optional[float] = 1.0,
+        velocity_smoothing: float = 0.5,
+        match_iou: float = 0.1
+    ):
+        """
+        Args:
+            method: "flow" (LK 光流) 或 "velocity" (匀速预测)
+            max_points: 每个框最多跟踪的特征点数
+            min_points: 框内有效点少于该值时重新取点
+            win_size: LK 光流窗口大小
+            max_level: LK 光流金字塔层数
+            fb_threshold: 前后向误差阈值 (像素)，None 表示不做前后向检查 (快一倍)
+            velocity_smoothing: velocity 模式下新速度的权重
+            match_iou: velocity 模式下前后两次检测匹配的最小 IoU
+        """
+        if method not in ("flow", "velocity"):
+            raise ValueError(f"不支持的方法: {method}，可选: ['flow', 'velocity']")
+
+        self.method = method
+        self.max_points = max_points
+        self.min_points = min_points
+        self.lk_params = dict(
+            winSize=(win_size, win_size),
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+        self.fb_threshold = fb_threshold
+        self.velocity_smoothing = velocity_smoothing
+        self.match_iou = match_iou
+
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.float32)
+        self._detected = self.boxes.copy()
+        self._velocity = np.zeros((0, 4), dtype=np.float32)
+        self._has_velocity = np.zeros(0, dtype=bool)
+        self._frames_since_reset = 0
+        self._prev_gray = None
+        self._points = np.zeros((0, 1, 2), dtype=np.float32)
+        self._owner = np.zeros(0, dtype=np.int64)
+
+    def reset(self, frame: np.ndarray, xyxy: np.ndarray, cls: Optional[np.ndarray] = None):
+        """
+        推理帧上调用: 用新的检测结果替换当前跟踪的框
+
+        Args:
+            frame: 推理所用的 BGR 帧
+            xyxy: (N, 4) 检测框
+            cls: (N,) 类别 (velocity 模式匹配时使用，None 表示不区分类别)
+        """
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        cls = np.zeros(len(xyxy), dtype=np.float32) if cls is None else np.asarray(cls, dtype=np.float32)
+
+        if self.method == "velocity":
+            self._velocity = self._estimate_velocity(xyxy, cls)
+        else:
+            self._prev_gray = self._gray(frame)
+            self._points, self._owner = self._sample_points(self._prev_gray, xyxy, np.arange(len(xyxy)))
+
+        self.boxes = xyxy.copy()
+        self._detected = xyxy.copy()
+        self.cls = cls
+        self._frames_since_reset = 0
+
+    def propagate(self, frame: np.ndarray) -> np.ndarray:
+        """
+        未推理帧上调用: 把框推算到当前帧
+
+        Returns:
+            (N, 4) 推算后的框 (与 reset 时的框一一对应)
+        """
+        self._frames_since_reset += 1
+        if len(self.boxes) == 0:
+            return self.boxes
+
+        if self.method == "velocity":
+            self.boxes = self.boxes + self._velocity
+        else:
+            self._propagate_flow(self._gray(frame))
+
+        height, width = frame.shape[:2]
+        self.boxes[:, [0, 2]] = self.boxes[:, [0, 2]].clip(0, width)
+        self.boxes[:, [1, 3]] = self.boxes[:, [1, 3]].clip(0, height)
+        return self.boxes
+
+    @staticmethod
+    def _gray(frame: np.ndarray) -> np.ndarray:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    def _sample_points(self, gray: np.ndarray, xyxy: np.ndarray, indices: np.ndarray):
+        """在指定框内取特征点，纹理太少的框退化为 3x3 网格点"""
+        points, owner = [], []
+        height, width = gray.shape
+        for i in indices:
+            x1, y1, x2, y2 = xyxy[i].astype(int)
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, width), min(y2, height)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                continue
+
+            corners = cv2.goodFeaturesToTrack(
+                gray[y1:y2, x1:x2], maxCorners=self.max_points, qualityLevel=0.01, minDistance=3
+            )
+            if corners is None or len(corners) < self.min_points:
+                gx, gy = np.meshgrid(np.linspace(0.25, 0.75, 3) * (x2 - x1), np.linspace(0.25, 0.75, 3) * (y2 - y1))
+                corners = np.stack([gx.ravel(), gy.ravel()], axis=1)[:, None, :]
+
+            corners = corners.astype(np.float32) + np.array([x1, y1], dtype=np.float32)
+            points.append(corners)
+            owner.append(np.full(len(corners), i))
+
+        if not points:
+            return np.zeros((0, 1, 2), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        return np.concatenate(points), np.concatenate(owner)
+
+    def _propagate_flow(self, gray: np.ndarray):
+        if len(self._points):
+            # 所有框的点一次性计算光流
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, self._points, None, **self.lk_params)
+            valid = status.ravel() == 1
+            if self.fb_threshold is not None:
+                back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, new_points, None, **self.lk_params)
+                fb_error = np.linalg.norm((back_points - self._points).reshape(-1, 2), axis=1)
+                valid &= (back_status.ravel() == 1) & (fb_error < self.fb_threshold)
+
+            old = self._points.reshape(-1, 2)[valid]
+            new = new_points.reshape(-1, 2)[valid]
+            owner = self._owner[valid]
+
+            for i in np.unique(owner):
+                mask = owner == i
+                shift = np.median(new[mask] - old[mask], axis=0)
+                scale = 1.0
+                if mask.sum() >= 2:
+                    # 点到中心距离的比值 → 尺度变化 (目标靠近 / 远离)
+                    d_old = np.linalg.norm(old[mask] - old[mask].mean(axis=0), axis=1)
+                    d_new = np.linalg.norm(new[mask] - new[mask].mean(axis=0), axis=1)
+                    if np.median(d_old) > 1e-3:
+                        scale = float(np.clip(np.median(d_new) / np.median(d_old), 0.9, 1.1))
+
+                x1, y1, x2, y2 = self.boxes[i]
+                cx, cy = (x1 + x2) / 2 + shift[0], (y1 + y2) / 2 + shift[1]
+                half_w, half_h = (x2 - x1) / 2 * scale, (y2 - y1) / 2 * scale
+                self.boxes[i] = (cx - half_w, cy - half_h, cx + half_w, cy + half_h)
+
+            self._points, self._owner = new.reshape(-1, 1, 2), owner
+        else:
+            self._points, self._owner = np.zeros((0, 1, 2), dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+        # 有效点太少的框 (遮挡、出画) 在当前帧重新取点
+        counts = np.bincount(self._owner, minlength=len(self.boxes))
+        lost = np.flatnonzero(counts < self.min_points)
+        if len(lost):
+            keep = ~np.isin(self._owner, lost)
+            points, owner = self._sample_points(gray, self.boxes, lost)
+            self._points = np.concatenate([self._points[keep], points])
+            self._owner = np.concatenate([self._owner[keep], owner])
+
+        self._prev_gray = gray
+
+    def _estimate_velocity(self, xyxy: np.ndarray, cls: np.ndarray) -> np.ndarray:
+        """把新检测与上一次的框 (已外推到当前帧) 按 IoU 贪心匹配，估计每帧速度"""
+        velocity = np.zeros((len(xyxy), 4), dtype=np.float32)
+        has_velocity = np.zeros(len(xyxy), dtype=bool)
+        if len(xyxy) == 0 or len(self.boxes) == 0:
+            self._has_velocity = has_velocity
+            return velocity
+        # 两次推理之间的帧数 (外推的帧 + 本帧)
+        elapsed = self._frames_since_reset + 1
+
+        iou = box_iou(xyxy, self.boxes)
+        iou[cls[:, None] != self.cls[None, :]] = 0
+        matched_new, matched_old = set(), set()
+        for flat in np.argsort(-iou, axis=None):
+            i, j = divmod(int(flat), iou.shape[1])
+            if iou[i, j] < self.match_iou:
+                break
+            if i in matched_new or j in matched_old:
+                continue
+            matched_new.add(i)
+            matched_old.add(j)
+
+            measured = (xyxy[i] - self._detected[j]) / elapsed
+            # 第一次匹配上的目标没有历史速度，直接使用测量值
+            a = self.velocity_smoothing if self._has_velocity[j] else 1.0
+            velocity[i] = a * measured + (1 - a) * self._velocity[j]
+            has_velocity[i] = True
+        self._has_velocity = has_velocity
+        return velocity
+
+
+def shift_result(result, xyxy: np.ndarray):
+    """
+    返回框替换为 xyxy 的结果副本 (Ultralytics Results)，
+    配合 result.plot(img=frame) 在当前帧上绘制推算后的框
+    """
+    data = result.boxes.data.cpu().numpy().copy()
+    data[:, :4] = xyxy
+    shifted = result.new()
+    shifted.update(boxes=data)
+    return shifted
@@ -0,0 +1,176 @@
+"""
+最新帧优先的摄像头采集
+后台线程持续读取摄像头，只保留最新的一帧
+
+推理比摄像头慢时，同步 cap.read() 会依次拿到驱动缓冲区里越来越旧的帧，
+显示延迟不断累积。这里旧帧直接丢弃，推理总是拿到最新的画面，
+并统计丢帧数和 采集 → 显示 的延迟
+
+注意: 读取视频文件时同样会丢帧 (解码多快就丢多快)，离线处理请直接使用 cv2.VideoCapture；
+把视频文件当作实时流模拟摄像头时，设置 realtime=True 按视频自身帧率读取
+"""
+
+from collections import deque
+from typing import Optional, Tuple, Union
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class LatestFrameCapture:
+    """
+    最新帧优先的采集线程，接口与 cv2.VideoCapture 保持一致 (read / isOpened / release)
+
+    Examples:
+        >>> cap = LatestFrameCapture(0, width=640, height=480)
+        >>> ret, frame, ts = cap.read_latest()
+        >>> ...  # 推理、绘制、显示
+        >>> cap.record_display(ts)
+        >>> print(cap.stats())
+    """
+
+    def __init__(
+        self,
+        source: Union[int, str] = 0,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        latency_window: int = 300,
+        realtime: bool = False
+    ):
+        """
+        Args:
+            source: 摄像头 ID 或视频流地址
+            width: 采集宽度 (在采集线程启动前设置)
+            height: 采集高度
+            latency_window: 延迟统计的滑动窗口大小 (帧)
+            realtime: 按 CAP_PROP_FPS 的节奏读取 (用视频文件模拟实时流)
+        """
+        self.cap = cv2.VideoCapture(source)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # 尽量减小驱动层缓冲 (部分后端不支持，忽略即可)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if realtime else 0
+        self._frame_interval = 1.0 / fps if fps and fps > 0 else 0.0
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._consumed = True
+        self._ended = False
+        self._stop = threading.Event()
+
+        self.captured = 0
+        self.consumed = 0
+        self.dropped = 0
+        self._latencies = deque(maxlen=latency_window)
+
+        self._thread = None
+        if self.cap.isOpened():
+            self._thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+            self._thread.start()
+
+    def _capture_loop(self):
+        try:
+            self._read_frames()
+        finally:
+            # 停止时由采集线程自己释放: 主线程 join 超时后不会在 cap.read() 期间并发调用 release
+            if self._stop.is_set():
+                self.cap.release()
+
+    def _read_frames(self):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            if self._frame_interval:
+                delay = start + self.captured * self._frame_interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            ret, frame = self.cap.read()
+            timestamp = time.perf_counter()
+
+            with self._cond:
+                if not ret:
+                    self._ended = True
+                    self._cond.notify_all()
+                    break
+
+                # 上一帧还没被取走就被覆盖 → 丢帧
+                if not self._consumed:
+                    self.dropped += 1
+                self._frame = frame
+                self._timestamp = timestamp
+                self._consumed = False
+                self.captured += 1
+                self._cond.notify_all()
+
+    def read_latest(self, timeout: float = 1.0) -> Tuple[bool, Optional[np.ndarray], float]:
+        """
+        等待并取出最新一帧 (每帧只会被取出一次)
+
+        Args:
+            timeout: 最长等待时间 (秒)
+
+        Returns:
+            (是否成功, 帧, 采集时间戳 time.perf_counter())
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: not self._consumed or self._ended, timeout=timeout)
+            if self._consumed:
+                return False, None, 0.0
+
+            self._consumed = True
+            self.consumed += 1
+            return True, self._frame, self._timestamp
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """与 cv2.VideoCapture.read 相同的接口"""
+        ret, frame, _ = self.read_latest()
+        return ret, frame
+
+    def record_display(self, timestamp: float):
+        """帧显示后调用，记录 采集 → 显示 延迟"""
+        self._latencies.append(time.perf_counter() - timestamp)
+
+    def stats(self) -> dict:
+        """采集统计: 采集 / 使用 / 丢弃帧数，延迟均值与 p95 (ms)"""
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return {
+            "captured": self.captured,
+            "consumed": self.consumed,
+            "dropped": self.dropped,
+            "drop_ratio": self.dropped / self.captured if self.captured else 0.0,
+            "latency_ms": float(latencies.mean()),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+        }
+
+    @property
+    def ended(self) -> bool:
+        """视频流已结束且最后一帧已被取走"""
+        return self._ended and self._consumed
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def get(self, prop_id: int) -> float:
+        return self.cap.get(prop_id)
+
+    def release(self):
+        """停止采集线程并释放摄像头"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        # 线程仍阻塞在 cap.read() 时由它退出时释放 (见 _capture_loop)
+        if self._thread is None or not self._thread.is_alive():
+            self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,308 @@
+"""
+长视频分段并行处理
+把一个视频按帧范围切成若干段，每段在独立进程中处理 (各自加载模型、各自 seek)，
+最后按顺序拼接标注视频和检测日志
+
+断点续跑: 每段完成后写入 .done 标记，重新运行同一任务时跳过已完成的段
+
+输出目录结构:
+    <output_dir>/<视频名>_chunks/
+        manifest.json           任务描述 (视频、模型、分段)
+        chunk_0000.mp4          分段标注视频
+        chunk_0000.jsonl        分段检测日志 (每行一帧)
+        chunk_0000.done         完成标记
+    <output_dir>/processed_<视频名>.mp4
+    <output_dir>/<视频名>_detections.jsonl
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, Union
+import json
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import time
+
+import cv2
+
+
+def split_frame_ranges(total_frames: int, num_chunks: int) -> list:
+    """
+    把 [0, total_frames) 均匀切成 num_chunks 段
+
+    Returns:
+        [(start, end), ...]，end 不包含
+    """
+    num_chunks = max(1, min(num_chunks, total_frames))
+    bounds = [round(i * total_frames / num_chunks) for i in range(num_chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(num_chunks)]
+
+
+class _RangeReader:
+    """只读取 [start, end) 范围内帧的 VideoCapture 包装 (供流水线使用)"""
+
+    def __init__(self, cap, start: int, end: int):
+        self.cap = cap
+        self.remaining = end - start
+        _seek(cap, start)
+
+    def read(self):
+        if self.remaining <= 0:
+            return False, None
+        self.remaining -= 1
+        return self.cap.read()
+
+
+def _seek(cap, start: int):
+    """
+    定位到第 start 帧
+    部分编码格式的 CAP_PROP_POS_FRAMES 定位不精确，此时从头逐帧 grab 到目标位置
+    """
+    if start == 0:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == start:
+        return
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(start):
+        if not cap.grab():
+            break
+
+
+def _chunk_paths(job_dir: Path, index: int) -> dict:
+    stem = f"chunk_{index:04d}"
+    return {
+        "video": job_dir / f"{stem}.mp4",
+        "log": job_dir / f"{stem}.jsonl",
+        "done": job_dir / f"{stem}.done",
+    }
+
+
+def process_chunk(task: dict) -> dict:
+    """
+    子进程: 处理一个帧范围，输出分段视频和检测日志
+
+    先写入临时文件，全部完成后再重命名并写 .done 标记，
+    进程中途崩溃不会留下"看起来完整"的分段
+
+    Args:
+        task: 包含 video_path、model_name、index、start、end、job_dir、fourcc、threads 的字典
+
+    Returns:
+        分段统计
+    """
+    from utils.model_loader import load_yolo_model
+    from utils.video_pipeline import VideoPipeline
+
+    if task.get("threads"):
+        # 多个进程同时推理时限制每个进程的线程数，避免 CPU 过度订阅
+        try:
+            import torch
+            torch.set_num_threads(task["threads"])
+        except ImportError:
+            pass
+
+    paths = _chunk_paths(Path(task["job_dir"]), task["index"])
+    tmp_video = paths["video"].with_suffix(".part.mp4")
+    tmp_log = paths["log"].with_suffix(".part.jsonl")
+
+    cap = cv2.VideoCapture(task["video_path"])
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    writer = cv2.VideoWriter(str(tmp_video), cv2.VideoWriter_fourcc(*task["fourcc"]), fps, (width, height))
+
+    model = load_yolo_model(task["model_name"])
+    frame_no = task["start"]
+
+    with open(tmp_log, "w", encoding="utf-8") as log:
+        def annotate(frame, result):
+            # 编码线程按帧顺序调用，这里顺便写检测日志
+            nonlocal frame_no
+            boxes = result.boxes
+            log.write(json.dumps({
+                "frame": frame_no,
+                "xyxy": [[round(v, 1) for v in box] for box in boxes.xyxy.tolist()],
+                "conf": [round(v, 4) for v in boxes.conf.tolist()],
+                "cls": [int(v) for v in boxes.cls.tolist()],
+            }) + "\n")
+            frame_no += 1
+            return result.plot(img=frame)
+
+        pipeline = VideoPipeline(model, annotate=annotate, batch_size=task.get("batch_size", 1))
+        stats = pipeline.run(_RangeReader(cap, task["start"], task["end"]), writer)
+
+    cap.release()
+    writer.release()
+
+    os.replace(tmp_video, paths["video"])
+    os.replace(tmp_log, paths["log"])
+    summary = {
+        "index": task["index"],
+        "start": task["start"],
+        "end": task["end"],
+        "frames": stats["frames"],
+        "wall_time": stats["wall_time"],
+    }
+    paths["done"].write_text(json.dumps(summary), encoding="utf-8")
+    return summary
+
+
+def _load_or_create_manifest(job_dir: Path, manifest: dict, check_ranges: bool = True) -> dict:
+    """
+    已有任务时校验参数一致并沿用其分段 (分段不同的话已完成的段无法复用)
+
+    Args:
+        check_ranges: 是否校验分段；未显式指定分段数时为 False，直接沿用已有任务的分段
+            (默认分段数随进程数 / CPU 核数变化，换机器或换进程数续跑也能复用已完成的段)
+    """
+    manifest_path = job_dir / "manifest.json"
+    if manifest_path.exists():
+        existing = json.loads(manifest_path.read_text(encoding="utf-8"))
+        keys = ("video_path", "model_name") + (("ranges",) if check_ranges else ())
+        if any(existing.get(k) != manifest[k] for k in keys):
+            raise ValueError(
+                f"{job_dir} 中已有参数不同的任务 (视频 / 模型 / 分段不一致)，"
+                f"请删除该目录或使用相同参数续跑"
+            )
+        return existing
+
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    return manifest
+
+
+def concat_videos(chunk_videos: list, output_path: Path, fourcc: str = "avc1"):
+    """
+    按顺序拼接分段视频
+    有 ffmpeg 时直接流拷贝 (不重新编码)，否则用 OpenCV 逐帧重新编码
+    """
+    if shutil.which("ffmpeg"):
+        list_file = output_path.with_suffix(".concat.txt")
+        list_file.write_text("".join(f"file '{p.resolve()}'\n" for p in chunk_videos), encoding="utf-8")
+        proc = subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", str(list_file), "-c", "copy", str(output_path)],
+        )
+        list_file.unlink(missing_ok=True)
+        if proc.returncode == 0:
+            return
+
+    writer = None
+    for path in chunk_videos:
+        cap = cv2.VideoCapture(str(path))
+        if writer is None:
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*fourcc), cap.get(cv2.CAP_PROP_FPS), size)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    if writer is not None:
+        writer.release()
+
+
+def process_video_chunked(
+    video_path: Union[str, Path],
+    model_name: str = "yolo11n.pt",
+    output_dir: Optional[Union[str, Path]] = None,
+    num_workers: Optional[int] = None,
+    num_chunks: Optional[int] = None,
+    batch_size: int = 1,
+    fourcc: str = "avc1"
+) -> dict:
+    """
+    多进程分段处理一个长视频 (支持断点续跑)
+
+    Args:
+        video_path: 输入视频
+        model_name: 模型名称 (每个进程各自加载)
+        output_dir: 输出目录，默认与视频同目录
+        num_workers: 并行进程数，默认 CPU 核数的一半
+        num_chunks: 分段数，默认 num_workers * 4 (段越小，崩溃后需要重做的越少)；
+            续跑且未指定时沿用已有任务的分段
+        batch_size: 每个进程内的推理批大小
+        fourcc: 输出视频编码
+
+    Returns:
+        任务统计: 分段数、本次处理 / 跳过的段、总帧数、耗时、输出路径
+    """
+    video_path = Path(video_path).resolve()
+    output_dir = Path(output_dir) if output_dir else video_path.parent
+    num_workers = num_workers or max(1, (os.cpu_count() or 2) // 2)
+    explicit_chunks = num_chunks is not None
+    num_chunks = num_chunks or num_workers * 4
+
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames <= 0:
+        raise ValueError(f"无法读取视频帧数: {video_path}")
+
+    job_dir = output_dir / f"{video_path.stem}_chunks"
+    job_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_or_create_manifest(job_dir, {
+        "video_path": str(video_path),
+        "model_name": model_name,
+        "total_frames": total_frames,
+        # JSON 中保存为列表，与续跑时读回的格式一致
+        "ranges": [list(r) for r in split_frame_ranges(total_frames, num_chunks)],
+    }, check_ranges=explicit_chunks)
+    ranges = [tuple(r) for r in manifest["ranges"]]
+
+    threads = max(1, (os.cpu_count() or 1) // num_workers)
+    tasks = [
+        {
+            "video_path": str(video_path),
+            "model_name": model_name,
+            "index": i,
+            "start": start,
+            "end": end,
+            "job_dir": str(job_dir),
+            "fourcc": fourcc,
+            "threads": threads,
+            "batch_size": batch_size,
+        }
+        for i, (start, end) in enumerate(ranges)
+        if not _chunk_paths(job_dir, i)["done"].exists()
+    ]
+    skipped = len(ranges) - len(tasks)
+    print(f"  分段: {len(ranges)} 段 (已完成 {skipped} 段，待处理 {len(tasks)} 段)，进程数: {num_workers}")
+
+    start_time = time.time()
+    if tasks:
+        # spawn: 避免 fork 后子进程继承 torch / OpenCV 的线程状态
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx) as pool:
+            futures = [pool.submit(process_chunk, task) for task in tasks]
+            for done_count, future in enumerate(as_completed(futures), 1):
+                summary = future.result()
+                print(
+                    f"  ✅ 段 {summary['index']:>3} [{summary['start']}, {summary['end']}) "
+                    f"{summary['frames'] / summary['wall_time']:.1f} FPS  ({done_count}/{len(tasks)})"
+                )
+
+    # 拼接 (只有全部分段完成后才会执行到这里)
+    output_video = output_dir / f"processed_{video_path.name}"
+    output_log = output_dir / f"{video_path.stem}_detections.jsonl"
+    chunk_paths = [_chunk_paths(job_dir, i) for i in range(len(ranges))]
+
+    concat_videos([p["video"] for p in chunk_paths], output_video, fourcc)
+    with open(output_log, "w", encoding="utf-8") as out:
+        for p in chunk_paths:
+            with open(p["log"], encoding="utf-8") as f:
+                shutil.copyfileobj(f, out)
+
+    return {
+        "chunks": len(ranges),
+        "processed": len(tasks),
+        "resumed": skipped,
+        "frames": total_frames,
+        "wall_time": time.time() - start_time,
+        "output_video": output_video,
+        "output_log": output_log,
+    }
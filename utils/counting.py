@@ -0,0 +1,365 @@
+"""
+越线计数与区域 (多边形) 计数
+配合 utils.tracker 的轨迹 ID 使用: 每条轨迹记录上一帧的锚点 (默认框底边中点)，
+本帧锚点的移动路径与计数线段相交即为一次越线，每个 ID 对每条线只计数一次，
+不会像"中心点落在线附近 ±offset 像素"那样被同一目标在连续几帧里重复计数
+
+CountingEngine 一帧只做一次向量化计算:
+- 越线: 所有轨迹的移动线段 × 所有计数线段的相交测试 → (轨迹数, 线数) 矩阵
+- 区域: 所有锚点 × 所有多边形边的射线法测试 → (轨迹数, 区域数) 矩阵
+增加计数线 / 区域只是矩阵变宽，没有"每个区域 × 每个目标"的 Python 循环
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def anchor_points(xyxy: np.ndarray, anchor: str = "bottom") -> np.ndarray:
+    """
+    框的锚点
+
+    Args:
+        xyxy: (N, 4) 框
+        anchor: "bottom" (底边中点，接近目标在地面上的位置) 或 "center"
+    """
+    cx = (xyxy[:, 0] + xyxy[:, 2]) / 2
+    y = xyxy[:, 3] if anchor == "bottom" else (xyxy[:, 1] + xyxy[:, 3]) / 2
+    return np.stack([cx, y], axis=1)
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """二维叉积 (支持广播)"""
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def segment_crossings(p0: np.ndarray, p1: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    移动线段 p0 → p1 与计数线段 start → end 的相交测试
+
+    Args:
+        p0, p1: (N, 2) 上一帧 / 当前帧锚点
+        starts, ends: (L, 2) 计数线段端点
+
+    Returns:
+        (N, L) bool，起点正好在线上的不算 (避免在线上停留时重复触发)
+    """
+    d1 = (p1 - p0)[:, None, :]              # (N, 1, 2)
+    d2 = (ends - starts)[None, :, :]        # (1, L, 2)
+    offset = starts[None, :, :] - p0[:, None, :]
+
+    denom = _cross(d1, d2)
+    parallel = np.abs(denom) < 1e-9
+    denom = np.where(parallel, 1.0, denom)
+    t = _cross(offset, d2) / denom          # 交点在移动线段上的位置
+    u = _cross(offset, d1) / denom          # 交点在计数线段上的位置
+    return ~parallel & (t > 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+
+def points_in_polygons(points: np.ndarray, edges: np.ndarray, edge_zone: np.ndarray, num_zones: int) -> np.ndarray:
+    """
+    射线法判断点是否在多边形内 (所有多边形的边拼在一起一次计算)
+
+    Args:
+        points: (N, 2) 点
+        edges: (E, 2, 2) 所有多边形的边 [[x0, y0], [x1, y1]]
+        edge_zone: (E,) 每条边属于哪个多边形
+        num_zones: 多边形数量
+
+    Returns:
+        (N, Z) bool
+    """
+    if len(points) == 0 or num_zones == 0:
+        return np.zeros((len(points), num_zones), dtype=bool)
+
+    px, py = points[:, 0:1], points[:, 1:2]                 # (N, 1)
+    x0, y0 = edges[None, :, 0, 0], edges[None, :, 0, 1]     # (1, E)
+    x1, y1 = edges[None, :, 1, 0], edges[None, :, 1, 1]
+
+    straddle = (y0 > py) != (y1 > py)
+    dy = np.where(y1 == y0, 1.0, y1 - y0)
+    x_at = x0 + (py - y0) * (x1 - x0) / dy
+    hits = (straddle & (px < x_at)).astype(np.float32)      # (N, E)
+
+    # 按所属多边形累加交点数，奇数为内部 (float32 矩阵乘走 BLAS，交点数很小，结果是精确整数)
+    one_hot = np.zeros((len(edges), num_zones), dtype=np.float32)
+    one_hot[np.arange(len(edges)), edge_zone] = 1
+    return (hits @ one_hot).astype(np.int64) % 2 == 1
+
+
+class CountingEngine:
+    """
+    多计数线 + 多区域计数引擎，按类别、按方向统计
+
+    - 计数线方向: 从线段起点看向终点，从左侧越到右侧记为 "in"，反之记为 "out" (图像坐标系 y 向下)
+    - 区域: 记录进入 / 离开次数和当前占用数
+
+    Examples:
+        >>> engine = CountingEngine(
+        ...     lines={"north": ((0, 300), (640, 300))},
+        ...     zones={"crosswalk": [(100, 400), (500, 400), (500, 480), (100, 480)]},
+        ... )
+        >>> tracks = tracker.update(det.xyxy, det.conf, det.cls)
+        >>> events = engine.update(tracks["ids"], tracks["xyxy"], tracks["cls"])
+        >>> print(engine.summary(result.names))
+    """
+
+    def __init__(
+        self,
+        lines: Optional[dict] = None,
+        zones: Optional[dict] = None,
+        anchor: str = "bottom",
+        max_age: int = 30,
+        num_classes: int = 80
+    ):
+        """
+        Args:
+            lines: {名称: ((x1, y1), (x2, y2))} 计数线段
+            zones: {名称: [(x, y), ...]} 多边形区域
+            anchor: 锚点，"bottom" 或 "center"
+            max_age: 轨迹多少帧未出现后清除其状态
+            num_classes: 类别数 (计数数组的初始大小，出现更大的类别 ID 时自动扩展)
+        """
+        lines = lines or {}
+        zones = zones or {}
+        self.line_names = list(lines)
+        self.zone_names = list(zones)
+        self.anchor = anchor
+        self.max_age = max_age
+
+        self.starts = np.array([lines[n][0] for n in self.line_names], dtype=np.float64).reshape(-1, 2)
+        self.ends = np.array([lines[n][1] for n in self.line_names], dtype=np.float64).reshape(-1, 2)
+
+        self.polygons = [np.asarray(zones[n], dtype=np.float64).reshape(-1, 2) for n in self.zone_names]
+        edges, edge_zone = [], []
+        for z, poly in enumerate(self.polygons):
+            edges.append(np.stack([poly, np.roll(poly, -1, axis=0)], axis=1))
+            edge_zone.append(np.full(len(poly), z))
+        self.edges = np.concatenate(edges) if edges else np.zeros((0, 2, 2))
+        self.edge_zone = np.concatenate(edge_zone) if edge_zone else np.zeros(0, dtype=np.int64)
+
+        # 计数: 线 (L, C, 2) [in, out]；区域 (Z, C) 进入 / 离开 / 当前占用
+        num_lines, num_zones = len(self.line_names), len(self.zone_names)
+        self.line_counts = np.zeros((num_lines, num_classes, 2), dtype=np.int64)
+        self.zone_entered = np.zeros((num_zones, num_classes), dtype=np.int64)
+        self.zone_exited = np.zeros((num_zones, num_classes), dtype=np.int64)
+        self.zone_occupancy = np.zeros((num_zones, num_classes), dtype=np.int64)
+
+        # 轨迹状态 (按 ID 排序，用 searchsorted 查找)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._points = np.zeros((0, 2))
+        self._inside = np.zeros((0, num_zones), dtype=bool)
+        self._counted = np.zeros((0, num_lines), dtype=bool)
+        self._last_seen = np.zeros(0, dtype=np.int64)
+        self.frame_id = 0
+
+    def _ensure_classes(self, max_cls: int):
+        extra = max_cls + 1 - self.line_counts.shape[1]
+        if extra > 0:
+            self.line_counts = np.pad(self.line_counts, ((0, 0), (0, extra), (0, 0)))
+            self.zone_entered = np.pad(self.zone_entered, ((0, 0), (0, extra)))
+            self.zone_exited = np.pad(self.zone_exited, ((0, 0), (0, extra)))
+            self.zone_occupancy = np.pad(self.zone_occupancy, ((0, 0), (0, extra)))
+
+    def _lookup(self, ids: np.ndarray) -> np.ndarray:
+        """ID → 状态行号，新 ID 先追加状态行"""
+        idx = np.searchsorted(self._ids, ids)
+        known = np.zeros(len(ids), dtype=bool)
+        if len(self._ids):
+            known = self._ids[np.minimum(idx, len(self._ids) - 1)] == ids
+
+        new = np.unique(ids[~known])
+        if len(new):
+            n = len(new)
+            self._ids = np.concatenate([self._ids, new])
+            self._points = np.concatenate([self._points, np.full((n, 2), np.nan)])
+            self._inside = np.concatenate([self._inside, np.zeros((n, self._inside.shape[1]), dtype=bool)])
+            self._counted = np.concatenate([self._counted, np.zeros((n, self._counted.shape[1]), dtype=bool)])
+            self._last_seen = np.concatenate([self._last_seen, np.zeros(n, dtype=np.int64)])
+            self._select(np.argsort(self._ids, kind="stable"))
+            idx = np.searchsorted(self._ids, ids)
+        return idx
+
+    def _select(self, rows: np.ndarray):
+        self._ids, self._points = self._ids[rows], self._points[rows]
+        self._inside, self._counted = self._inside[rows], self._counted[rows]
+        self._last_seen = self._last_seen[rows]
+
+    def update(self, ids: np.ndarray, xyxy: np.ndarray, cls: Optional[np.ndarray] = None) -> dict:
+        """
+        输入当前帧的轨迹，更新所有计数线和区域
+
+        Args:
+            ids: (N,) 轨迹 ID
+            xyxy: (N, 4) 轨迹框
+            cls: (N,) 类别，None 表示全部记为类别 0
+
+        Returns:
+            本帧事件 (line / zone 为索引，direction 为 "in" / "out"):
+            {"crossed": {"ids", "line", "direction", "cls"},
+             "entered": {"ids", "zone", "cls"},
+             "exited": {"ids", "zone", "cls"}}
+        """
+        self.frame_id += 1
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        cls = np.zeros(len(ids), dtype=np.int64) if cls is None else np.asarray(cls).reshape(-1).astype(np.int64)
+        points = anchor_points(np.asarray(xyxy, dtype=np.float64).reshape(-1, 4), self.anchor)
+        if len(cls):
+            self._ensure_classes(int(cls.max()))
+
+        rows = self._lookup(ids)
+        prev = self._points[rows]
+        has_prev = ~np.isnan(prev[:, 0])
+
+        # 越线: (N, L)
+        crossed = np.zeros((len(ids), len(self.line_names)), dtype=bool)
+        if len(self.line_names) and has_prev.any():
+            crossed[has_prev] = segment_crossings(prev[has_prev], points[has_prev], self.starts, self.ends)
+        crossed &= ~self._counted[rows]
+        t_idx, l_idx = np.nonzero(crossed)
+        # 方向取自运动方向 (上一帧 → 当前帧) 相对线段的朝向: 当前点恰好落在线上时也不会误判
+        side = np.sign(_cross(self.ends[l_idx] - self.starts[l_idx], points[t_idx] - prev[t_idx]))
+        direction = np.where(side > 0, 0, 1)  # 0 = in, 1 = out
+        np.add.at(self.line_counts, (l_idx, cls[t_idx], direction), 1)
+        self._counted[rows] |= crossed
+
+        # 区域: (N, Z)
+        inside = points_in_polygons(points, self.edges, self.edge_zone, len(self.zone_names))
+        was_inside = self._inside[rows]
+        e_t, e_z = np.nonzero(inside & ~was_inside)
+        x_t, x_z = np.nonzero(~inside & was_inside)
+        np.add.at(self.zone_entered, (e_z, cls[e_t]), 1)
+        np.add.at(self.zone_exited, (x_z, cls[x_t]), 1)
+
+        self._points[rows] = points
+        self._inside[rows] = inside
+        self._last_seen[rows] = self.frame_id
+
+        # 长时间未出现的轨迹清除状态
+        stale = self.frame_id - self._last_seen > self.max_age
+        if stale.any():
+            self._select(~stale)
+
+        # 当前占用 (只统计本帧出现的轨迹)
+        self.zone_occupancy[:] = 0
+        o_t, o_z = np.nonzero(inside)
+        np.add.at(self.zone_occupancy, (o_z, cls[o_t]), 1)
+
+        return {
+            "crossed": {"ids": ids[t_idx], "line": l_idx, "direction": np.array(["in", "out"])[direction], "cls": cls[t_idx]},
+            "entered": {"ids": ids[e_t], "zone": e_z, "cls": cls[e_t]},
+            "exited": {"ids": ids[x_t], "zone": x_z, "cls": cls[x_t]},
+        }
+
+    def is_counted(self, ids: np.ndarray) -> np.ndarray:
+        """
+        轨迹是否已被任意一条计数线计数 (状态随轨迹过期一起清除，内存有界)
+
+        Returns:
+            (N,) bool，未知 / 已过期的 ID 为 False
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(self._ids) == 0:
+            return np.zeros(len(ids), dtype=bool)
+        idx = np.minimum(np.searchsorted(self._ids, ids), len(self._ids) - 1)
+        return (self._ids[idx] == ids) & self._counted[idx].any(axis=1)
+
+    def summary(self, names: Optional[dict] = None) -> dict:
+        """
+        按线 / 区域、类别、方向汇总计数
+
+        Args:
+            names: 类别 ID → 名称，None 时使用类别 ID
+        """
+        def by_class(counts: np.ndarray) -> dict:
+            return {(names[c] if names else c): int(counts[c]) for c in np.flatnonzero(counts).tolist()}
+
+        lines = {}
+        for i, name in enumerate(self.line_names):
+            counts = self.line_counts[i]
+            lines[name] = {
+                "in": by_class(counts[:, 0]),
+                "out": by_class(counts[:, 1]),
+                "total": int(counts.sum()),
+            }
+
+        zones = {}
+        for i, name in enumerate(self.zone_names):
+            zones[name] = {
+                "entered": by_class(self.zone_entered[i]),
+                "exited": by_class(self.zone_exited[i]),
+                "occupancy": int(self.zone_occupancy[i].sum()),
+            }
+        return {"lines": lines, "zones": zones}
+
+    def draw(self, frame: np.ndarray, color: Tuple[int, int, int] = (0, 0, 255)) -> np.ndarray:
+        """绘制所有计数线 / 区域及其计数 (原地绘制)"""
+        for i, name in enumerate(self.line_names):
+            start = tuple(int(v) for v in self.starts[i])
+            end = tuple(int(v) for v in self.ends[i])
+            counts = self.line_counts[i].sum(axis=0)
+            cv2.line(frame, start, end, color, 3)
+            cv2.putText(frame, f"{name}: in {counts[0]}  out {counts[1]}", (start[0] + 10, start[1] - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+        for i, name in enumerate(self.zone_names):
+            poly = self.polygons[i].astype(np.int32)
+            cv2.polylines(frame, [poly], True, (255, 128, 0), 2)
+            x, y = poly[0].tolist()
+            cv2.putText(frame, f"{name}: {self.zone_occupancy[i].sum()}", (x + 5, y + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 128, 0), 2)
+        return frame
+
+
+class LineCounter:
+    """
+    单条计数线的越线计数 (CountingEngine 的简化接口)
+
+    方向: 从线段起点看向终点，从左侧越到右侧记为 "in"，反之记为 "out" (图像坐标系 y 向下)
+
+    Examples:
+        >>> counter = LineCounter((0, 400), (1280, 400))
+        >>> tracks = tracker.update(det.xyxy, det.conf, det.cls)
+        >>> crossed = counter.update(tracks["ids"], tracks["xyxy"])
+        >>> print(counter.total, counter.counts)
+    """
+
+    def __init__(
+        self,
+        start: Tuple[float, float],
+        end: Tuple[float, float],
+        anchor: str = "bottom",
+        max_age: int = 30
+    ):
+        """
+        Args:
+            start: 线段起点 (x, y)
+            end: 线段终点 (x, y)
+            anchor: 判断越线使用的锚点，"bottom" 或 "center"
+            max_age: 轨迹多少帧未出现后清除其状态
+        """
+        self.engine = CountingEngine(lines={"line": (start, end)}, anchor=anchor, max_age=max_age, num_classes=1)
+
+    @property
+    def counts(self) -> dict:
+        counts = self.engine.line_counts[0].sum(axis=0)
+        return {"in": int(counts[0]), "out": int(counts[1])}
+
+    @property
+    def total(self) -> int:
+        return int(self.engine.line_counts[0].sum())
+
+    def update(self, ids: np.ndarray, xyxy: np.ndarray) -> dict:
+        """
+        输入当前帧的轨迹，返回本帧越线的轨迹
+
+        Returns:
+            {"ids": 本帧越线的 ID, "direction": 对应方向 ("in" / "out")}
+        """
+        crossed = self.engine.update(ids, xyxy)["crossed"]
+        return {"ids": crossed["ids"], "direction": crossed["direction"]}
+
+    def draw(self, frame: np.ndarray, color: Tuple[int, int, int] = (0, 0, 255)) -> np.ndarray:
+        """在帧上绘制计数线和计数 (原地绘制)"""
+        return self.engine.draw(frame, color)
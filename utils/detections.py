@@ -0,0 +1,161 @@
+"""
+检测结果 → numpy 数组
+逐个遍历 `for box in result.boxes` 并调用 `box.xyxy[0].tolist()`、`.item()`、`.cpu()` 时，
+每次调用都是一次独立的张量操作 (GPU 上还伴随一次设备同步)，目标多时开销明显。
+
+这里把整个结果一次性拷贝到 CPU，拆成连续的 numpy 数组，后续的筛选、计算都用向量化操作完成，
+只在绘制时逐个遍历 (遍历的是 Python 列表，不再触碰张量)。
+
+同时支持 Ultralytics Results 和 utils.onnx_backend.OnnxResults。
+框的 IoU / NMS 也放在这里 (纯 numpy，不依赖任何推理后端)，跟踪、ROI 合并、装备关联等共用
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+def _to_numpy(x) -> np.ndarray:
+    """torch.Tensor / numpy 数组统一转成 numpy (一次设备拷贝)"""
+    if hasattr(x, "cpu"):
+        x = x.cpu()
+    if hasattr(x, "numpy"):
+        x = x.numpy()
+    return np.asarray(x)
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    计算两组框的 IoU 矩阵
+
+    Args:
+        boxes1: (N, 4) xyxy
+        boxes2: (M, 4) xyxy
+
+    Returns:
+        (N, M) IoU 矩阵
+    """
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+
+    lt = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    rb = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+
+    return inter / (area1[:, None] + area2[None, :] - inter + 1e-7)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float) -> np.ndarray:
+    """
+    非极大值抑制 (每轮向量化计算当前最高分框与其余框的 IoU)
+
+    Args:
+        boxes: (N, 4) xyxy
+        scores: (N,) 置信度
+        iou_thres: IoU 阈值
+
+    Returns:
+        保留框的索引 (按置信度降序)
+    """
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        ious = box_iou(boxes[i:i + 1], boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_thres]
+    return np.array(keep, dtype=np.int64)
+
+
+class Detections:
+    """
+    一帧的检测结果 (numpy 数组)
+
+    Attributes:
+        xyxy: (N, 4) float32 边界框
+        conf: (N,) float32 置信度
+        cls: (N,) int64 类别 ID
+        ids: (N,) int64 追踪 ID，没有追踪时为 None
+        masks: (N, H, W) 分割掩码，未请求或模型不输出时为 None
+        keypoints: (N, K, 3) 关键点 (x, y, conf)，未请求或模型不输出时为 None
+        names: 类别 ID → 名称
+    """
+
+    def __init__(
+        self,
+        xyxy: np.ndarray,
+        conf: np.ndarray,
+        cls: np.ndarray,
+        names: dict,
+        ids: Optional[np.ndarray] = None,
+        masks: Optional[np.ndarray] = None,
+        keypoints: Optional[np.ndarray] = None
+    ):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+        self.ids = ids
+        self.masks = masks
+        self.keypoints = keypoints
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+    def __getitem__(self, idx) -> "Detections":
+        """按索引 / 布尔掩码筛选，例如 det[det.conf > 0.5]、det[np.isin(det.cls, [2, 3])]"""
+        def take(arr):
+            return None if arr is None else arr[idx]
+
+        return Detections(
+            self.xyxy[idx], self.conf[idx], self.cls[idx], self.names,
+            ids=take(self.ids), masks=take(self.masks), keypoints=take(self.keypoints),
+        )
+
+    @property
+    def centers(self) -> np.ndarray:
+        """(N, 2) 框中心点"""
+        return (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2
+
+    @property
+    def labels(self) -> list:
+        """每个目标的类别名称"""
+        return [self.names[c] for c in self.cls.tolist()]
+
+
+def to_detections(result, masks: bool = False, keypoints: bool = False) -> Detections:
+    """
+    把一个检测结果转换为 numpy 数组 (框数据只做一次设备拷贝)
+
+    Args:
+        result: Ultralytics Results 或 OnnxResults
+        masks: 是否同时提取分割掩码 (分割模型)
+        keypoints: 是否同时提取关键点 (姿态 / 人脸模型)
+
+    Returns:
+        Detections
+    """
+    # Boxes.data: (N, 6) [x1, y1, x2, y2, conf, cls]，追踪时为 (N, 7) [..., id, conf, cls]
+    data = _to_numpy(result.boxes.data).astype(np.float32, copy=False)
+    ids = data[:, 4].astype(np.int64) if data.shape[1] == 7 else None
+
+    mask_data = None
+    if masks and getattr(result, "masks", None) is not None:
+        mask_data = _to_numpy(result.masks.data)
+
+    kpt_data = None
+    if keypoints and getattr(result, "keypoints", None) is not None:
+        kpt_data = _to_numpy(result.keypoints.data)
+
+    return Detections(
+        xyxy=data[:, :4],
+        conf=data[:, -2],
+        cls=data[:, -1].astype(np.int64),
+        names=result.names,
+        ids=ids,
+        masks=mask_data,
+        keypoints=kpt_data,
+    )
@@ -0,0 +1,270 @@
+"""
+徘徊 / 停留时长检测
+单帧规则只能回答"现在有没有人在禁区里"，回答不了"这个人在禁区里待了多久""是不是反复进出"。
+这里按轨迹 ID 维护固定大小的 numpy 环形缓冲:
+
+- 轨迹槽位: 最多 capacity 条轨迹同时被记录，长时间未出现的轨迹会被回收，槽位满时淘汰最久未出现的
+- 位置 / 区域归属历史: 每条轨迹最近 history 个采样 (位置、时间、所在区域)
+- 每个 (轨迹, 区域): 本次进入时间、累计停留时长、最近 revisit_count 次进入的时间
+
+所有数组在创建时分配好，运行时不会随人数或时长增长，适合 7x24 运行。
+区域归属由 utils.zone_index.ZoneIndex 查表得到。
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.counting import anchor_points
+from utils.zone_index import ZoneIndex
+
+
+class DwellMonitor:
+    """
+    按轨迹统计区域停留时长，检测徘徊 (停留过久) 和反复进入
+
+    Examples:
+        >>> monitor = DwellMonitor({"gate": gate_polygon}, frame.shape, dwell_seconds=30)
+        >>> tracks = tracker.update(det.xyxy, det.conf, det.cls)
+        >>> events = monitor.update(tracks["ids"], tracks["xyxy"], t=frame_time)
+        >>> for track_id, zone, dwell in zip(*events["loitering"].values()):
+        ...     print(f"#{track_id} 在 {monitor.zone_names[zone]} 停留 {dwell:.0f}s")
+    """
+
+    def __init__(
+        self,
+        zones: dict,
+        frame_shape: Tuple[int, int],
+        dwell_seconds: float = 30.0,
+        revisit_count: int = 3,
+        revisit_window: float = 300.0,
+        capacity: int = 512,
+        history: int = 64,
+        max_age: float = 10.0,
+        anchor: str = "bottom",
+        cell: int = 8
+    ):
+        """
+        Args:
+            zones: {区域名: [(x, y), ...]} 像素坐标多边形
+            frame_shape: 画面尺寸 (h, w, ...)
+            dwell_seconds: 连续停留超过多少秒触发徘徊告警 (每次进入只告警一次)
+            revisit_count: revisit_window 秒内进入同一区域达到多少次触发反复进入告警
+            revisit_window: 反复进入的统计窗口 (秒)
+            capacity: 最多同时记录多少条轨迹
+            history: 每条轨迹保留最近多少个位置采样
+            max_age: 轨迹超过多少秒未出现即回收槽位
+            anchor: 判断区域用的锚点 ("bottom" 脚点 / "center" 中心)
+            cell: 区域索引的网格大小 (像素)
+        """
+        self.zone_names = list(zones)
+        self.index = ZoneIndex([np.asarray(p, dtype=np.float64) for p in zones.values()], frame_shape, cell=cell)
+        self.dwell_seconds = dwell_seconds
+        self.revisit_count = revisit_count
+        self.revisit_window = revisit_window
+        self.capacity = capacity
+        self.history = history
+        self.max_age = max_age
+        self.anchor = anchor
+
+        num_zones = len(self.zone_names)
+        # 轨迹槽位 (ids = -1 表示空闲)
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        # 位置 / 区域归属环形缓冲: head 指向下一次写入的位置，count 为有效采样数
+        self.positions = np.zeros((capacity, history, 2), dtype=np.float32)
+        self.times = np.zeros((capacity, history), dtype=np.float64)
+        self.membership = np.zeros((capacity, history, num_zones), dtype=bool)
+        self.head = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        # 每个 (轨迹, 区域) 的状态
+        self.inside = np.zeros((capacity, num_zones), dtype=bool)
+        self.enter_time = np.full((capacity, num_zones), np.nan)
+        self.dwell_total = np.zeros((capacity, num_zones), dtype=np.float64)
+        self.alerted = np.zeros((capacity, num_zones), dtype=bool)
+        self.entries = np.full((capacity, num_zones, revisit_count), -np.inf)  # 最近几次进入时间 (环形)
+        self.entry_count = np.zeros((capacity, num_zones), dtype=np.int64)
+
+        self.evicted = 0
+
+    @property
+    def active(self) -> int:
+        """当前占用的轨迹槽位数"""
+        return int((self.ids >= 0).sum())
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲区占用的内存 (字节)，创建后固定不变"""
+        return sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+
+    def _clear(self, slots: np.ndarray):
+        self.ids[slots] = -1
+        self.head[slots] = 0
+        self.count[slots] = 0
+        self.membership[slots] = False
+        self.inside[slots] = False
+        self.enter_time[slots] = np.nan
+        self.dwell_total[slots] = 0
+        self.alerted[slots] = False
+        self.entries[slots] = -np.inf
+        self.entry_count[slots] = 0
+
+    def _slots(self, ids: np.ndarray, t: float) -> np.ndarray:
+        """轨迹 ID → 槽位 (新 ID 分配空闲槽位，没有空闲时淘汰最久未出现的轨迹)"""
+        used = np.nonzero(self.ids >= 0)[0]
+        order = used[np.argsort(self.ids[used], kind="stable")]
+        sorted_ids = self.ids[order]
+        slots = np.full(len(ids), -1, dtype=np.int64)
+        found = np.zeros(len(ids), dtype=bool)
+        if len(sorted_ids):
+            pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+            found = sorted_ids[pos] == ids
+            slots[found] = order[pos[found]]
+
+        new = np.nonzero(~found)[0]
+        if len(new):
+            free = np.nonzero(self.ids < 0)[0]
+            if len(free) < len(new):
+                # 槽位不够: 淘汰本帧没有出现、且最久未出现的轨迹
+                candidates = np.setdiff1d(used, slots[found])
+                victims = candidates[np.argsort(self.last_seen[candidates])][:len(new) - len(free)]
+                self._clear(victims)
+                self.evicted += len(victims)
+                free = np.nonzero(self.ids < 0)[0]
+            take = free[:len(new)]
+            new = new[:len(take)]  # 本帧轨迹数超过 capacity 时多出的部分不记录
+            slots[new] = take
+            self.ids[take] = ids[new]
+            self.first_seen[take] = t
+        return slots
+
+    def update(self, ids: np.ndarray, xyxy: np.ndarray, t: float) -> dict:
+        """
+        输入当前帧的轨迹
+
+        Args:
+            ids: (N,) 轨迹 ID
+            xyxy: (N, 4) 轨迹框
+            t: 帧时间 (秒，视频时间或 time.time())
+
+        Returns:
+            本帧事件 (zone 为区域索引):
+            {"loitering": {"ids", "zone", "dwell"}  连续停留超过 dwell_seconds (每次进入告警一次),
+             "revisit": {"ids", "zone", "visits"}   revisit_window 内进入次数达到 revisit_count}
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        points = anchor_points(np.asarray(xyxy, dtype=np.float64).reshape(-1, 4), self.anchor)
+
+        # 回收长时间未出现的轨迹
+        stale = (self.ids >= 0) & (t - self.last_seen > self.max_age)
+        if stale.any():
+            self._clear(np.nonzero(stale)[0])
+            self.evicted += int(stale.sum())
+
+        slots = self._slots(ids, t)
+        keep = slots >= 0
+        ids, points, slots = ids[keep], points[keep], slots[keep]
+        inside = self.index.lookup(points)                       # (N, Z)
+
+        # 写入环形缓冲
+        head = self.head[slots]
+        self.positions[slots, head] = points
+        self.times[slots, head] = t
+        self.membership[slots, head] = inside
+        self.head[slots] = (head + 1) % self.history
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.history)
+        self.last_seen[slots] = t
+
+        # 进入 / 离开
+        was_inside = self.inside[slots]
+        entered = inside & ~was_inside
+        exited = ~inside & was_inside
+        enter_time = self.enter_time[slots]
+        dwell_total = self.dwell_total[slots]
+        dwell_total[exited] += t - enter_time[exited]
+        enter_time[exited] = np.nan
+        enter_time[entered] = t
+
+        e_t, e_z = np.nonzero(entered)
+        e_slots = slots[e_t]
+        self.entries[e_slots, e_z, self.entry_count[e_slots, e_z] % self.revisit_count] = t
+        self.entry_count[e_slots, e_z] += 1
+        alerted = self.alerted[slots]
+        alerted[entered] = False
+
+        self.inside[slots] = inside
+        self.enter_time[slots] = enter_time
+        self.dwell_total[slots] = dwell_total
+
+        # 徘徊: 本次连续停留超过阈值，每次进入只告警一次
+        dwell = np.where(inside, t - np.nan_to_num(enter_time, nan=t), 0.0)
+        loiter = inside & (dwell >= self.dwell_seconds) & ~alerted
+        alerted |= loiter
+        self.alerted[slots] = alerted
+        l_t, l_z = np.nonzero(loiter)
+
+        # 反复进入: 最近 revisit_count 次进入都在窗口内 (只在进入的那一帧判断)
+        oldest = self.entries[e_slots, e_z].min(axis=1) if len(e_slots) else np.zeros(0)
+        revisit = t - oldest <= self.revisit_window
+        r_t, r_z = e_t[revisit], e_z[revisit]
+
+        return {
+            "loitering": {"ids": ids[l_t], "zone": l_z, "dwell": dwell[l_t, l_z]},
+            "revisit": {"ids": ids[r_t], "zone": r_z, "visits": self.entry_count[slots[r_t], r_z]},
+        }
+
+    def _slot_of(self, track_id: int) -> Optional[int]:
+        slot = np.nonzero(self.ids == track_id)[0]
+        return int(slot[0]) if len(slot) else None
+
+    def dwell(self, track_id: int, t: float) -> np.ndarray:
+        """
+        某条轨迹在各区域的累计停留时长 (秒)，包括当前这次尚未离开的停留
+
+        Returns:
+            (Z,) 轨迹已被回收时为全 0
+        """
+        slot = self._slot_of(track_id)
+        if slot is None:
+            return np.zeros(len(self.zone_names))
+        current = np.where(self.inside[slot], t - np.nan_to_num(self.enter_time[slot], nan=t), 0.0)
+        return self.dwell_total[slot] + current
+
+    def trail(self, track_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        某条轨迹最近的历史 (按时间顺序)
+
+        Returns:
+            (位置 (K, 2), 时间 (K,), 区域归属 (K, Z))
+        """
+        slot = self._slot_of(track_id)
+        if slot is None:
+            return np.zeros((0, 2), np.float32), np.zeros(0), np.zeros((0, len(self.zone_names)), bool)
+        n = self.count[slot]
+        order = (self.head[slot] - n + np.arange(n)) % self.history
+        return self.positions[slot, order], self.times[slot, order], self.membership[slot, order]
+
+    def draw(
+        self,
+        frame: np.ndarray,
+        t: float,
+        color: Tuple[int, int, int] = (0, 165, 255),
+        alert_color: Tuple[int, int, int] = (0, 0, 255)
+    ) -> np.ndarray:
+        """绘制轨迹尾迹和区域内目标的停留时长 (原地绘制)"""
+        for slot in np.nonzero(self.ids >= 0)[0].tolist():
+            n = self.count[slot]
+            if n == 0:
+                continue
+            order = (self.head[slot] - n + np.arange(n)) % self.history
+            trail = self.positions[slot, order].round().astype(np.int32)
+            alert = self.alerted[slot].any()
+            cv2.polylines(frame, [trail], False, alert_color if alert else color, 2)
+            if self.inside[slot].any():
+                dwell = (t - np.nanmin(np.where(self.inside[slot], self.enter_time[slot], np.nan)))
+                x, y = trail[-1].tolist()
+                cv2.putText(frame, f"{dwell:.0f}s", (x + 5, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                            alert_color if alert else color, 2)
+        return frame
@@ -0,0 +1,302 @@
+"""
+场景变化门控 (关键帧选择)
+固定机位的视频中相邻帧几乎相同，没必要每帧都跑 YOLO
+
+在缩小的灰度图上计算当前帧与上一次推理帧 (关键帧) 的差异:
+- "diff": 平均绝对像素差 (0~255)
+- "hist": 灰度直方图的 Bhattacharyya 距离 (0~1)
+
+差异超过阈值才重新推理，否则复用上一次的检测结果；
+连续复用超过 max_stale 帧时强制推理一次，避免结果过期太久
+
+ZoneMotionGate 则按区域判断: 背景建模后只看配置的区域内有没有运动
+"""
+
+from typing import Optional, Tuple
+import time
+
+import cv2
+import numpy as np
+
+
+# 各方法的默认阈值
+DEFAULT_THRESHOLDS = {
+    "diff": 4.0,
+    "hist": 0.08,
+}
+
+
+class SceneChangeGate:
+    """
+    场景变化门控
+
+    Examples:
+        >>> gate = SceneChangeGate(method="diff", max_stale=30)
+        >>> if gate.should_infer(frame):
+        ...     last_result = model(frame)[0]
+        >>> print(gate.stats())
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        method: str = "diff",
+        size: Tuple[int, int] = (64, 36),
+        max_stale: int = 30
+    ):
+        """
+        Args:
+            threshold: 变化阈值，None 表示使用该方法的默认值
+            method: "diff" (像素差) 或 "hist" (直方图距离)
+            size: 比较前缩放到的尺寸 (w, h)，越小越快、对噪声越不敏感
+            max_stale: 最多连续复用多少帧，之后强制推理
+        """
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"不支持的方法: {method}，可选: {list(DEFAULT_THRESHOLDS)}")
+
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.size = size
+        self.max_stale = max_stale
+        self.reset()
+
+    def reset(self):
+        """清空关键帧和统计"""
+        self._reference = None
+        self._stale = 0
+        self.frames = 0
+        self.inferred = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_score = 0.0
+
+    def _signature(self, frame: np.ndarray) -> np.ndarray:
+        """缩小的灰度图 (diff) 或归一化直方图 (hist)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        if self.method == "diff":
+            return small.astype(np.float32)
+
+        hist = cv2.calcHist([small], [0], None, [32], [0, 256])
+        return cv2.normalize(hist, hist).astype(np.float32)
+
+    def _distance(self, a: np.ndarray, b: np.ndarray) -> float:
+        if self.method == "diff":
+            return float(cv2.absdiff(a, b).mean())
+        return float(cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA))
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        """
+        判断当前帧是否需要推理 (需要时当前帧成为新的关键帧)
+
+        Args:
+            frame: BGR 或灰度帧
+
+        Returns:
+            True 表示需要推理，False 表示可以复用上一次结果
+        """
+        self.frames += 1
+        signature = self._signature(frame)
+
+        if self._reference is None:
+            infer = True
+            self.last_score = float("inf")
+        else:
+            # 与关键帧比较 (而不是上一帧)，缓慢的累积变化也能被发现
+            self.last_score = self._distance(signature, self._reference)
+            infer = self.last_score > self.threshold
+            if not infer and self._stale >= self.max_stale:
+                infer = True
+                self.forced += 1
+
+        if infer:
+            self._reference = signature
+            self._stale = 0
+            self.inferred += 1
+        else:
+            self._stale += 1
+            self.skipped += 1
+        return infer
+
+    def stats(self) -> dict:
+        """门控统计: 总帧数、推理帧数、跳过帧数、强制推理次数、跳过比例"""
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "forced": self.forced,
+            "skip_ratio": self.skipped / self.frames if self.frames else 0.0,
+        }
+
+
+class ZoneMotionGate:
+    """
+    按区域的运动门控
+    禁区大部分时间是空的，没必要每帧都跑检测。在缩小的画面上做背景建模 (MOG2 或滑动平均)，
+    统计每个区域内前景像素的比例，只有某个区域有运动时才推理 (可以只裁剪推理有运动的区域)。
+
+    静止的目标会逐渐被背景模型吸收，因此运动消失后继续推理 hold 帧，
+    并且连续跳过 max_stale 帧后强制推理一次
+
+    Examples:
+        >>> gate = ZoneMotionGate({"gate": polygon}, frame.shape, method="mog2")
+        >>> if gate.should_infer(frame):
+        ...     rois = gate.active_rois()           # 只裁剪有运动的区域
+        ...     result = model(frame)[0]
+        >>> print(gate.stats()["duty_cycle"])       # 实际推理的帧占比
+    """
+
+    def __init__(
+        self,
+        zones: dict,
+        frame_shape: Tuple[int, int],
+        method: str = "mog2",
+        scale: float = 0.25,
+        threshold: float = 0.01,
+        hold: int = 15,
+        max_stale: int = 150,
+        warmup: int = 5,
+        history: int = 300,
+        var_threshold: float = 16.0,
+        alpha: float = 0.05,
+        diff_threshold: float = 25.0
+    ):
+        """
+        Args:
+            zones: {区域名: [(x, y), ...]} 像素坐标多边形
+            frame_shape: 画面尺寸 (h, w, ...)
+            method: "mog2" (OpenCV MOG2 背景建模) 或 "avg" (滑动平均背景 + 帧差)
+            scale: 背景建模使用的缩放比例
+            threshold: 区域内前景像素占比超过多少视为有运动
+            hold: 运动消失后继续推理的帧数
+            max_stale: 最多连续跳过多少帧，之后强制推理一次
+            warmup: 开头强制推理的帧数 (背景模型还没建立)
+            history / var_threshold: MOG2 参数
+            alpha / diff_threshold: "avg" 的背景更新速率和前景阈值 (灰度差)
+        """
+        if method not in ("mog2", "avg"):
+            raise ValueError(f"不支持的方法: {method}，可选: ['mog2', 'avg']")
+
+        self.zone_names = list(zones)
+        self.polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in zones.values()]
+        self.method = method
+        self.scale = scale
+        self.threshold = threshold
+        self.hold = hold
+        self.max_stale = max_stale
+        self.warmup = warmup
+        self.alpha = alpha
+        self.diff_threshold = diff_threshold
+
+        h, w = frame_shape[:2]
+        self.frame_shape = (h, w)
+        self.size = (max(int(round(w * scale)), 1), max(int(round(h * scale)), 1))
+
+        # 每个区域在缩小画面上的掩码，拼成 (Z, 像素数) 矩阵: 一次矩阵乘得到各区域的前景像素数
+        masks = np.zeros((len(self.polygons), self.size[1], self.size[0]), dtype=np.uint8)
+        for z, poly in enumerate(self.polygons):
+            cv2.fillPoly(masks[z], [np.round(poly * scale).astype(np.int32)], 1)
+        self._masks = masks.reshape(len(self.polygons), -1).astype(np.float32)
+        self._areas = np.maximum(self._masks.sum(axis=1), 1.0)
+
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=history, varThreshold=var_threshold, detectShadows=False
+            )
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.reset()
+
+    def reset(self):
+        """清空背景模型和统计"""
+        self._background = None
+        self._hold_left = np.zeros(len(self.polygons), dtype=np.int64)
+        self._stale = 0
+        self.activity = np.zeros(len(self.polygons), dtype=np.float32)
+        self.active = np.zeros(len(self.polygons), dtype=bool)
+        self.frames = 0
+        self.inferred = 0
+        self.skipped = 0
+        self.forced = 0
+        self.zone_active_frames = np.zeros(len(self.polygons), dtype=np.int64)
+        self.gate_time = 0.0
+
+    def _foreground(self, frame: np.ndarray) -> np.ndarray:
+        """缩小画面的前景掩码 (0 / 1)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        if self._subtractor is not None:
+            fg = self._subtractor.apply(small)
+        else:
+            small = small.astype(np.float32)
+            if self._background is None:
+                self._background = small.copy()
+            fg = (cv2.absdiff(small, self._background) > self.diff_threshold).astype(np.uint8)
+            cv2.accumulateWeighted(small, self._background, self.alpha)
+        # 开运算去掉零散噪点
+        fg = cv2.morphologyEx((fg > 0).astype(np.uint8), cv2.MORPH_OPEN, self._kernel)
+        return fg
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        """
+        更新背景模型并判断当前帧是否需要推理
+
+        Returns:
+            True 表示至少一个区域有运动 (或处于 hold / 预热 / 强制推理)
+        """
+        start = time.perf_counter()
+        self.frames += 1
+        fg = self._foreground(frame).reshape(-1).astype(np.float32)
+        self.activity = (self._masks @ fg) / self._areas
+
+        moving = self.activity > self.threshold
+        self._hold_left = np.where(moving, self.hold, np.maximum(self._hold_left - 1, 0))
+        self.active = moving | (self._hold_left > 0)
+
+        infer = bool(self.active.any())
+        if not infer and (self.frames <= self.warmup or self._stale >= self.max_stale):
+            # 预热 / 长时间未推理: 所有区域都推理一次
+            infer = True
+            self.active[:] = True
+            self.forced += 1
+
+        if infer:
+            self._stale = 0
+            self.inferred += 1
+            self.zone_active_frames += self.active
+        else:
+            self._stale += 1
+            self.skipped += 1
+        self.gate_time += time.perf_counter() - start
+        return infer
+
+    def active_rois(self) -> list:
+        """有运动 (或处于 hold) 的区域的外接矩形 (x1, y1, x2, y2)，用于裁剪推理"""
+        rois = []
+        for poly, active in zip(self.polygons, self.active.tolist()):
+            if active:
+                x1, y1 = np.floor(poly.min(axis=0)).astype(int).tolist()
+                x2, y2 = np.ceil(poly.max(axis=0)).astype(int).tolist()
+                rois.append((x1, y1, x2, y2))
+        return rois
+
+    def stats(self) -> dict:
+        """
+        门控统计
+
+        Returns:
+            frames / inferred / skipped / forced,
+            duty_cycle: 实际推理的帧占比 (越低越省算力),
+            zone_duty: {区域名: 该区域被推理的帧占比},
+            gate_ms: 门控本身每帧的平均耗时
+        """
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "forced": self.forced,
+            "duty_cycle": self.inferred / frames,
+            "zone_duty": {name: float(n) / frames for name, n in zip(self.zone_names, self.zone_active_frames.tolist())},
+            "gate_ms": self.gate_time / frames * 1000,
+        }
@@ -73,6 +73,28 @@ def get_sample_image(name: str = "bus.jpg", download_if_missing: bool = True) ->
     return local_path
 
 
+def get_coco8_data_yaml(output_dir: Path) -> Path:
+    """
+    生成指向本地 datasets/coco8 的数据集配置文件
+    (05_yolo_training/01_dataset_prep/coco8_local.yaml 中写的是绝对路径，换机器后不可用)
+    
+    Args:
+        output_dir: 配置文件保存目录
+    
+    Returns:
+        生成的 yaml 路径，可直接传给 model.val(data=...)
+    """
+    src = PROJECT_ROOT / "05_yolo_training" / "01_dataset_prep" / "coco8_local.yaml"
+    lines = src.read_text(encoding="utf-8").splitlines()
+    lines = [f"path: {DATASETS_DIR / 'coco8'}" if line.startswith("path:") else line for line in lines]
+    
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    dst = output_dir / "coco8_local.yaml"
+    dst.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return dst
+
+
 def list_sample_images() -> list:
     """
     列出所有可用的示例图像
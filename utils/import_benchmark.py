@@ -0,0 +1,123 @@
+"""
+导入耗时基准测试
+统计 utils 各子模块的冷启动导入耗时，以及是否会连带导入 torch / ultralytics
+
+每次测量都在全新的子进程中完成 (避免 sys.modules 缓存影响结果)
+运行: python utils/import_benchmark.py
+"""
+
+from pathlib import Path
+import json
+import statistics
+import subprocess
+import sys
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 默认测量的导入语句
+DEFAULT_TARGETS = [
+    "utils",
+    "utils.helpers",
+    "utils.image_loader",
+    "utils.model_loader",
+    "utils.onnx_backend",
+    # 参考: 第三方依赖本身的导入耗时
+    "cv2",
+    "numpy",
+    "torch",
+    "ultralytics",
+    "onnxruntime",
+]
+
+# 需要关注是否被连带导入的重量级依赖
+HEAVY_MODULES = ["torch", "ultralytics"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(target: str, repeat: int = 3) -> dict:
+    """
+    在独立子进程中测量一次 `import target` 的耗时
+
+    Args:
+        target: 模块名，如 "utils.helpers"
+        repeat: 重复次数 (取中位数)
+
+    Returns:
+        测量结果字典 (失败时包含 error 字段)
+    """
+    code = _PROBE.format(target=target, heavy=HEAVY_MODULES)
+    timings = []
+    loaded = []
+
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=str(PROJECT_ROOT),
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+            return {"target": target, "error": error}
+
+        data = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(data["seconds"])
+        loaded = data["loaded"]
+
+    return {
+        "target": target,
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "heavy_loaded": loaded,
+    }
+
+
+def run_benchmark(targets: list = None, repeat: int = 3) -> list:
+    """
+    测量一组模块的导入耗时
+
+    Args:
+        targets: 模块名列表，默认 DEFAULT_TARGETS
+        repeat: 每个模块重复次数
+
+    Returns:
+        测量结果列表
+    """
+    return [measure_import(target, repeat) for target in (targets or DEFAULT_TARGETS)]
+
+
+def print_report(results: list):
+    """打印导入耗时报告"""
+    print(f"\n{'模块':<22} {'中位数':>10} {'最小':>10} {'最大':>10}   连带导入")
+    print("-" * 72)
+    for r in results:
+        if "error" in r:
+            print(f"{r['target']:<22} {'-':>10} {'-':>10} {'-':>10}   ❌ {r['error']}")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "-"
+        print(
+            f"{r['target']:<22} {r['median_ms']:>8.1f}ms {r['min_ms']:>8.1f}ms "
+            f"{r['max_ms']:>8.1f}ms   {heavy}"
+        )
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("⏱️ 导入耗时基准测试")
+    print("=" * 60)
+    print(f"\n🐍 Python: {sys.executable}")
+
+    results = run_benchmark(repeat=3)
+    print_report(results)
+
+    print("\n💡 `import utils` 不应连带导入 torch / ultralytics，")
+    print("   只需要 load_image / draw_bbox 的脚本请直接 `from utils.helpers import ...`")
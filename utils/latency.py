@@ -0,0 +1,172 @@
+"""
+实时循环的分阶段延迟统计
+平滑 FPS 只能说明"慢"，说明不了"慢在哪"。这里按阶段记录每帧耗时:
+
+    capture → preprocess → inference → postprocess → draw → display
+    total: 采集 → 显示 的端到端 (glass-to-glass) 延迟
+
+每个阶段保留最近 window 帧的耗时，输出 p50 / p95 / p99，可以导出 JSON 或叠加在画面上。
+preprocess / inference / postprocess 直接取自 result.speed (Ultralytics 和 OnnxResults 都有)
+"""
+
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+import json
+import time
+
+import cv2
+import numpy as np
+
+
+class LatencyTracker:
+    """
+    分阶段延迟统计 (滚动窗口)
+
+    Examples:
+        >>> tracker = LatencyTracker()
+        >>> tracker.start_frame()
+        >>> with tracker.stage("capture"):
+        ...     ret, frame = cap.read()
+        >>> result = model(frame)[0]
+        >>> tracker.add_speed(result.speed)
+        >>> with tracker.stage("draw"):
+        ...     annotated = result.plot()
+        >>> with tracker.stage("display"):
+        ...     cv2.imshow("win", annotated); cv2.waitKey(1)
+        >>> tracker.end_frame()
+        >>> tracker.draw_overlay(annotated)
+    """
+
+    def __init__(self, window: int = 300):
+        """
+        Args:
+            window: 每个阶段保留最近多少帧的耗时
+        """
+        self.window = window
+        self._samples = OrderedDict()
+        self._frame_start = None
+        self.frames = 0
+
+    def start_frame(self, capture_time: Optional[float] = None):
+        """
+        一帧开始时调用
+
+        Args:
+            capture_time: 帧的采集时间戳 (time.perf_counter())，例如 LatestFrameCapture.read_latest 返回的时间戳。
+                          给出时端到端延迟从采集时刻算起，并记录帧在采集缓冲中等待的时间 ("capture" 阶段)
+        """
+        now = time.perf_counter()
+        if capture_time is not None:
+            self.add("capture", now - capture_time)
+            self._frame_start = capture_time
+        else:
+            self._frame_start = now
+
+    def end_frame(self):
+        """帧显示后调用，记录端到端延迟 ("total")"""
+        if self._frame_start is not None:
+            self.add("total", time.perf_counter() - self._frame_start)
+            self._frame_start = None
+            self.frames += 1
+
+    def add(self, stage: str, seconds: float):
+        """记录一个阶段的耗时 (秒)"""
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """计时一个阶段: with tracker.stage("draw"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add_speed(self, speed: dict):
+        """记录 result.speed 中的 preprocess / inference / postprocess (单位 ms)"""
+        for name in ("preprocess", "inference", "postprocess"):
+            if speed.get(name) is not None:
+                self.add(name, speed[name] / 1000)
+
+    def summary(self) -> dict:
+        """
+        各阶段统计 (ms)，"total" 排在最后
+
+        Returns:
+            {阶段: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}}
+        """
+        stages = [name for name in self._samples if name != "total"]
+        if "total" in self._samples:
+            stages.append("total")
+
+        summary = {}
+        for name in stages:
+            values = np.array(self._samples[name]) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[name] = {
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+            }
+        return summary
+
+    def dump_json(self, path: Union[str, Path]) -> Path:
+        """把统计写入 JSON 文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "frames": self.frames,
+            "window": self.window,
+            "stages": self.summary(),
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+        return path
+
+    def draw_overlay(
+        self,
+        frame: np.ndarray,
+        origin: Tuple[int, int] = (10, 150),
+        stages: Optional[Sequence[str]] = None,
+        color: Tuple[int, int, int] = (255, 255, 255)
+    ) -> np.ndarray:
+        """
+        在画面上叠加各阶段 p50 / p95 / p99 (原地绘制)
+
+        Args:
+            frame: 要绘制的帧
+            origin: 第一行文字的左下角
+            stages: 只显示这些阶段，None 表示全部
+            color: 文字颜色 (BGR)
+        """
+        summary = self.summary()
+        lines = ["stage        p50    p95    p99 (ms)"]
+        for name, s in summary.items():
+            if stages is None or name in stages:
+                lines.append(f"{name:<11}{s['p50_ms']:>6.1f} {s['p95_ms']:>6.1f} {s['p99_ms']:>6.1f}")
+
+        x, y = origin
+        line_height = 20
+        # 半透明背景，保证文字可读
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (x - 5, y - 16), (x + 330, y + line_height * (len(lines) - 1) + 6), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.5, frame, 0.5, 0, dst=frame)
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (x, y + i * line_height), cv2.FONT_HERSHEY_PLAIN, 1.1, color, 1)
+        return frame
+
+
+def print_latency_stats(summary: dict):
+    """打印各阶段延迟统计"""
+    print(f"\n⏱️ 分阶段延迟 (ms):")
+    print(f"  {'阶段':<12}{'帧数':>8}{'均值':>8}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for name, s in summary.items():
+        print(
+            f"  {name:<12}{s['count']:>8}{s['mean_ms']:>8.1f}{s['p50_ms']:>8.1f}"
+            f"{s['p95_ms']:>8.1f}{s['p99_ms']:>8.1f}"
+        )
@@ -0,0 +1,257 @@
+"""
+无界面模式: 通过本地 HTTP 以 MJPEG 推送标注画面
+服务器上没有显示环境时 cv2.imshow 无法使用，改为在浏览器中打开 http://<host>:<port>/ 查看
+
+- 每帧只做一次 JPEG 编码，无论连接了多少个客户端 (没有客户端时不编码)
+- 每个客户端一个线程，只发送最新一帧: 网络慢的客户端直接跳过中间帧，不会阻塞推理循环
+- 只依赖标准库 http.server 和 OpenCV
+
+路由:
+    /              简单的查看页面
+    /stream        MJPEG 视频流 (multipart/x-mixed-replace)
+    /snapshot.jpg  最新一帧 (没有 /stream 客户端时按需编码)
+    /stats         JSON 统计
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+_BOUNDARY = "frame"
+
+_INDEX_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body style="margin:0;background:#111;text-align:center">
+<img src="/stream" style="max-width:100%;max-height:100vh">
+</body></html>
+"""
+
+
+class MjpegServer:
+    """
+    MJPEG HTTP 推流服务器 (后台线程运行)
+
+    Examples:
+        >>> server = MjpegServer(port=8080)
+        >>> server.start()
+        >>> while True:
+        ...     annotated = result.plot()
+        ...     server.publish(annotated)   # 代替 cv2.imshow
+        >>> server.stop()
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        quality: int = 80,
+        title: str = "YOLO Stream"
+    ):
+        """
+        Args:
+            host: 监听地址，"0.0.0.0" 允许局域网访问
+            port: 端口
+            quality: JPEG 质量 (0~100)
+            title: 查看页面标题
+        """
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.title = title
+
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._frame = None      # 最新发布的原始帧 (snapshot 按需编码)
+        self._frame_id = 0      # 已发布的帧序号
+        self._jpeg_frame_id = 0  # _jpeg 对应的帧序号
+        self._stopped = False
+        self._httpd = None
+        self._thread = None
+
+        self.clients = 0
+        self.published = 0
+        self.encoded = 0
+        self.sent = 0
+        self.dropped = 0
+        self.encode_time = 0.0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self) -> "MjpegServer":
+        """在后台线程中启动 HTTP 服务"""
+        server = self
+
+        class Handler(_MjpegHandler):
+            mjpeg = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]  # port=0 时取实际端口
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mjpeg-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def publish(self, frame: np.ndarray):
+        """
+        发布一帧 (推理循环中调用，不会阻塞在网络发送上)
+
+        Args:
+            frame: BGR 图像 (只保存引用，发布后不要再原地修改)
+        """
+        with self._cond:
+            self.published += 1
+            self._frame = frame
+            self._frame_id += 1
+            frame_id = self._frame_id
+        if self.clients == 0:
+            # 没有人在看，省掉编码 (/snapshot.jpg 请求时再编码)
+            return
+
+        start = time.perf_counter()
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        self.encode_time += time.perf_counter() - start
+        if not ok:
+            return
+
+        with self._cond:
+            self._jpeg = buffer.tobytes()
+            self._jpeg_frame_id = frame_id
+            self._seq += 1
+            self.encoded += 1
+            self._cond.notify_all()
+
+    def wait_frame(self, last_seq: int, timeout: float = 1.0):
+        """
+        客户端线程调用: 等待比 last_seq 更新的一帧
+
+        Returns:
+            (seq, jpeg 字节)，超时或服务停止时 jpeg 为 None
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_seq or self._stopped, timeout=timeout)
+            if self._stopped or self._seq <= last_seq:
+                return last_seq, None
+            return self._seq, self._jpeg
+
+    def latest_jpeg(self) -> Optional[bytes]:
+        """最新一帧的 JPEG: 推流已编码过就直接复用，否则对最新的原始帧按需编码"""
+        with self._cond:
+            if self._frame is None or self._jpeg_frame_id == self._frame_id:
+                return self._jpeg
+            frame, frame_id = self._frame, self._frame_id
+
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return None
+        jpeg = buffer.tobytes()
+        with self._cond:
+            if frame_id > self._jpeg_frame_id:
+                # 只缓存，不增加 _seq: 不把旧帧推给 /stream 客户端
+                self._jpeg, self._jpeg_frame_id = jpeg, frame_id
+        return jpeg
+
+    def stats(self) -> dict:
+        """推流统计: 客户端数、发布 / 编码 / 发送帧数、客户端跳过的帧数、平均编码耗时 (ms)"""
+        with self._cond:
+            return {
+                "clients": self.clients,
+                "published": self.published,
+                "encoded": self.encoded,
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "encode_ms": self.encode_time / self.encoded * 1000 if self.encoded else 0.0,
+            }
+
+    def stop(self):
+        """停止服务并断开所有客户端"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _MjpegHandler(BaseHTTPRequestHandler):
+    mjpeg: MjpegServer = None
+
+    def log_message(self, format, *args):
+        # 不打印每个请求的访问日志
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/":
+            self._send_body(_INDEX_HTML.format(title=self.mjpeg.title).encode("utf-8"), "text/html; charset=utf-8")
+        elif path == "/stream":
+            self._stream()
+        elif path == "/snapshot.jpg":
+            jpeg = self.mjpeg.latest_jpeg()
+            if jpeg is None:
+                self.send_error(503, "no frame yet")
+            else:
+                self._send_body(jpeg, "image/jpeg")
+        elif path == "/stats":
+            self._send_body(json.dumps(self.mjpeg.stats()).encode("utf-8"), "application/json")
+        else:
+            self.send_error(404)
+
+    def _send_body(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        server = self.mjpeg
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={_BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache, private")
+        self.send_header("Pragma", "no-cache")
+        self.end_headers()
+
+        with server._cond:
+            server.clients += 1
+            last_seq = server._seq
+        try:
+            while True:
+                seq, jpeg = server.wait_frame(last_seq)
+                if jpeg is None:
+                    if server._stopped:
+                        break
+                    continue
+
+                # 发送期间错过的帧直接跳过，只发最新的
+                if last_seq and seq - last_seq > 1:
+                    with server._cond:
+                        server.dropped += seq - last_seq - 1
+                last_seq = seq
+
+                self.wfile.write(
+                    f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode("ascii")
+                )
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+                with server._cond:
+                    server.sent += 1
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端断开
+        finally:
+            with server._cond:
+                server.clients -= 1
@@ -4,10 +4,14 @@
 优先从本地 models/yolo/ 目录加载，如果没有则下载
 """
 
+from collections import OrderedDict
 from pathlib import Path
+from typing import Optional
 from ultralytics import YOLO
 from ultralytics.utils import LOGGER
+import numpy as np
 import shutil
+import threading
 
 
 # 项目根目录
@@ -18,13 +22,19 @@ MODELS_DIR = PROJECT_ROOT / "models" / "yolo"
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def load_yolo_model(model_name: str, download_if_missing: bool = True) -> YOLO:
+def load_yolo_model(
+    model_name: str,
+    download_if_missing: bool = True,
+    task: Optional[str] = None
+) -> YOLO:
     """
     加载 YOLO 模型，优先从本地 models/yolo/ 目录加载
     
     Args:
         model_name: 模型名称，如 "yolo11n.pt", "yolo11s.pt" 等
         download_if_missing: 如果本地不存在，是否自动下载
+        task: 任务类型 ("detect", "segment", "pose", "classify")，
+            None 表示由模型自动推断 (导出格式建议显式指定)
     
     Returns:
         YOLO 模型对象
@@ -43,7 +53,7 @@ def load_yolo_model(model_name: str, download_if_missing: bool = True) -> YOLO:
     # 如果本地存在，直接加载
     if local_model_path.exists():
         LOGGER.info(f"📦 从本地加载模型: {local_model_path}")
-        return YOLO(str(local_model_path))
+        return YOLO(str(local_model_path), task=task)
     
     # 本地不存在，尝试加载（会自动下载）
     if download_if_missing:
@@ -51,7 +61,7 @@ def load_yolo_model(model_name: str, download_if_missing: bool = True) -> YOLO:
         LOGGER.info(f"   下载后将保存到: {MODELS_DIR}")
         
         # 加载模型（会自动下载到默认位置）
-        model = YOLO(model_name)
+        model = YOLO(model_name, task=task)
         
         # 尝试将下载的模型复制到我们的目录
         # Ultralytics 默认下载到 ~/.ultralytics/weights/ 或当前目录
@@ -125,6 +135,218 @@ def get_model_path(model_name: str) -> Path:
     return MODELS_DIR / model_name
 
 
+# ==========================================
+# 进程级模型注册表 (LRU 缓存)
+# ==========================================
+
+class ModelRegistry:
+    """
+    进程级模型注册表
+
+    按 (模型名称, 设备, 任务, half, fuse) 缓存已加载并预热的模型，
+    在多个模型之间切换时不再重复反序列化和融合。
+    超出内存预算时按 LRU (最近最少使用) 顺序淘汰。
+
+    Examples:
+        >>> registry = ModelRegistry(max_memory_mb=512)
+        >>> det = registry.get("yolo11n.pt", device="cpu")
+        >>> seg = registry.get("yolo11n-seg.pt", device="cpu")
+        >>> det = registry.get("yolo11n.pt", device="cpu")  # 命中缓存
+        >>> print(registry.stats())
+    """
+
+    def __init__(self, max_memory_mb: float = 1024, warmup: bool = True, warmup_imgsz: int = 640):
+        """
+        Args:
+            max_memory_mb: 内存预算 (MB)，超出后淘汰最久未使用的模型
+            warmup: 首次加载后是否用空白图预热一次 (初始化 predictor)
+            warmup_imgsz: 预热图像尺寸
+        """
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.warmup = warmup
+        self.warmup_imgsz = warmup_imgsz
+
+        # key -> (model, size_bytes)，顺序即 LRU 顺序 (末尾为最近使用)
+        self._models = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        device: Optional[str] = None,
+        task: Optional[str] = None,
+        half: bool = False,
+        fuse: bool = True
+    ) -> tuple:
+        """生成缓存键 (模型名称统一补全后缀)"""
+        name = get_model_path(model_name).name
+        return (name, str(device) if device is not None else None, task, bool(half), bool(fuse))
+
+    def get(
+        self,
+        model_name: str,
+        device: Optional[str] = None,
+        task: Optional[str] = None,
+        half: bool = False,
+        fuse: bool = True
+    ) -> YOLO:
+        """
+        获取模型，缓存中没有时加载、融合并预热
+
+        Args:
+            model_name: 模型名称，如 "yolo11n.pt", "yolo11n-seg.pt"
+            device: 推理设备 ("cpu", "mps", "0")，None 表示由 Ultralytics 自动选择
+            task: 任务类型，None 表示自动推断
+            half: 是否使用 FP16 推理
+            fuse: 是否融合 Conv + BN 层
+
+        Returns:
+            已加载 (并预热) 的 YOLO 模型对象
+        """
+        key = self.make_key(model_name, device, task, half, fuse)
+
+        with self._lock:
+            if key in self._models:
+                self.hits += 1
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+            self.misses += 1
+            model = self._load(key)
+            size_bytes = _estimate_model_bytes(model)
+
+            self._models[key] = (model, size_bytes)
+            self._memory_bytes += size_bytes
+            self._evict()
+            return model
+
+    def _load(self, key: tuple) -> YOLO:
+        """加载、融合并预热模型"""
+        name, device, task, half, fuse = key
+        model = load_yolo_model(name, task=task)
+
+        # 只有 PyTorch 模型需要 (也能够) 融合
+        if fuse and name.endswith(".pt"):
+            try:
+                model.fuse()
+            except Exception as e:
+                LOGGER.warning(f"⚠️ 模型融合失败 ({name}): {e}")
+
+        if self.warmup:
+            # 第一次推理会创建 predictor 并把模型移动到目标设备，之后相同参数的调用直接复用
+            dummy = np.zeros((self.warmup_imgsz, self.warmup_imgsz, 3), dtype=np.uint8)
+            kwargs = {"half": half, "imgsz": self.warmup_imgsz, "verbose": False}
+            if device is not None:
+                kwargs["device"] = device
+            model.predict(dummy, **kwargs)
+
+        LOGGER.info(f"🗂️ 模型已缓存: {name} (device={device}, task={task}, half={half}, fuse={fuse})")
+        return model
+
+    def _evict(self):
+        """超出预算时淘汰最久未使用的模型 (至少保留刚加载的那个)"""
+        while self._memory_bytes > self.max_memory_bytes and len(self._models) > 1:
+            key, (_, size_bytes) = self._models.popitem(last=False)
+            self._memory_bytes -= size_bytes
+            self.evictions += 1
+            LOGGER.info(f"♻️ 淘汰缓存模型: {key[0]} ({size_bytes / 1024 / 1024:.1f} MB)")
+
+    def resize(self, max_memory_mb: float):
+        """调整内存预算 (缩小时立即淘汰)"""
+        with self._lock:
+            self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+            self._evict()
+
+    def clear(self):
+        """清空缓存 (计数器保留)"""
+        with self._lock:
+            self._models.clear()
+            self._memory_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        获取缓存统计
+
+        Returns:
+            包含命中/未命中/淘汰次数和内存占用的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "models": [key[0] for key in self._models],
+                "memory_mb": self._memory_bytes / 1024 / 1024,
+                "max_memory_mb": self.max_memory_bytes / 1024 / 1024,
+            }
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._models
+
+
+def _estimate_model_bytes(model: YOLO) -> int:
+    """
+    估算模型占用的内存 (参数 + buffer)
+
+    非 PyTorch 格式 (ONNX 等) 没有可统计的参数，使用权重文件大小近似
+    """
+    try:
+        module = model.model
+        tensors = list(module.parameters()) + list(module.buffers())
+        if tensors:
+            return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        pass
+
+    ckpt_path = getattr(model, "ckpt_path", None) or getattr(model, "model_name", None)
+    if ckpt_path and Path(str(ckpt_path)).exists():
+        return Path(str(ckpt_path)).stat().st_size
+    return 0
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_model_registry(max_memory_mb: Optional[float] = None) -> ModelRegistry:
+    """
+    获取进程级默认注册表 (首次调用时创建)
+
+    Args:
+        max_memory_mb: 内存预算 (MB)，None 表示保持现有设置 (默认 1024 MB)
+
+    Returns:
+        ModelRegistry 单例
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry(max_memory_mb=1024 if max_memory_mb is None else max_memory_mb)
+        elif max_memory_mb is not None:
+            _default_registry.resize(max_memory_mb)
+    return _default_registry
+
+
+def get_cached_model(model_name: str, **kwargs) -> YOLO:
+    """
+    从默认注册表获取模型，参数同 ModelRegistry.get
+
+    Examples:
+        >>> model = get_cached_model("yolo11n-pose.pt", device="cpu")
+    """
+    return get_model_registry().get(model_name, **kwargs)
+
+
 if __name__ == "__main__":
     # 测试
     print("=" * 60)
@@ -145,4 +367,6 @@ if __name__ == "__main__":
     print("\n💡 使用示例:")
     print("  from utils.model_loader import load_yolo_model")
     print("  model = load_yolo_model('yolo11n.pt')")
+    print("  from utils.model_loader import get_cached_model")
+    print("  model = get_cached_model('yolo11n-seg.pt', device='cpu')  # 进程内缓存复用")
 
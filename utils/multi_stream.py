@@ -0,0 +1,228 @@
+"""
+多路视频流调度
+一个进程、一个模型同时服务多路摄像头 / 视频流:
+
+- 每路流一个最新帧优先的采集线程 (LatestFrameCapture)，推理跟不上时各自丢旧帧
+- 调度循环从各路取出最新帧，组成跨流的批次一次推理，结果按流 ID 路由回去
+- 公平性: 轮询起点每批前移，batch_size 小于流数时每路流轮流得到推理机会，
+  不会因为某路流出帧更快而饿死其它流
+- 每路流单独统计推理帧数、FPS、丢帧数和 采集 → 结果 延迟
+
+相比每路流一个进程各自加载模型，共享模型省内存，跨流批量推理也提高吞吐
+"""
+
+from collections import deque
+from typing import Callable, Optional, Sequence, Union
+import time
+
+import numpy as np
+
+from utils.capture import LatestFrameCapture
+
+
+class StreamStats:
+    """单路流的统计"""
+
+    def __init__(self, window: int = 300):
+        self.inferred = 0
+        self._done_times = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+
+    def record(self, timestamp: float):
+        now = time.perf_counter()
+        self.inferred += 1
+        self._done_times.append(now)
+        self._latencies.append(now - timestamp)
+
+    @property
+    def fps(self) -> float:
+        """最近窗口内的推理帧率"""
+        if len(self._done_times) < 2:
+            return 0.0
+        return (len(self._done_times) - 1) / (self._done_times[-1] - self._done_times[0] + 1e-9)
+
+    def summary(self) -> dict:
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return {
+            "inferred": self.inferred,
+            "fps": self.fps,
+            "latency_ms": float(latencies.mean()),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+        }
+
+
+class MultiStreamScheduler:
+    """
+    多路流共享一个模型的批量推理调度器
+
+    Examples:
+        >>> scheduler = MultiStreamScheduler(model, [0, "cam2.mp4", "rtsp://..."], batch_size=4)
+        >>> def on_result(stream_id, frame, result):
+        ...     cv2.imshow(f"stream {stream_id}", result.plot(img=frame))
+        >>> stats = scheduler.run(on_result)
+        >>> print_stream_stats(stats)
+    """
+
+    def __init__(
+        self,
+        model,
+        sources: Sequence[Union[int, str]],
+        batch_size: Optional[int] = None,
+        realtime_files: bool = True,
+        idle_wait: float = 0.002,
+        **infer_kwargs
+    ):
+        """
+        Args:
+            model: 检测模型 (Ultralytics YOLO 或 OnnxDetector)，需支持传入帧列表
+            sources: 摄像头 ID 或视频文件 / 流地址列表
+            batch_size: 每批最多几路流，None 表示所有流一批
+            realtime_files: 视频文件按自身帧率读取 (模拟实时流)，否则解码多快读多快
+            idle_wait: 没有新帧时的等待时间 (秒)
+            **infer_kwargs: 传给模型推理的参数 (如 conf、imgsz)
+        """
+        self.model = model
+        self.sources = list(sources)
+        self.batch_size = batch_size or len(self.sources)
+        self.idle_wait = idle_wait
+        self.infer_kwargs = {"verbose": False, **infer_kwargs}
+
+        self.captures = [
+            LatestFrameCapture(source, realtime=realtime_files and isinstance(source, str))
+            for source in self.sources
+        ]
+        self.stats = [StreamStats() for _ in self.sources]
+        self._next = 0  # 轮询起点
+        self._stop = False
+        self.batches = 0
+        self.infer_time = 0.0
+
+        for source, cap in zip(self.sources, self.captures):
+            if not cap.isOpened():
+                print(f"⚠️ 无法打开视频源: {source}")
+
+    def _collect(self) -> list:
+        """从轮询起点开始收集最多 batch_size 路有新帧的流"""
+        batch = []
+        num_streams = len(self.captures)
+        for offset in range(num_streams):
+            stream_id = (self._next + offset) % num_streams
+            cap = self.captures[stream_id]
+            if not cap.isOpened() or cap.ended:
+                continue
+
+            ret, frame, timestamp = cap.read_latest(timeout=0)
+            if ret:
+                batch.append((stream_id, frame, timestamp))
+                if len(batch) == self.batch_size:
+                    break
+
+        # 下一批从本批最后一路流之后开始，保证轮流服务
+        if batch:
+            self._next = (batch[-1][0] + 1) % num_streams
+        return batch
+
+    def _all_ended(self) -> bool:
+        return all(not cap.isOpened() or cap.ended for cap in self.captures)
+
+    def step(self, on_result: Optional[Callable] = None, on_batch: Optional[Callable] = None) -> int:
+        """
+        调度一批: 收集帧 → 批量推理 → 按流 ID 回调 → 整批回调
+
+        Returns:
+            本批推理的帧数 (0 表示没有新帧)
+        """
+        batch = self._collect()
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        results = self.model([frame for _, frame, _ in batch], **self.infer_kwargs)
+        self.infer_time += time.perf_counter() - start
+        self.batches += 1
+
+        for (stream_id, frame, timestamp), result in zip(batch, results):
+            self.stats[stream_id].record(timestamp)
+            if on_result is not None:
+                on_result(stream_id, frame, result)
+        if on_batch is not None:
+            on_batch()
+        return len(batch)
+
+    def run(
+        self,
+        on_result: Optional[Callable] = None,
+        duration: Optional[float] = None,
+        on_batch: Optional[Callable] = None
+    ) -> dict:
+        """
+        运行调度循环，直到所有流结束、调用 stop() 或超过 duration
+
+        Args:
+            on_result: 回调 (stream_id, frame, result)，在调度线程中按推理顺序调用
+            duration: 最长运行时间 (秒)
+            on_batch: 每批所有 on_result 之后调用一次 (无参数)，适合放显示 / 刷新等整批只需做一次的操作
+
+        Returns:
+            统计: 总帧数、批次数、平均批大小、总 FPS、每路流的统计
+        """
+        self._stop = False
+        start = time.perf_counter()
+        try:
+            while not self._stop:
+                if duration is not None and time.perf_counter() - start > duration:
+                    break
+                if self.step(on_result, on_batch) == 0:
+                    if self._all_ended():
+                        break
+                    time.sleep(self.idle_wait)
+        finally:
+            self.release()
+
+        return self.summary(time.perf_counter() - start)
+
+    def stop(self):
+        """在回调中调用以结束 run()"""
+        self._stop = True
+
+    def release(self):
+        for cap in self.captures:
+            cap.release()
+
+    def summary(self, wall_time: float) -> dict:
+        streams = []
+        for source, cap, stats in zip(self.sources, self.captures, self.stats):
+            capture = cap.stats()
+            streams.append({
+                "source": source,
+                **stats.summary(),
+                "captured": capture["captured"],
+                "dropped": capture["dropped"],
+                "drop_ratio": capture["drop_ratio"],
+            })
+
+        frames = sum(s["inferred"] for s in streams)
+        return {
+            "frames": frames,
+            "batches": self.batches,
+            "avg_batch": frames / self.batches if self.batches else 0.0,
+            "wall_time": wall_time,
+            "fps": frames / wall_time if wall_time > 0 else 0.0,
+            "infer_time": self.infer_time,
+            "streams": streams,
+        }
+
+
+def print_stream_stats(stats: dict):
+    """打印多路流统计"""
+    print(
+        f"\n📊 多路流统计: {stats['frames']} 帧 / {stats['batches']} 批 "
+        f"(平均批大小 {stats['avg_batch']:.1f})，总 FPS {stats['fps']:.1f}"
+    )
+    print(f"  {'流':<4}{'来源':<24}{'推理帧':>8}{'FPS':>8}{'丢帧率':>8}{'延迟(ms)':>10}{'p95':>8}")
+    for i, s in enumerate(stats["streams"]):
+        source = str(s["source"])[-22:]
+        print(
+            f"  {i:<4}{source:<24}{s['inferred']:>8}{s['fps']:>8.1f}{s['drop_ratio']:>8.1%}"
+            f"{s['latency_ms']:>10.1f}{s['latency_p95_ms']:>8.1f}"
+        )
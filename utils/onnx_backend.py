@@ -0,0 +1,487 @@
+"""
+ONNX Runtime 推理后端
+不依赖 torch / ultralytics，使用 onnxruntime (CPU) 运行导出的 YOLO 检测模型
+
+预处理 (letterbox、归一化) 与后处理 (框解码、NMS) 全部使用向量化 NumPy 实现，
+输出的 boxes 提供与 Ultralytics 相同的 xyxy / conf / cls 字段，脚本可以直接切换后端
+
+导出模型: python 05_yolo_training/04_model_export/01_export_formats.py
+"""
+
+from pathlib import Path
+from typing import Optional, Tuple, Union
+import ast
+import time
+
+import cv2
+import numpy as np
+
+from utils.detections import box_iou, nms  # noqa: F401 (box_iou 保留在此模块的导出中，兼容旧代码)
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 模型存储目录 (与 model_loader.MODELS_DIR 相同，这里不导入 model_loader 以避免加载 torch)
+MODELS_DIR = PROJECT_ROOT / "models" / "yolo"
+
+
+# ==========================================
+# 预处理
+# ==========================================
+
+def letterbox(
+    img: np.ndarray,
+    new_shape: Union[int, Tuple[int, int]] = 640,
+    color: Tuple[int, int, int] = (114, 114, 114)
+) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    等比例缩放并填充到目标尺寸 (与 Ultralytics LetterBox 一致，居中填充)
+
+    Args:
+        img: BGR 图像
+        new_shape: 目标尺寸 (h, w) 或单个整数
+        color: 填充颜色
+
+    Returns:
+        (填充后的图像, 缩放比例, (左侧填充, 顶部填充))
+    """
+    if isinstance(new_shape, int):
+        new_shape = (new_shape, new_shape)
+
+    h, w = img.shape[:2]
+    ratio = min(new_shape[0] / h, new_shape[1] / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+
+    pad_w = (new_shape[1] - new_w) / 2
+    pad_h = (new_shape[0] - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+
+    return img, ratio, (left, top)
+
+
+def preprocess(images: list, imgsz: Tuple[int, int]) -> Tuple[np.ndarray, list]:
+    """
+    BGR 图像列表 -> NCHW float32 (RGB, 0~1) 输入张量
+
+    Args:
+        images: BGR 图像列表
+        imgsz: 模型输入尺寸 (h, w)
+
+    Returns:
+        (输入张量, 每张图的 (缩放比例, 填充) 列表)
+    """
+    batch = np.empty((len(images), imgsz[0], imgsz[1], 3), dtype=np.uint8)
+    transforms = []
+    for i, img in enumerate(images):
+        padded, ratio, pad = letterbox(img, imgsz)
+        batch[i] = padded
+        transforms.append((ratio, pad))
+
+    # BGR -> RGB, HWC -> CHW, 归一化 (一次完成整个 batch)
+    tensor = batch[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor), transforms
+
+
+# ==========================================
+# 后处理
+# ==========================================
+
+def xywh2xyxy(x: np.ndarray) -> np.ndarray:
+    """中心点格式 (cx, cy, w, h) -> 角点格式 (x1, y1, x2, y2)"""
+    y = np.empty_like(x)
+    half_wh = x[:, 2:4] / 2
+    y[:, :2] = x[:, :2] - half_wh
+    y[:, 2:] = x[:, :2] + half_wh
+    return y
+
+
+def decode_predictions(
+    pred: np.ndarray,
+    num_classes: int,
+    conf_thres: float = 0.25,
+    iou_thres: float = 0.7,
+    classes: Optional[list] = None,
+    max_det: int = 300
+) -> np.ndarray:
+    """
+    解码单张图的原始输出并执行 NMS
+
+    Args:
+        pred: (4 + nc, N) 原始输出 (YOLOv8/11 格式)，或 (N, 6) 端到端输出
+        num_classes: 类别数，0 表示未知 (元数据中没有 names)，此时按输出形状判断并推断 nc
+        conf_thres: 置信度阈值
+        iou_thres: NMS IoU 阈值
+        classes: 只保留这些类别 ID
+        max_det: 最多保留的检测数
+
+    Returns:
+        (K, 6) 数组: x1, y1, x2, y2, conf, cls (输入图像坐标系)
+    """
+    if num_classes > 0:
+        raw = pred.shape[0] == 4 + num_classes
+    else:
+        # 端到端输出为 (max_det, 6)，行数远多于列数；原始输出为 (4 + nc, 锚点数)
+        raw = not (pred.shape[1] == 6 and pred.shape[0] > pred.shape[1])
+
+    if raw:
+        pred = pred.T  # (N, 4 + nc)
+        scores_all = pred[:, 4:]
+        cls = scores_all.argmax(axis=1)
+        conf = scores_all[np.arange(len(cls)), cls]
+        boxes = xywh2xyxy(pred[:, :4])
+        end2end = False
+    else:
+        # 端到端导出 (模型内已包含 NMS): x1, y1, x2, y2, conf, cls
+        boxes, conf, cls = pred[:, :4], pred[:, 4], pred[:, 5].astype(np.int64)
+        end2end = True
+
+    mask = conf > conf_thres
+    if classes is not None:
+        mask &= np.isin(cls, classes)
+    boxes, conf, cls = boxes[mask], conf[mask], cls[mask]
+
+    if len(conf) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+
+    if end2end:
+        keep = conf.argsort()[::-1][:max_det]
+    else:
+        # 按类别平移框，使不同类别之间互不抑制 (一次 NMS 完成所有类别)
+        offsets = cls[:, None].astype(np.float32) * 7680
+        keep = nms(boxes + offsets, conf, iou_thres)[:max_det]
+
+    return np.concatenate(
+        [boxes[keep], conf[keep, None], cls[keep, None].astype(np.float32)], axis=1
+    ).astype(np.float32)
+
+
+def scale_boxes(boxes: np.ndarray, ratio: float, pad: Tuple[float, float], orig_shape: Tuple[int, int]) -> np.ndarray:
+    """把 letterbox 坐标映射回原图坐标并裁剪到图像范围内"""
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, orig_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, orig_shape[0])
+    return boxes
+
+
+# ==========================================
+# 结果对象 (字段与 Ultralytics Results / Boxes 对齐)
+# ==========================================
+
+class OnnxBoxes:
+    """
+    检测框集合，字段与 ultralytics.engine.results.Boxes 对齐:
+    xyxy (N, 4)、conf (N,)、cls (N,)、xywh (N, 4)、data (N, 6)
+
+    支持 `for box in boxes` 逐个遍历 (每个 box 仍是 OnnxBoxes，
+    因此 `box.xyxy[0].tolist()`、`box.conf[0].item()` 等写法保持可用)
+    """
+
+    def __init__(self, data: np.ndarray, orig_shape: Tuple[int, int]):
+        self.data = data
+        self.orig_shape = orig_shape
+        self.id = None  # 无追踪 ID
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.data[:, :4]
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.data[:, 4]
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.data[:, 5]
+
+    @property
+    def xywh(self) -> np.ndarray:
+        xyxy = self.xyxy
+        return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+    def cpu(self) -> "OnnxBoxes":
+        return self
+
+    def numpy(self) -> "OnnxBoxes":
+        return self
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, idx) -> "OnnxBoxes":
+        return OnnxBoxes(self.data[idx].reshape(-1, 6), self.orig_shape)
+
+
+class OnnxResults:
+    """单张图像的检测结果，字段与 ultralytics.engine.results.Results 对齐"""
+
+    def __init__(self, orig_img: np.ndarray, names: dict, boxes: np.ndarray, speed: dict):
+        self.orig_img = orig_img
+        self.orig_shape = orig_img.shape[:2]
+        self.names = names
+        self.boxes = OnnxBoxes(boxes, self.orig_shape)
+        self.masks = None
+        self.keypoints = None
+        self.speed = speed
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def plot(
+        self,
+        line_width: int = 2,
+        labels: bool = True,
+        conf: bool = True,
+        img: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        在图像副本上绘制检测框 (简化版 Results.plot)
+
+        Args:
+            img: 绘制的底图，None 表示使用原图
+
+        Returns:
+            带标注的 BGR 图像
+        """
+        annotated = (self.orig_img if img is None else img).copy()
+        for x1, y1, x2, y2, score, cls_id in self.boxes.data:
+            cls_id = int(cls_id)
+            color = _class_color(cls_id)
+            p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+            cv2.rectangle(annotated, p1, p2, color, line_width)
+
+            if labels:
+                label = self.names.get(cls_id, str(cls_id))
+                if conf:
+                    label = f"{label} {score:.2f}"
+                (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+                cv2.rectangle(annotated, (p1[0], p1[1] - th - 8), (p1[0] + tw + 4, p1[1]), color, -1)
+                cv2.putText(annotated, label, (p1[0] + 2, p1[1] - 4),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        return annotated
+
+
+def _class_color(cls_id: int) -> Tuple[int, int, int]:
+    """按类别 ID 生成稳定的颜色"""
+    rng = np.random.default_rng(cls_id)
+    return tuple(int(c) for c in rng.integers(64, 256, size=3))
+
+
+# ==========================================
+# 检测器
+# ==========================================
+
+class OnnxDetector:
+    """
+    基于 ONNX Runtime 的 YOLO 检测器
+
+    调用方式与 YOLO 模型一致: `results = detector(frame)`，
+    results[0].boxes 提供 xyxy / conf / cls 字段
+
+    Examples:
+        >>> detector = OnnxDetector("models/yolo/yolo11n.onnx")
+        >>> results = detector(frame)
+        >>> for box in results[0].boxes:
+        ...     x1, y1, x2, y2 = box.xyxy[0].tolist()
+    """
+
+    def __init__(
+        self,
+        model_path: Union[str, Path],
+        conf: float = 0.25,
+        iou: float = 0.7,
+        imgsz: Optional[int] = None,
+        providers: Optional[list] = None,
+        num_threads: Optional[int] = None
+    ):
+        """
+        Args:
+            model_path: .onnx 模型路径
+            conf: 默认置信度阈值
+            iou: 默认 NMS IoU 阈值
+            imgsz: 输入尺寸，None 表示使用导出时的尺寸 (读取模型元数据)
+            providers: ONNX Runtime 执行后端，默认 CPUExecutionProvider
+            num_threads: intra-op 线程数，None 表示由 ONNX Runtime 决定
+        """
+        if ort is None:
+            raise ImportError("需要安装 onnxruntime: pip install onnxruntime")
+
+        self.model_path = Path(model_path)
+        self.conf = conf
+        self.iou = iou
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(self.model_path),
+            sess_options=options,
+            providers=providers or ["CPUExecutionProvider"],
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+
+        # Ultralytics 导出时会把 names / imgsz / task 写入 ONNX 元数据
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        task = metadata.get("task", "detect")
+        if task != "detect":
+            raise ValueError(f"ONNX 后端目前只支持检测模型，当前模型任务: {task}")
+
+        if "names" in metadata:
+            self.names = ast.literal_eval(metadata["names"])
+        else:
+            # 没有 names 元数据: 静态输出形状 (1, 4 + nc, N) 时用类别 ID 作为名称，否则由解码时按输出形状推断
+            out_shape = self.session.get_outputs()[0].shape
+            channels = out_shape[1] if len(out_shape) == 3 else None
+            num_classes = channels - 4 if isinstance(channels, int) and channels > 6 else 0
+            self.names = {i: str(i) for i in range(num_classes)}
+
+        # 静态输入尺寸优先 (如 [1, 3, 640, 640])，动态输入时使用元数据或参数
+        shape = model_input.shape
+        self.dynamic_batch = not isinstance(shape[0], int)
+        # 动态输入尺寸 (导出时 dynamic=True) 才能在推理时按 imgsz 改变输入大小
+        self.dynamic_shape = not (isinstance(shape[2], int) and isinstance(shape[3], int))
+        self._imgsz_warned = False
+        if imgsz is not None:
+            self.imgsz = (imgsz, imgsz)
+        elif isinstance(shape[2], int) and isinstance(shape[3], int):
+            self.imgsz = (shape[2], shape[3])
+        elif "imgsz" in metadata:
+            self.imgsz = tuple(ast.literal_eval(metadata["imgsz"]))
+        else:
+            self.imgsz = (640, 640)
+
+    def __call__(
+        self,
+        source,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[list] = None,
+        max_det: int = 300,
+        imgsz: Optional[Union[int, Tuple[int, int]]] = None,
+        **kwargs
+    ) -> list:
+        """
+        运行检测
+
+        Args:
+            source: BGR 图像、图像路径，或它们的列表
+            conf: 置信度阈值 (默认使用构造参数)
+            iou: NMS IoU 阈值 (默认使用构造参数)
+            classes: 只保留这些类别 ID
+            max_det: 每张图最多保留的检测数
+            imgsz: 本次推理的输入尺寸 (向上取整到 32 的倍数)，只对动态输入尺寸的模型生效；
+                静态尺寸的模型使用导出时的尺寸 (首次遇到不同尺寸时打印警告)
+            **kwargs: 兼容 Ultralytics 的其它参数 (verbose、device 等)，这里忽略
+
+        Returns:
+            OnnxResults 列表 (每张图一个)
+        """
+        conf = self.conf if conf is None else conf
+        iou = self.iou if iou is None else iou
+
+        images = source if isinstance(source, (list, tuple)) else [source]
+        images = [cv2.imread(str(img)) if isinstance(img, (str, Path)) else img for img in images]
+        if not images:
+            return []
+
+        size = self.imgsz
+        if imgsz is not None:
+            h, w = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+            requested = (-(-h // 32) * 32, -(-w // 32) * 32)
+            if self.dynamic_shape:
+                size = requested
+            elif requested != self.imgsz and not self._imgsz_warned:
+                print(f"⚠️ ONNX 模型输入尺寸固定为 {self.imgsz}，忽略 imgsz={imgsz} (导出时使用 dynamic=True 才能改变)")
+                self._imgsz_warned = True
+
+        t0 = time.perf_counter()
+        tensor, transforms = preprocess(images, size)
+        t1 = time.perf_counter()
+
+        if self.dynamic_batch or len(images) == 1:
+            outputs = self.session.run([self.output_name], {self.input_name: tensor})[0]
+        else:
+            # 静态 batch=1 的模型: 逐张运行
+            outputs = np.concatenate([
+                self.session.run([self.output_name], {self.input_name: tensor[i:i + 1]})[0]
+                for i in range(len(images))
+            ])
+        t2 = time.perf_counter()
+
+        results = []
+        for img, pred, (ratio, pad) in zip(images, outputs, transforms):
+            det = decode_predictions(pred, len(self.names), conf, iou, classes, max_det)
+            det[:, :4] = scale_boxes(det[:, :4], ratio, pad, img.shape[:2])
+            results.append((img, det))
+        t3 = time.perf_counter()
+
+        n = len(images)
+        speed = {
+            "preprocess": (t1 - t0) * 1000 / n,
+            "inference": (t2 - t1) * 1000 / n,
+            "postprocess": (t3 - t2) * 1000 / n,
+        }
+        return [OnnxResults(img, self.names, det, speed) for img, det in results]
+
+    predict = __call__
+
+
+def load_onnx_detector(model_name: str = "yolo11n.onnx", **kwargs) -> OnnxDetector:
+    """
+    加载 ONNX 检测器，优先使用给定路径，其次在 models/yolo/ 目录中查找
+
+    Args:
+        model_name: 模型名称或路径，如 "yolo11n.onnx" / "yolo11n"
+        **kwargs: 传给 OnnxDetector 的参数 (conf、iou、imgsz、num_threads 等)
+
+    Returns:
+        OnnxDetector 对象
+    """
+    if not model_name.endswith(".onnx"):
+        model_name = str(Path(model_name).with_suffix(".onnx"))
+
+    for path in (Path(model_name), MODELS_DIR / model_name):
+        if path.exists():
+            print(f"📦 加载 ONNX 模型: {path}")
+            return OnnxDetector(path, **kwargs)
+
+    raise FileNotFoundError(
+        f"ONNX 模型 {model_name} 不存在于 {MODELS_DIR}，"
+        f"请先运行 05_yolo_training/04_model_export/01_export_formats.py 导出"
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    print("=" * 60)
+    print("⚡ ONNX Runtime 推理后端测试")
+    print("=" * 60)
+
+    detector = load_onnx_detector("yolo11n.onnx")
+    img_path = PROJECT_ROOT / "04_yolo_basics" / "01_intro" / "bus.jpg"
+    results = detector(str(img_path))
+
+    print(f"\n🔍 检测到 {len(results[0].boxes)} 个目标:")
+    for box in results[0].boxes:
+        cls_id = int(box.cls[0].item())
+        print(f"  {detector.names.get(cls_id, cls_id)}: {box.conf[0].item():.2f} {box.xyxy[0].round(1).tolist()}")
+
+    print(f"\n⏱️ 耗时: {results[0].speed}")
+    print(f"🧪 torch 已导入: {'torch' in sys.modules}")
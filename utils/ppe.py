@@ -0,0 +1,259 @@
+"""
+PPE (个人防护装备) 佩戴检查: 人员 × 装备关联
+检测器分别输出"人"和"安全帽 / 反光衣 / 背包"等装备框，还需要判断每件装备属于谁、谁没有佩戴。
+逐个人再逐个装备地算重叠，人多装备多时是 P × E 次 Python 循环。
+
+这里每帧对每类必需装备一次性构建 (人数, 装备数) 的包含度矩阵:
+装备框落在人员框对应部位 (如安全帽在上部 30%) 内的面积占装备框面积的比例。
+每件装备只分配给包含度最高的人，没有匹配到装备的人即为违规。
+
+单帧判定容易因为漏检闪烁，所以按人员 (轨迹 ID，或与上一帧的 IoU 匹配) 对"缺失"做指数平滑，
+平滑分数超过 on_score 才告警，低于 off_score 才解除 (滞回)。
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.detections import Detections, box_iou
+
+
+class PPEMonitor:
+    """
+    人员装备佩戴检查
+
+    Examples:
+        >>> ppe = PPEMonitor({"helmet": (0.0, 0.3), "vest": (0.2, 0.7)})
+        >>> out = ppe.update(det, ids=tracks_ids)
+        >>> det.xyxy[out["persons"][out["violation"]]]    # 未佩戴的人员框
+        >>> ppe.missing_names(out)                        # [["helmet"], [], ...]
+    """
+
+    def __init__(
+        self,
+        required: Dict[str, Tuple[float, float]],
+        person_class: str = "person",
+        min_conf: float = 0.25,
+        min_overlap: float = 0.5,
+        expand: float = 0.1,
+        exclusive: bool = True,
+        window: int = 5,
+        on_score: float = 0.6,
+        off_score: float = 0.3,
+        max_age: int = 15,
+        match_iou: float = 0.3
+    ):
+        """
+        Args:
+            required: {装备类别名: (上沿, 下沿)}，装备应出现在人员框的哪一段 (占框高的比例，0 为头顶)
+            person_class: 人员类别名
+            min_conf: 人员 / 装备框的最低置信度
+            min_overlap: 装备框落在该部位内的面积比例达到多少算佩戴
+            expand: 部位区域左右各外扩人员框宽度的比例 (手持 / 侧身时装备常超出人员框)
+            exclusive: 每件装备只分配给包含度最高的一个人 (避免一顶安全帽同时算给相邻两人)
+            window: 平滑窗口 (帧)，指数平滑系数为 2 / (window + 1)
+            on_score: 平滑后的缺失分数达到该值开始告警
+            off_score: 平滑后的缺失分数低于该值解除告警
+            max_age: 人员消失多少帧后丢弃其平滑状态
+            match_iou: 没有轨迹 ID 时，与上一帧人员框 IoU 达到该值视为同一人
+        """
+        if not off_score < on_score:
+            raise ValueError("off_score 必须小于 on_score")
+        self.required = list(required)
+        bands = np.array([required[k] for k in self.required], dtype=np.float32).reshape(-1, 2)
+        self.band_top, self.band_bottom = bands[:, 0], bands[:, 1]
+        self.person_class = person_class
+        self.min_conf = min_conf
+        self.min_overlap = min_overlap
+        self.expand = expand
+        self.exclusive = exclusive
+        self.alpha = 2.0 / (window + 1)
+        self.on_score = on_score
+        self.off_score = off_score
+        self.max_age = max_age
+        self.match_iou = match_iou
+        self.last_ms = 0.0
+        self.reset()
+
+    def reset(self):
+        """清空平滑状态"""
+        num_required = len(self.required)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._score = np.zeros((0, num_required), dtype=np.float32)
+        self._flag = np.zeros((0, num_required), dtype=bool)
+        self._age = np.zeros(0, dtype=np.int64)
+
+    def _class_ids(self, names: dict) -> Tuple[int, np.ndarray]:
+        name_to_id = {v: k for k, v in names.items()}
+        missing = [c for c in [self.person_class] + self.required if c not in name_to_id]
+        if missing:
+            raise ValueError(f"模型类别中没有: {missing}")
+        return name_to_id[self.person_class], np.array([name_to_id[c] for c in self.required], dtype=np.int64)
+
+    def associate(
+        self,
+        persons: np.ndarray,
+        equipment: np.ndarray,
+        kind: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        单帧关联 (不平滑)
+
+        Args:
+            persons: (P, 4) 人员框
+            equipment: (E, 4) 装备框
+            kind: (E,) 装备属于 required 中的第几类
+
+        Returns:
+            (matched (P, K) bool: 每人每类装备是否佩戴,
+             owner (E,) int64: 每件装备分配到的人员索引，-1 表示不属于任何人)
+        """
+        num_persons, num_required = len(persons), len(self.required)
+        matched = np.zeros((num_persons, num_required), dtype=bool)
+        owner = np.full(len(equipment), -1, dtype=np.int64)
+        if num_persons == 0 or len(equipment) == 0:
+            return matched, owner
+
+        # 每件装备对应的人员部位区域: (P, E)
+        px1, py1, px2, py2 = (persons[:, i:i + 1] for i in range(4))
+        pw, ph = px2 - px1, py2 - py1
+        top, bottom = self.band_top[kind], self.band_bottom[kind]           # (E,)
+        rx1, rx2 = px1 - self.expand * pw, px2 + self.expand * pw           # (P, 1)
+        ry1, ry2 = py1 + top * ph, py1 + bottom * ph                        # (P, E)
+
+        ex1, ey1, ex2, ey2 = equipment.T                                    # (E,)
+        iw = np.clip(np.minimum(rx2, ex2) - np.maximum(rx1, ex1), 0, None)
+        ih = np.clip(np.minimum(ry2, ey2) - np.maximum(ry1, ey1), 0, None)
+        area = np.maximum((ex2 - ex1) * (ey2 - ey1), 1e-6)
+        overlap = iw * ih / area                                            # (P, E) 包含度
+
+        if self.exclusive:
+            # 每件装备只给包含度最高的人
+            best = overlap.argmax(axis=0)
+            ok = overlap[best, np.arange(len(equipment))] >= self.min_overlap
+            owner[ok] = best[ok]
+            matched[best[ok], kind[ok]] = True
+        else:
+            hit_p, hit_e = np.nonzero(overlap >= self.min_overlap)
+            matched[hit_p, kind[hit_e]] = True
+            owner[hit_e] = hit_p  # 多人共享时记最后一个
+        return matched, owner
+
+    def _match_state(self, boxes: np.ndarray, ids: Optional[np.ndarray]) -> np.ndarray:
+        """当前人员 → 平滑状态行 (-1 表示新人员)"""
+        rows = np.full(len(boxes), -1, dtype=np.int64)
+        if len(boxes) == 0 or len(self._boxes) == 0:
+            return rows
+        if ids is not None:
+            order = np.argsort(self._ids, kind="stable")
+            sorted_ids = self._ids[order]
+            pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+            found = sorted_ids[pos] == ids
+            rows[found] = order[pos[found]]
+            return rows
+
+        # 没有轨迹 ID: 按 IoU 从高到低贪心匹配上一帧的人员框
+        iou = box_iou(boxes, self._boxes)
+        best = iou.argmax(axis=1)
+        best_iou = iou[np.arange(len(boxes)), best]
+        candidates = np.nonzero(best_iou >= self.match_iou)[0]
+        candidates = candidates[np.argsort(-best_iou[candidates], kind="stable")]
+        _, first = np.unique(best[candidates], return_index=True)
+        keep = candidates[first]
+        rows[keep] = best[keep]
+        return rows
+
+    def update(self, det: Detections, ids: Optional[np.ndarray] = None) -> dict:
+        """
+        输入一帧检测结果
+
+        Args:
+            det: 本帧检测结果 (人员和装备都在其中)
+            ids: 人员的轨迹 ID，与 det 中的人员按顺序一一对应；
+                 None 时使用 det.ids，仍没有时按与上一帧的 IoU 关联
+
+        Returns:
+            {"persons": (P,) 人员在 det 中的索引,
+             "matched": (P, K) 本帧是否检测到佩戴 (未平滑),
+             "missing": (P, K) 平滑后判定为未佩戴,
+             "violation": (P,) 平滑后缺少任意一类装备,
+             "owner": (N,) det 中每个装备框分配到的人员 (det 索引)，非装备 / 未分配为 -1}
+        """
+        start = time.perf_counter()
+        person_id, required_ids = self._class_ids(det.names)
+        confident = det.conf >= self.min_conf
+        persons = np.nonzero(confident & (det.cls == person_id))[0]
+
+        # 装备类别 → required 中的下标
+        lut = np.full(max(int(det.cls.max(initial=0)), int(required_ids.max(initial=0))) + 1, -1, dtype=np.int64)
+        lut[required_ids] = np.arange(len(required_ids))
+        kind_all = lut[det.cls] if len(det) else np.zeros(0, dtype=np.int64)
+        equipment = np.nonzero(confident & (kind_all >= 0))[0]
+
+        boxes = det.xyxy[persons].astype(np.float32)
+        matched, equip_owner = self.associate(boxes, det.xyxy[equipment].astype(np.float32), kind_all[equipment])
+        owner = np.full(len(det), -1, dtype=np.int64)
+        assigned = equip_owner >= 0
+        owner[equipment[assigned]] = persons[equip_owner[assigned]]
+
+        if ids is None and det.ids is not None:
+            ids = det.ids[persons]
+        if ids is not None:
+            ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+
+        # 指数平滑 + 滞回
+        rows = self._match_state(boxes, ids)
+        seen = rows >= 0
+        score = np.zeros(matched.shape, dtype=np.float32)
+        flag = np.zeros(matched.shape, dtype=bool)
+        score[seen], flag[seen] = self._score[rows[seen]], self._flag[rows[seen]]
+        score += self.alpha * ((~matched).astype(np.float32) - score)
+        flag = np.where(flag, score > self.off_score, score >= self.on_score)
+
+        # 本帧没出现的人员保留 max_age 帧 (短暂漏检后恢复时沿用之前的分数)
+        stale = np.ones(len(self._ids), dtype=bool)
+        stale[rows[seen]] = False
+        stale &= self._age < self.max_age
+        self._ids = np.concatenate([ids if ids is not None else np.full(len(boxes), -1, dtype=np.int64), self._ids[stale]])
+        self._boxes = np.concatenate([boxes, self._boxes[stale]])
+        self._score = np.concatenate([score, self._score[stale]])
+        self._flag = np.concatenate([flag, self._flag[stale]])
+        self._age = np.concatenate([np.zeros(len(boxes), dtype=np.int64), self._age[stale] + 1])
+
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return {
+            "persons": persons,
+            "matched": matched,
+            "missing": flag,
+            "violation": flag.any(axis=1),
+            "owner": owner,
+        }
+
+    def missing_names(self, out: dict) -> list:
+        """每个人员缺少的装备名称列表"""
+        return [[self.required[k] for k in np.nonzero(row)[0].tolist()] for row in out["missing"]]
+
+    def draw(
+        self,
+        frame: np.ndarray,
+        det: Detections,
+        out: dict,
+        ok_color: Tuple[int, int, int] = (0, 255, 0),
+        alert_color: Tuple[int, int, int] = (0, 0, 255)
+    ) -> np.ndarray:
+        """绘制人员框 (违规为红色并标注缺少的装备) 和装备到人员的连线 (原地绘制)"""
+        boxes = det.xyxy[out["persons"]].astype(int).tolist()
+        for (x1, y1, x2, y2), bad, missing in zip(boxes, out["violation"].tolist(), self.missing_names(out)):
+            color = alert_color if bad else ok_color
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            if bad:
+                cv2.putText(frame, "no " + "/".join(missing), (x1, max(y1 - 8, 12)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, alert_color, 2)
+        equip = np.nonzero(out["owner"] >= 0)[0]
+        centers = det.centers.astype(int)
+        for e, p in zip(equip.tolist(), out["owner"][equip].tolist()):
+            cv2.line(frame, tuple(centers[e].tolist()), tuple(centers[p].tolist()), ok_color, 1)
+        return frame
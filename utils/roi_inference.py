@@ -0,0 +1,271 @@
+"""
+ROI 裁剪推理: 只把画面中关心的区域送进模型
+计数线附近的一条带、禁区所在的一块区域才是有用的，整帧推理时模型的大部分像素都浪费在无关背景上，
+而且整帧缩放到 640 后远处的小目标只剩几个像素。
+
+这里按配置的 ROI (加上边距) 裁剪原图，超过 max_imgsz 的长条 ROI (如横跨整帧的计数线带) 切成相互重叠的小块，
+裁剪块按原始分辨率推理 (不缩小，也不超过 max_imgsz；总像素超过整帧推理时改用整帧推理的缩放比例)，
+相同尺寸的裁剪块组成一个批次一次推理，
+检测框再平移回整帧坐标，跨 ROI / 分块重复的目标用 NMS 合并。
+
+同时支持 Ultralytics YOLO 和 utils.onnx_backend.OnnxDetector
+(静态输入尺寸的 ONNX 模型会把裁剪块放大到模型输入尺寸，同样有利于小目标)
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.detections import Detections, nms, to_detections
+
+
+def line_band_roi(
+    p0: Sequence[float],
+    p1: Sequence[float],
+    half_width: float
+) -> Tuple[int, int, int, int]:
+    """
+    计数线两侧一条带的外接矩形
+
+    Args:
+        p0, p1: 计数线端点 (像素)
+        half_width: 带的半宽 (像素)，应大于目标的一半高度，保证越线的目标完整落在带内
+
+    Returns:
+        (x1, y1, x2, y2)
+    """
+    pts = np.array([p0, p1], dtype=np.float32)
+    x1, y1 = pts.min(axis=0) - half_width
+    x2, y2 = pts.max(axis=0) + half_width
+    return int(x1), int(y1), int(np.ceil(x2)), int(np.ceil(y2))
+
+
+def polygon_roi(polygon: Sequence[Sequence[float]]) -> Tuple[int, int, int, int]:
+    """多边形区域的外接矩形 (x1, y1, x2, y2)"""
+    pts = np.asarray(polygon, dtype=np.float32)
+    x1, y1 = pts.min(axis=0)
+    x2, y2 = pts.max(axis=0)
+    return int(x1), int(y1), int(np.ceil(x2)), int(np.ceil(y2))
+
+
+def clip_rois(rois, frame_shape: Tuple[int, int], margin: int = 0) -> np.ndarray:
+    """
+    ROI 加边距后裁剪到画面范围内，去掉面积为 0 的 ROI
+
+    Args:
+        rois: (R, 4) xyxy
+        frame_shape: (h, w)
+        margin: 每边外扩的像素
+
+    Returns:
+        (R', 4) int32 xyxy
+    """
+    h, w = frame_shape[:2]
+    rois = np.asarray(rois, dtype=np.float32).reshape(-1, 4)
+    rois = rois + np.array([-margin, -margin, margin, margin], dtype=np.float32)
+    rois[:, [0, 2]] = rois[:, [0, 2]].clip(0, w)
+    rois[:, [1, 3]] = rois[:, [1, 3]].clip(0, h)
+    rois = np.round(rois).astype(np.int32)
+    valid = (rois[:, 2] > rois[:, 0]) & (rois[:, 3] > rois[:, 1])
+    return rois[valid]
+
+
+def tile_rois(rois: np.ndarray, tile: int, overlap: int = 0) -> np.ndarray:
+    """
+    把超过 tile 的 ROI 切成不超过 tile × tile 的小块 (相邻小块重叠 overlap 像素，跨缝的目标至少完整落在一块里)
+
+    同一个 ROI 切出的小块尺寸相同，可以组成一个批次
+
+    Args:
+        rois: (R, 4) int xyxy
+        tile: 小块最大边长
+        overlap: 相邻小块的重叠像素 (应不小于目标尺寸，一般取 margin)
+
+    Returns:
+        (T, 4) int32 xyxy
+    """
+    tiles = []
+    overlap = min(overlap, tile // 2)
+    for x1, y1, x2, y2 in np.asarray(rois, dtype=np.int64).reshape(-1, 4).tolist():
+        axes = []
+        for lo, hi in ((x1, x2), (y1, y2)):
+            length = hi - lo
+            size = min(length, tile)
+            num = 1 if length <= tile else int(np.ceil((length - overlap) / (tile - overlap)))
+            starts = np.round(np.linspace(lo, hi - size, num)).astype(np.int64)
+            axes.append((starts, size))
+        (xs, w), (ys, h) = axes
+        gx, gy = np.meshgrid(xs, ys)
+        gx, gy = gx.ravel(), gy.ravel()
+        tiles.append(np.stack([gx, gy, gx + w, gy + h], axis=1))
+    if not tiles:
+        return np.zeros((0, 4), dtype=np.int32)
+    return np.concatenate(tiles).astype(np.int32)
+
+
+class RoiInference:
+    """
+    ROI 裁剪推理
+
+    Examples:
+        >>> roi_infer = RoiInference(model, [line_band_roi((0, 400), (1280, 400), 120)], margin=32)
+        >>> det = roi_infer(frame)          # Detections，坐标已映射回整帧
+        >>> print(roi_infer.pixel_ratio)    # 模型输入像素占整帧推理输入像素的比例
+        >>> roi_infer.last_boxes            # 本帧实际推理的裁剪块 (绘制用)
+    """
+
+    def __init__(
+        self,
+        model,
+        rois,
+        margin: int = 32,
+        batch: bool = True,
+        native: bool = True,
+        stride: int = 32,
+        max_imgsz: int = 640,
+        merge_iou: float = 0.6,
+        **infer_kwargs
+    ):
+        """
+        Args:
+            model: YOLO 模型或 OnnxDetector
+            rois: (R, 4) xyxy，整帧像素坐标
+            margin: 每个 ROI 外扩的像素，避免 ROI 边缘的目标被截断 (也作为分块之间的重叠)
+            batch: 相同尺寸的裁剪块是否组成一个批次推理 (否则逐个推理)
+            native: 按裁剪块原始分辨率推理 (imgsz 取裁剪块长边，向上取整到 stride)；
+                    这样送入模型的总像素超过整帧推理时 (高分辨率画面)，改为与整帧推理相同的缩放比例。
+                    False 时始终使用整帧推理的缩放比例
+            stride: 模型步长，imgsz 与分块尺寸对齐到它的倍数
+            max_imgsz: 模型默认输入尺寸；长边超过它的 ROI 会被切块，保证每次推理的像素不超过整帧推理
+            merge_iou: 多个 ROI / 分块重叠处同一目标被重复检测时，按类别 NMS 合并的 IoU 阈值
+            **infer_kwargs: 传给模型的其它参数 (conf、classes 等)
+        """
+        self.model = model
+        self.rois = np.asarray(rois, dtype=np.float32).reshape(-1, 4)
+        self.margin = margin
+        self.batch = batch
+        self.native = native
+        self.stride = stride
+        self.max_imgsz = int(max_imgsz // stride * stride)
+        self.merge_iou = merge_iou
+        self.infer_kwargs = infer_kwargs
+        self.infer_kwargs.setdefault("verbose", False)
+
+        self.speed = {}
+        self.pixel_ratio = 1.0       # 模型输入像素 (含 letterbox 填充) / 整帧推理的输入像素
+        self.crop_area_ratio = 1.0   # 裁剪块面积之和 / 整帧面积
+        self.last_boxes = np.zeros((0, 4), dtype=np.int32)
+
+    def set_rois(self, rois):
+        """更换 ROI (例如画面尺寸变化后重新换算)"""
+        self.rois = np.asarray(rois, dtype=np.float32).reshape(-1, 4)
+
+    def boxes(self, frame_shape: Tuple[int, int]) -> np.ndarray:
+        """(T, 4) 实际推理的裁剪块 (加边距、裁剪到画面内、长条切块后) 的整帧 xyxy"""
+        return tile_rois(clip_rois(self.rois, frame_shape, self.margin), self.max_imgsz, self.margin)
+
+    def crop(self, frame: np.ndarray) -> Tuple[list, np.ndarray]:
+        """
+        按 ROI 裁剪
+
+        Returns:
+            (裁剪块列表, (T, 4) 裁剪块在整帧中的 xyxy)
+        """
+        boxes = self.boxes(frame.shape)
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes.tolist()]
+        return crops, boxes
+
+    def _imgsz(self, shape: Tuple[int, int], scale: float = 1.0) -> int:
+        """裁剪块按 scale 缩放后的 imgsz (对齐到 stride，不超过 max_imgsz)"""
+        size = int(np.ceil(max(shape) * scale / self.stride) * self.stride)
+        return min(max(size, self.stride), self.max_imgsz)
+
+    def _input_pixels(self, shape: Tuple[int, int], imgsz: int) -> int:
+        """一张图送入模型的像素数 (含 letterbox 填充)"""
+        if hasattr(self.model, "dynamic_shape"):
+            # OnnxDetector: 填充成正方形；静态输入时固定为导出尺寸
+            if not self.model.dynamic_shape:
+                return int(np.prod(self.model.imgsz))
+            return imgsz * imgsz
+        # Ultralytics: 同尺寸的批次按长边缩放到 imgsz，只填充到 stride 的倍数
+        h, w = shape
+        r = imgsz / max(h, w)
+        return int(np.ceil(h * r / self.stride) * self.stride * np.ceil(w * r / self.stride) * self.stride)
+
+    def _infer(self, crops: list, frame_shape: Tuple[int, int]) -> Tuple[list, int]:
+        """
+        相同尺寸的裁剪块组成一个批次 (不同尺寸混在一批时会被统一填充成正方形)
+
+        Returns:
+            (按 crops 顺序的结果列表, 送入模型的总像素数)
+        """
+        groups = {}
+        for i, crop in enumerate(crops):
+            groups.setdefault(crop.shape[:2], []).append(i)
+
+        # 整帧推理的缩放比例与像素数: native 的总像素超过它时退回到同样的缩放比例
+        frame_scale = self.max_imgsz / max(frame_shape[:2])
+        budget = self._input_pixels(frame_shape[:2], self.max_imgsz)
+        scale = 1.0 if self.native else frame_scale
+        sizes = {shape: self.infer_kwargs.get("imgsz", self._imgsz(shape, scale)) for shape in groups}
+        pixels = sum(self._input_pixels(shape, sizes[shape]) * len(idx) for shape, idx in groups.items())
+        if self.native and pixels > budget and "imgsz" not in self.infer_kwargs:
+            sizes = {shape: self._imgsz(shape, frame_scale) for shape in groups}
+            pixels = sum(self._input_pixels(shape, sizes[shape]) * len(idx) for shape, idx in groups.items())
+
+        results = [None] * len(crops)
+        for shape, indices in groups.items():
+            kwargs = dict(self.infer_kwargs)
+            kwargs["imgsz"] = sizes[shape]
+            if self.batch:
+                outputs = list(self.model([crops[i] for i in indices], **kwargs))
+            else:
+                outputs = [self.model(crops[i], **kwargs)[0] for i in indices]
+            for i, output in zip(indices, outputs):
+                results[i] = output
+        return results, pixels
+
+    def __call__(self, frame: np.ndarray) -> Detections:
+        """
+        对一帧做 ROI 推理
+
+        Args:
+            frame: BGR 整帧
+
+        Returns:
+            Detections (整帧坐标)
+        """
+        names = getattr(self.model, "names", {})
+        crops, boxes = self.crop(frame)
+        self.last_boxes = boxes
+        h, w = frame.shape[:2]
+        self.crop_area_ratio = float(((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])).sum() / (h * w))
+        if not crops:
+            self.pixel_ratio = 0.0
+            empty = np.zeros(0, dtype=np.float32)
+            return Detections(np.zeros((0, 4), dtype=np.float32), empty, empty.astype(np.int64), names)
+
+        results, pixels = self._infer(crops, (h, w))
+        self.pixel_ratio = pixels / self._input_pixels((h, w), self.max_imgsz)
+
+        # 各裁剪块的检测框平移回整帧坐标，合并成一组数组
+        parts = [to_detections(result) for result in results]
+        offsets = np.repeat(boxes[:, [0, 1, 0, 1]], [len(p) for p in parts], axis=0).astype(np.float32)
+        xyxy = np.concatenate([p.xyxy for p in parts]) + offsets
+        conf = np.concatenate([p.conf for p in parts])
+        cls = np.concatenate([p.cls for p in parts])
+
+        # 速度按所有裁剪块累加 (一帧的总耗时)
+        self.speed = {}
+        for result in results:
+            for name, value in getattr(result, "speed", {}).items():
+                if value is not None:
+                    self.speed[name] = self.speed.get(name, 0.0) + value
+
+        # ROI 重叠时同一目标会被检测多次: 按类别 NMS (不同类别的框错开，互不抑制)
+        if len(boxes) > 1 and len(xyxy) > 1:
+            shifted = xyxy + cls[:, None].astype(np.float32) * (max(h, w) + 1)
+            keep = nms(shifted, conf, self.merge_iou)
+            xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+        return Detections(xyxy, conf, cls, names or results[0].names)
@@ -0,0 +1,374 @@
+"""
+声明式规则引擎: YAML 规则 → 向量化判定
+把"人的中心点在画面左侧 20%"这样的规则写死在检测循环里，每加一条规则就多一层 `for box in boxes`。
+这里把规则写在 YAML 里，加载后编译成一组数组，每帧对所有规则 × 所有检测框一次性计算:
+
+    类别    cls_mask[:, cls]            → (规则数, 框数)
+    置信度  conf >= min_conf[:, None]   → (规则数, 框数)
+    区域    栅格区域索引 (utils.zone_index) → (框数, 区域数) → 按规则取列
+    时间    当前时刻是否在生效时段内      → (规则数,)
+
+规则数增加只是矩阵变高，没有"每条规则 × 每个框"的 Python 循环。
+各阶段耗时由 utils.latency.LatencyTracker 统计，profile() 可以逐条规则单独计时。
+
+YAML 格式:
+
+    normalized: true              # 坐标为相对画面宽高的比例 (默认 true)
+    zones:                        # 命名区域，可被多条规则共用
+      left_strip: [[0, 0], [0.2, 0], [0.2, 1], [0, 1]]
+    rules:
+      - name: intrusion_left
+        zone: left_strip          # 区域名或内联多边形，省略表示全画面
+        anchor: center            # 区域判定用的锚点: center / bottom
+        classes: [person]         # 类别名或 ID，省略表示所有类别
+        min_conf: 0.3
+        min_count: 1              # 一帧内满足条件的目标数达到多少时触发
+        hold: 0                   # 条件需要持续多少秒才触发
+        active: ["22:00", "06:00"]  # 生效时段 (本地时间，可跨午夜)，省略表示全天
+        severity: high
+        message: 人员闯入禁区
+"""
+
+from pathlib import Path
+from typing import Optional, Tuple, Union
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+from utils.counting import anchor_points
+from utils.detections import Detections
+from utils.latency import LatencyTracker
+from utils.zone_index import ZoneIndex
+
+
+_RULE_DEFAULTS = {
+    "zone": None,
+    "anchor": "center",
+    "classes": None,
+    "min_conf": 0.0,
+    "min_count": 1,
+    "hold": 0.0,
+    "active": None,
+    "severity": "medium",
+    "message": "",
+}
+
+
+def _minutes(hhmm: str) -> int:
+    """"HH:MM" → 当天的分钟数"""
+    hours, minutes = str(hhmm).split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def build_polygons(rules: list, zones: dict, normalized: bool, frame_shape: Tuple[int, int]) -> tuple:
+    """
+    规则用到的区域换算为像素多边形 (命名区域按名称去重，内联多边形各占一个)
+
+    Returns:
+        (多边形列表, (R,) 每条规则的区域索引 (-1 表示不限区域), {区域名: 多边形索引})
+    """
+    h, w = frame_shape[:2]
+    scale = np.array([w, h], dtype=np.float64) if normalized else np.ones(2)
+    polygons, zone_ids = [], {}
+    zone_idx = np.full(len(rules), -1, dtype=np.int64)
+    for r, rule in enumerate(rules):
+        zone = rule["zone"]
+        if zone is None:
+            continue
+        key = zone if isinstance(zone, str) else id(zone)
+        if key not in zone_ids:
+            points = zones[zone] if isinstance(zone, str) else zone
+            zone_ids[key] = len(polygons)
+            polygons.append(np.asarray(points, dtype=np.float64).reshape(-1, 2) * scale)
+        zone_idx[r] = zone_ids[key]
+    named = {key: z for key, z in zone_ids.items() if isinstance(key, str)}
+    return polygons, zone_idx, named
+
+
+class _CompiledRules:
+    """编译后的规则数组 (对应一个画面尺寸和一套类别名)"""
+
+    def __init__(
+        self,
+        rules: list,
+        zones: dict,
+        normalized: bool,
+        frame_shape: Tuple[int, int],
+        names: dict,
+        cell: int = 8
+    ):
+        name_to_id = {v: k for k, v in names.items()}
+        num_classes = max(max(names, default=-1) + 1, 1)
+
+        num_rules = len(rules)
+        self.cls_mask = np.zeros((num_rules, num_classes), dtype=bool)
+        self.min_conf = np.zeros(num_rules, dtype=np.float32)
+        self.min_count = np.ones(num_rules, dtype=np.int64)
+        self.hold = np.zeros(num_rules, dtype=np.float64)
+        self.bottom = np.zeros(num_rules, dtype=bool)
+        self.has_active = np.zeros(num_rules, dtype=bool)
+        self.active_start = np.zeros(num_rules, dtype=np.int64)
+        self.active_end = np.zeros(num_rules, dtype=np.int64)
+        polygons, self.zone_idx, self.zone_ids = build_polygons(rules, zones, normalized, frame_shape)
+        h, w = frame_shape[:2]
+        self.scale = np.array([w, h], dtype=np.float64) if normalized else np.ones(2)
+        # 区域查询走栅格索引: 点 → 格子 O(1)，只有边界格子里的点做精确测试
+        self.index = ZoneIndex(polygons, frame_shape, cell=cell)
+
+        for r, rule in enumerate(rules):
+            classes = rule["classes"]
+            if classes is None:
+                self.cls_mask[r] = True
+            else:
+                for c in classes:
+                    cls_id = name_to_id.get(c, c)
+                    if not isinstance(cls_id, int) or not 0 <= cls_id < num_classes:
+                        raise ValueError(f"规则 {rule['name']}: 未知类别 {c!r}")
+                    self.cls_mask[r, cls_id] = True
+
+            self.min_conf[r] = rule["min_conf"]
+            self.min_count[r] = rule["min_count"]
+            self.hold[r] = rule["hold"]
+            self.bottom[r] = rule["anchor"] == "bottom"
+
+            if rule["active"] is not None:
+                start, end = rule["active"]
+                self.has_active[r] = True
+                self.active_start[r], self.active_end[r] = _minutes(start), _minutes(end)
+
+    @property
+    def polygons(self) -> list:
+        return self.index.polygons
+
+    def subset(self, rows: np.ndarray) -> "_CompiledRules":
+        """只保留部分规则 (区域也只保留这些规则用到的)"""
+        sub = object.__new__(_CompiledRules)
+        sub.__dict__.update(self.__dict__)
+        for name in ("cls_mask", "min_conf", "min_count", "hold", "bottom", "zone_idx",
+                     "has_active", "active_start", "active_end"):
+            setattr(sub, name, getattr(self, name)[rows])
+
+        used = np.unique(sub.zone_idx[sub.zone_idx >= 0])
+        remap = np.full(len(self.polygons) + 1, -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        sub.zone_idx = remap[sub.zone_idx]  # -1 仍映射为 -1 (remap 最后一位)
+        sub.index = ZoneIndex([self.polygons[z] for z in used.tolist()], self.index.frame_shape, self.index.cell)
+        return sub
+
+
+class RuleEngine:
+    """
+    规则引擎
+
+    Examples:
+        >>> engine = RuleEngine.from_yaml("rules.yaml")
+        >>> det = to_detections(result)
+        >>> out = engine.evaluate(det, frame.shape)
+        >>> for alert in out["alerts"]:
+        ...     print(alert["rule"], alert["message"], alert["indices"])
+        >>> print_latency_stats(engine.latency.summary())
+    """
+
+    def __init__(
+        self,
+        rules: list,
+        zones: Optional[dict] = None,
+        normalized: bool = True,
+        window: int = 300,
+        zone_cell: int = 8
+    ):
+        """
+        Args:
+            rules: 规则字典列表 (字段见模块说明)
+            zones: 命名区域 {名称: [(x, y), ...]}
+            normalized: 坐标是否为相对画面宽高的比例
+            window: 耗时统计保留最近多少帧
+            zone_cell: 区域索引的网格大小 (像素)
+        """
+        self.zones = dict(zones or {})
+        self.normalized = normalized
+        self.zone_cell = zone_cell
+        self.rules = []
+        for i, rule in enumerate(rules):
+            unknown = set(rule) - set(_RULE_DEFAULTS) - {"name"}
+            if unknown:
+                raise ValueError(f"规则 {rule.get('name', i)}: 未知字段 {sorted(unknown)}")
+            rule = {**_RULE_DEFAULTS, "name": f"rule_{i}", **rule}
+            if isinstance(rule["zone"], str) and rule["zone"] not in self.zones:
+                raise ValueError(f"规则 {rule['name']}: 未定义的区域 {rule['zone']!r}")
+            if rule["anchor"] not in ("center", "bottom"):
+                raise ValueError(f"规则 {rule['name']}: anchor 只能是 'center' 或 'bottom'")
+            self.rules.append(rule)
+
+        self.latency = LatencyTracker(window)
+        self.fired_counts = np.zeros(len(self.rules), dtype=np.int64)
+        self._compiled = None
+        self._compiled_key = None
+        # 每条规则条件连续成立的起始时间 (hold 用)，NaN 表示当前不成立
+        self._since = np.full(len(self.rules), np.nan)
+
+    @classmethod
+    def from_yaml(cls, path: Union[str, Path], **kwargs) -> "RuleEngine":
+        """从 YAML 文件加载规则"""
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        return cls(
+            config.get("rules", []),
+            zones=config.get("zones"),
+            normalized=config.get("normalized", True),
+            **kwargs,
+        )
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def compile(self, frame_shape: Tuple[int, int], names: dict) -> _CompiledRules:
+        """按画面尺寸和类别名编译规则 (结果会缓存，尺寸不变时不重复编译)"""
+        key = (tuple(frame_shape[:2]), tuple(sorted(names.items())))
+        if key != self._compiled_key:
+            self._compiled = _CompiledRules(
+                self.rules, self.zones, self.normalized, frame_shape, names, cell=self.zone_cell
+            )
+            self._compiled_key = key
+        return self._compiled
+
+    def zone_polygons(self, frame_shape: Tuple[int, int]) -> list:
+        """所有区域的像素坐标多边形 (绘制或生成 ROI 用)"""
+        return build_polygons(self.rules, self.zones, self.normalized, frame_shape)[0]
+
+    def set_zone(self, name: str, points):
+        """
+        运行时修改命名区域 (例如操作员在界面上拖动了区域顶点)
+
+        已编译时只重新栅格化这一个区域，不重新编译其它规则
+        """
+        if name not in self.zones:
+            raise KeyError(f"未定义的区域: {name!r}")
+        self.zones[name] = points
+        compiled = self._compiled
+        if compiled is not None and name in compiled.zone_ids:
+            poly = np.asarray(points, dtype=np.float64).reshape(-1, 2) * compiled.scale
+            compiled.index.update_zone(compiled.zone_ids[name], poly)
+
+    def _match(self, compiled: _CompiledRules, det: Detections) -> np.ndarray:
+        """规则 × 检测框的命中矩阵 (R, N)"""
+        latency = self.latency
+        num_classes = compiled.cls_mask.shape[1]
+
+        start = time.perf_counter()
+        known = (det.cls >= 0) & (det.cls < num_classes)
+        hits = compiled.cls_mask[:, np.where(known, det.cls, 0)] & known[None]
+        latency.add("class", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hits &= det.conf[None] >= compiled.min_conf[:, None]
+        latency.add("conf", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        zoned = compiled.zone_idx >= 0
+        if zoned.any() and len(det):
+            zone_hits = np.ones_like(hits)
+            for bottom in (False, True):
+                rows = zoned & (compiled.bottom == bottom)
+                if rows.any():
+                    points = anchor_points(det.xyxy, "bottom" if bottom else "center")
+                    inside = compiled.index.lookup(points)  # (N, Z)
+                    zone_hits[rows] = inside[:, compiled.zone_idx[rows]].T
+            hits &= zone_hits
+        latency.add("zone", time.perf_counter() - start)
+        return hits
+
+    def _active(self, compiled: _CompiledRules, t: float) -> np.ndarray:
+        """各规则当前是否在生效时段内 (R,)"""
+        local = time.localtime(t)
+        minute = local.tm_hour * 60 + local.tm_min
+        s, e = compiled.active_start, compiled.active_end
+        in_window = np.where(s <= e, (minute >= s) & (minute < e), (minute >= s) | (minute < e))
+        return ~compiled.has_active | in_window
+
+    def evaluate(self, det: Detections, frame_shape: Tuple[int, int], t: Optional[float] = None) -> dict:
+        """
+        对一帧的检测结果评估所有规则
+
+        Args:
+            det: 检测结果 (utils.detections.Detections)
+            frame_shape: 画面尺寸 (h, w, ...)，用于换算比例坐标
+            t: 当前时间 (time.time())，None 表示现在
+
+        Returns:
+            {"hits": (R, N) bool 命中矩阵,
+             "counts": (R,) 每条规则的命中目标数,
+             "fired": (R,) bool 本帧触发的规则,
+             "alerts": [{"rule", "severity", "message", "indices"}] 只包含触发的规则}
+        """
+        t = time.time() if t is None else t
+        compiled = self.compile(frame_shape, det.names)
+        total_start = time.perf_counter()
+
+        hits = self._match(compiled, det)
+        counts = hits.sum(axis=1)
+
+        start = time.perf_counter()
+        condition = (counts >= compiled.min_count) & self._active(compiled, t)
+        self._since[~condition] = np.nan
+        self._since[condition & np.isnan(self._since)] = t
+        fired = condition & (t - np.nan_to_num(self._since, nan=t) >= compiled.hold)
+        self.latency.add("time", time.perf_counter() - start)
+
+        self.fired_counts += fired
+        self.latency.add("total", time.perf_counter() - total_start)
+        self.latency.frames += 1
+
+        # 只遍历触发的规则 (通常很少)
+        alerts = [
+            {
+                "rule": self.rules[r]["name"],
+                "severity": self.rules[r]["severity"],
+                "message": self.rules[r]["message"],
+                "indices": np.nonzero(hits[r])[0],
+            }
+            for r in np.nonzero(fired)[0].tolist()
+        ]
+        return {"hits": hits, "counts": counts, "fired": fired, "alerts": alerts}
+
+    def profile(self, det: Detections, frame_shape: Tuple[int, int], repeats: int = 20) -> dict:
+        """
+        逐条规则单独计时 (诊断哪条规则开销大，不影响 hold 状态)
+
+        Returns:
+            {规则名: 平均耗时 (ms)}
+        """
+        compiled = self.compile(frame_shape, det.names)
+        saved = self.latency
+        self.latency = LatencyTracker(window=1)
+        timings = {}
+        try:
+            for r, rule in enumerate(self.rules):
+                sub = compiled.subset(np.array([r]))
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    self._match(sub, det)
+                timings[rule["name"]] = (time.perf_counter() - start) / repeats * 1000
+        finally:
+            self.latency = saved
+        return timings
+
+    def timing(self) -> dict:
+        """各阶段平均耗时 (ms) 以及平均到每条规则的耗时 (µs)"""
+        summary = self.latency.summary()
+        stats = {name: s["mean_ms"] for name, s in summary.items()}
+        if "total" in stats and self.rules:
+            stats["per_rule_us"] = stats["total"] * 1000 / len(self.rules)
+        return stats
+
+    def draw_zones(self, frame: np.ndarray, color: Tuple[int, int, int] = (0, 0, 255), alpha: float = 0.3) -> np.ndarray:
+        """半透明绘制所有区域 (原地绘制)"""
+        polygons = self.zone_polygons(frame.shape)
+        if polygons:
+            overlay = frame.copy()
+            for poly in polygons:
+                cv2.fillPoly(overlay, [poly.round().astype(np.int32)], color)
+            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, dst=frame)
+        return frame
@@ -0,0 +1,274 @@
+"""
+多目标跟踪 (SORT / ByteTrack 风格，纯 numpy)
+给每个检测目标分配稳定的 ID，供越线计数、停留检测等需要"同一个目标"的逻辑使用
+
+- 卡尔曼滤波: 状态 [cx, cy, w, h, vx, vy, vw, vh]，所有轨迹的预测 / 更新一次批量完成
+- 代价矩阵: 轨迹预测框与检测框的 IoU (向量化)，不同类别之间禁止匹配
+- 匹配: 匈牙利算法 (scipy.optimize.linear_sum_assignment)，未安装 scipy 时退化为贪心匹配
+- ByteTrack 两阶段关联: 先用高分检测匹配，剩余轨迹再用低分检测匹配 (遮挡时置信度下降的目标不会丢 ID)
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from utils.detections import box_iou
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def xyxy_to_cxcywh(xyxy: np.ndarray) -> np.ndarray:
+    return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+
+def cxcywh_to_xyxy(cxcywh: np.ndarray) -> np.ndarray:
+    half = cxcywh[:, 2:4] / 2
+    return np.concatenate([cxcywh[:, :2] - half, cxcywh[:, :2] + half], axis=1)
+
+
+def linear_assignment(cost: np.ndarray, max_cost: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    最小代价匹配
+
+    Args:
+        cost: (N, M) 代价矩阵
+        max_cost: 代价超过该值的匹配视为无效
+
+    Returns:
+        (matches (K, 2), 未匹配的行, 未匹配的列)
+    """
+    rows, cols = cost.shape
+    if rows == 0 or cols == 0:
+        return np.zeros((0, 2), dtype=np.int64), np.arange(rows), np.arange(cols)
+
+    if linear_sum_assignment is not None:
+        r, c = linear_sum_assignment(cost)
+    else:
+        # 贪心: 按代价从小到大依次匹配
+        r, c = [], []
+        used_r, used_c = set(), set()
+        for flat in np.argsort(cost, axis=None):
+            i, j = divmod(int(flat), cols)
+            if cost[i, j] > max_cost:
+                break
+            if i not in used_r and j not in used_c:
+                used_r.add(i)
+                used_c.add(j)
+                r.append(i)
+                c.append(j)
+        r, c = np.array(r, dtype=np.int64), np.array(c, dtype=np.int64)
+
+    valid = cost[r, c] <= max_cost
+    matches = np.stack([r[valid], c[valid]], axis=1).astype(np.int64)
+    unmatched_rows = np.setdiff1d(np.arange(rows), matches[:, 0])
+    unmatched_cols = np.setdiff1d(np.arange(cols), matches[:, 1])
+    return matches, unmatched_rows, unmatched_cols
+
+
+class KalmanBoxFilter:
+    """
+    匀速运动模型的卡尔曼滤波，对 N 个目标批量计算
+    噪声与目标尺寸成正比 (与 ByteTrack 相同)，远处的小目标和近处的大目标同样适用
+    """
+
+    def __init__(self, std_position: float = 1 / 20, std_velocity: float = 1 / 160):
+        self.std_position = std_position
+        self.std_velocity = std_velocity
+
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)  # 位置 += 速度
+        self.H = np.eye(4, 8)
+
+    def _size(self, mean: np.ndarray) -> np.ndarray:
+        # 用 (w, h, w, h) 作为各维度噪声的尺度
+        return np.concatenate([mean[:, 2:4], mean[:, 2:4]], axis=1)
+
+    def initiate(self, measurement: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """由 (N, 4) cxcywh 测量初始化状态"""
+        n = len(measurement)
+        mean = np.zeros((n, 8))
+        mean[:, :4] = measurement
+        size = self._size(mean)
+        std = np.concatenate([2 * self.std_position * size, 10 * self.std_velocity * size], axis=1)
+        cov = np.zeros((n, 8, 8))
+        cov[:, np.arange(8), np.arange(8)] = std ** 2
+        return mean, cov
+
+    def predict(self, mean: np.ndarray, cov: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        size = self._size(mean)
+        std = np.concatenate([self.std_position * size, self.std_velocity * size], axis=1)
+        Q = np.zeros_like(cov)
+        Q[:, np.arange(8), np.arange(8)] = std ** 2
+
+        mean = mean @ self.F.T
+        cov = self.F @ cov @ self.F.T + Q
+        return mean, cov
+
+    def update(self, mean: np.ndarray, cov: np.ndarray, measurement: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        std = self.std_position * self._size(mean)[:, :4]
+        R = np.zeros((len(mean), 4, 4))
+        R[:, np.arange(4), np.arange(4)] = std ** 2
+
+        S = self.H @ cov @ self.H.T + R                     # (N, 4, 4)
+        PHt = cov @ self.H.T                                 # (N, 8, 4)
+        K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)  # (N, 8, 4)
+        innovation = measurement - mean[:, :4]
+
+        mean = mean + np.einsum("nij,nj->ni", K, innovation)
+        cov = cov - K @ self.H @ cov
+        return mean, cov
+
+
+class ByteTracker:
+    """
+    ByteTrack 风格的多目标跟踪器
+
+    Examples:
+        >>> tracker = ByteTracker()
+        >>> det = to_detections(result)
+        >>> tracks = tracker.update(det.xyxy, det.conf, det.cls)
+        >>> for (x1, y1, x2, y2), track_id in zip(tracks["xyxy"].astype(int).tolist(), tracks["ids"].tolist()):
+        ...     cv2.putText(frame, f"#{track_id}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    """
+
+    def __init__(
+        self,
+        high_thresh: float = 0.5,
+        low_thresh: float = 0.1,
+        new_track_thresh: float = 0.6,
+        match_iou: float = 0.2,
+        low_match_iou: float = 0.5,
+        max_age: int = 30,
+        min_hits: int = 2
+    ):
+        """
+        Args:
+            high_thresh: 第一阶段关联使用的检测置信度下限
+            low_thresh: 低于该置信度的检测直接丢弃
+            new_track_thresh: 未匹配的检测置信度达到该值才新建轨迹
+            match_iou: 第一阶段匹配的最小 IoU
+            low_match_iou: 第二阶段 (低分检测) 匹配的最小 IoU
+            max_age: 轨迹连续多少帧未匹配后删除
+            min_hits: 轨迹至少匹配多少次才输出 (过滤一闪而过的误检)
+        """
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.max_age = max_age
+        self.min_hits = min_hits
+
+        self.kf = KalmanBoxFilter()
+        self.reset()
+
+    def reset(self):
+        """清空所有轨迹"""
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self._next_id = 1
+        self.frame_id = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _associate(self, track_idx: np.ndarray, xyxy: np.ndarray, cls: np.ndarray, min_iou: float):
+        """轨迹子集与检测子集按 IoU 匹配 (不同类别代价为无穷大)"""
+        track_boxes = cxcywh_to_xyxy(self.mean[track_idx, :4])
+        cost = 1.0 - box_iou(track_boxes, xyxy)
+        cost[self.cls[track_idx][:, None] != cls[None, :]] = 1e6
+        return linear_assignment(cost, max_cost=1.0 - min_iou)
+
+    def update(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> dict:
+        """
+        输入一帧的检测，返回当前帧的轨迹
+
+        Args:
+            xyxy: (N, 4) 检测框
+            conf: (N,) 置信度
+            cls: (N,) 类别
+
+        Returns:
+            {"xyxy": (M, 4), "ids": (M,), "cls": (M,), "conf": (M,)}，只包含本帧匹配上且已确认的轨迹
+        """
+        self.frame_id += 1
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        cls = np.asarray(cls).reshape(-1).astype(np.int64)
+
+        keep = conf >= self.low_thresh
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+        measurement = xyxy_to_cxcywh(xyxy)
+
+        # 1. 所有轨迹预测到当前帧 (宽高速度可能把框预测成负尺寸，截断到至少 1 像素)
+        if len(self):
+            self.mean, self.cov = self.kf.predict(self.mean, self.cov)
+            self.mean[:, 2:4] = np.maximum(self.mean[:, 2:4], 1.0)
+
+        # 2. 高分检测与所有轨迹匹配
+        high = np.flatnonzero(conf >= self.high_thresh)
+        low = np.flatnonzero(conf < self.high_thresh)
+        all_tracks = np.arange(len(self))
+        matches, unmatched_tracks, unmatched_high = self._associate(all_tracks, xyxy[high], cls[high], self.match_iou)
+        matched_tracks = [all_tracks[matches[:, 0]]]
+        matched_dets = [high[matches[:, 1]]]
+
+        # 3. 剩余轨迹与低分检测匹配
+        remaining = all_tracks[unmatched_tracks]
+        matches, _, _ = self._associate(remaining, xyxy[low], cls[low], self.low_match_iou)
+        matched_tracks.append(remaining[matches[:, 0]])
+        matched_dets.append(low[matches[:, 1]])
+
+        matched_tracks = np.concatenate(matched_tracks)
+        matched_dets = np.concatenate(matched_dets)
+
+        # 4. 批量更新匹配上的轨迹
+        self.misses += 1
+        if len(matched_tracks):
+            self.mean[matched_tracks], self.cov[matched_tracks] = self.kf.update(
+                self.mean[matched_tracks], self.cov[matched_tracks], measurement[matched_dets]
+            )
+            self.conf[matched_tracks] = conf[matched_dets]
+            self.hits[matched_tracks] += 1
+            self.misses[matched_tracks] = 0
+
+        # 5. 删除长时间未匹配的轨迹
+        alive = self.misses <= self.max_age
+        self._select(alive)
+
+        # 6. 未匹配的高分检测新建轨迹
+        new = high[unmatched_high]
+        new = new[conf[new] >= self.new_track_thresh]
+        if len(new):
+            mean, cov = self.kf.initiate(measurement[new])
+            self.mean = np.concatenate([self.mean, mean])
+            self.cov = np.concatenate([self.cov, cov])
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + len(new))])
+            self.cls = np.concatenate([self.cls, cls[new]])
+            self.conf = np.concatenate([self.conf, conf[new]])
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new), dtype=np.int64)])
+            self._next_id += len(new)
+
+        # 输出: 本帧匹配上、且已确认的轨迹 (视频开头几帧直接输出，不等待确认)
+        confirmed = (self.hits >= self.min_hits) | (self.frame_id <= self.min_hits)
+        output = (self.misses == 0) & confirmed
+        return {
+            "xyxy": cxcywh_to_xyxy(self.mean[output, :4]),
+            "ids": self.ids[output],
+            "cls": self.cls[output],
+            "conf": self.conf[output],
+        }
+
+    def _select(self, mask: np.ndarray):
+        self.mean, self.cov = self.mean[mask], self.cov[mask]
+        self.ids, self.cls, self.conf = self.ids[mask], self.cls[mask], self.conf[mask]
+        self.hits, self.misses = self.hits[mask], self.misses[mask]
@@ -0,0 +1,274 @@
+"""
+按时间桶聚合的流量统计
+计数结果只在结束时打印一个总数，7x24 运行的视频流既看不到"最近 5 分钟多少车"，
+也没法按时间段导出报表。这里把越线事件按 (计数线, 类别, 方向) 累加到固定长度的时间桶里:
+
+- 多种分辨率同时统计 (默认 1 s / 1 min / 15 min)，每种分辨率是一个环形缓冲
+  (capacity, 线数, 类别数, 2) 的 int32 数组，内存占用固定，不随运行时间增长
+- 滚动窗口查询 / 速率只需对几十个桶求和，不需要回放原始事件
+- 已结束的桶可以定期追加写入 CSV (或 Parquet，需要 pandas + pyarrow)
+
+环形缓冲写满后最旧的桶会被覆盖，需要长期保存时按 flush_interval 定期落盘
+"""
+
+from pathlib import Path
+from typing import Optional, Sequence, Union
+import csv
+import time
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+DIRECTIONS = ("in", "out")
+
+
+class _RingBuckets:
+    """单一分辨率的环形时间桶"""
+
+    def __init__(self, resolution: float, capacity: int, shape: tuple):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.counts = np.zeros((capacity,) + shape, dtype=np.int32)
+        # 每个槽位当前存放的桶编号 (floor(t / resolution))，-1 表示空
+        self.bucket_ids = np.full(capacity, -1, dtype=np.int64)
+        self.flushed_until = -1  # 已落盘的最大桶编号
+
+    def bucket_of(self, t: float) -> int:
+        return int(t // self.resolution)
+
+    def add(self, bucket: int, line: np.ndarray, cls: np.ndarray, direction: np.ndarray):
+        slot = bucket % self.capacity
+        if self.bucket_ids[slot] != bucket:
+            # 槽位里是很久以前的桶: 覆盖
+            self.counts[slot] = 0
+            self.bucket_ids[slot] = bucket
+        np.add.at(self.counts[slot], (line, cls, direction), 1)
+
+    def window(self, first: int, last: int) -> np.ndarray:
+        """桶编号在 [first, last] 内的槽位掩码"""
+        return (self.bucket_ids >= first) & (self.bucket_ids <= last)
+
+    def series(self, last: int, num: int) -> np.ndarray:
+        """以 last 结尾的连续 num 个桶 (按时间顺序，缺失的桶为 0)"""
+        buckets = np.arange(last - num + 1, last + 1)
+        slots = buckets % self.capacity
+        valid = self.bucket_ids[slots] == buckets
+        out = np.zeros((num,) + self.counts.shape[1:], dtype=np.int32)
+        out[valid] = self.counts[slots[valid]]
+        return out
+
+
+class TrafficStore:
+    """
+    按时间桶聚合的越线计数
+
+    Examples:
+        >>> store = TrafficStore(counter.line_names, model.names, flush_dir="outputs/traffic")
+        >>> events = counter.update(tracks["ids"], tracks["xyxy"], tracks["cls"])
+        >>> store.add_events(events["crossed"])
+        >>> store.query(300)                  # 最近 5 分钟: (线数, 类别数, 2)
+        >>> store.rates(60, per=60)           # 最近 1 分钟每分钟的车流量 (按线 / 类别 / 方向)
+        >>> store.maybe_flush()               # 每 flush_interval 秒把已结束的桶追加写入文件
+    """
+
+    def __init__(
+        self,
+        line_names: Sequence[str],
+        class_names: Union[dict, Sequence[str]],
+        resolutions: Sequence[float] = (1, 60, 900),
+        capacities: Sequence[int] = (3600, 1440, 672),
+        flush_dir: Optional[Union[str, Path]] = None,
+        flush_interval: float = 60.0,
+        fmt: str = "csv",
+        clock=time.time
+    ):
+        """
+        Args:
+            line_names: 计数线名称 (与 CountingEngine.line_names 顺序一致)
+            class_names: 类别 ID → 名称 (model.names)
+            resolutions: 各级时间桶长度 (秒)
+            capacities: 各级保留的桶数，默认 1 s × 1 小时、1 min × 1 天、15 min × 1 周
+            flush_dir: 落盘目录，None 表示不落盘
+            flush_interval: maybe_flush 的最小间隔 (秒)
+            fmt: "csv" 或 "parquet" (需要 pandas + pyarrow)
+            clock: 时间函数，默认墙上时钟 time.time (导出的时间戳可直接用于看板)
+        """
+        if len(resolutions) != len(capacities):
+            raise ValueError("resolutions 和 capacities 长度必须一致")
+        if fmt not in ("csv", "parquet"):
+            raise ValueError(f"不支持的格式: {fmt}，可选 'csv' / 'parquet'")
+        if fmt == "parquet" and pd is None:
+            raise ImportError("导出 Parquet 需要安装 pandas 和 pyarrow: pip install pandas pyarrow")
+
+        self.line_names = list(line_names)
+        if isinstance(class_names, dict):
+            self.class_names = [class_names.get(i, str(i)) for i in range(max(class_names, default=-1) + 1)]
+        else:
+            self.class_names = list(class_names)
+        shape = (len(self.line_names), len(self.class_names), len(DIRECTIONS))
+
+        self.levels = [_RingBuckets(r, c, shape) for r, c in zip(resolutions, capacities)]
+        self.flush_dir = Path(flush_dir) if flush_dir is not None else None
+        self.flush_interval = flush_interval
+        self.fmt = fmt
+        self.clock = clock
+        self._last_flush = clock()
+
+    @property
+    def nbytes(self) -> int:
+        """环形缓冲占用的内存 (字节)，创建后固定不变"""
+        return sum(level.counts.nbytes + level.bucket_ids.nbytes for level in self.levels)
+
+    def add(self, line, cls, direction, t: Optional[float] = None):
+        """
+        记录一批越线事件 (同一时刻)
+
+        Args:
+            line: (K,) 计数线索引
+            cls: (K,) 类别 ID
+            direction: (K,) "in" / "out" 或 0 / 1
+            t: 事件时间，None 表示当前时间
+        """
+        line = np.asarray(line, dtype=np.int64).reshape(-1)
+        if len(line) == 0:
+            return
+        cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        direction = np.asarray(direction).reshape(-1)
+        if direction.dtype.kind in "US":
+            direction = (direction == DIRECTIONS[1]).astype(np.int64)
+
+        t = self.clock() if t is None else t
+        for level in self.levels:
+            level.add(level.bucket_of(t), line, cls, direction.astype(np.int64))
+
+    def add_events(self, crossed: dict, t: Optional[float] = None):
+        """记录 CountingEngine.update 返回的 events["crossed"]"""
+        self.add(crossed["line"], crossed["cls"], crossed["direction"], t)
+
+    def _level_for(self, seconds: float) -> _RingBuckets:
+        """能覆盖该时长的最细分辨率"""
+        for level in self.levels:
+            if level.resolution * level.capacity >= seconds:
+                return level
+        return self.levels[-1]
+
+    def query(self, seconds: float, now: Optional[float] = None) -> np.ndarray:
+        """
+        最近 seconds 秒的计数 (按桶对齐，包含当前未结束的桶)
+
+        Returns:
+            (线数, 类别数, 2) int64，最后一维为 (in, out)
+        """
+        now = self.clock() if now is None else now
+        level = self._level_for(seconds)
+        last = level.bucket_of(now)
+        first = last - max(int(np.ceil(seconds / level.resolution)), 1) + 1
+        return level.counts[level.window(first, last)].sum(axis=0, dtype=np.int64)
+
+    def rates(self, seconds: float, per: float = 60.0, now: Optional[float] = None) -> np.ndarray:
+        """
+        最近 seconds 秒的平均速率
+
+        Args:
+            per: 速率单位 (秒)，默认 60 即"辆 / 分钟"
+
+        Returns:
+            (线数, 类别数, 2) float64
+        """
+        return self.query(seconds, now) * (per / seconds)
+
+    def series(self, resolution: float, num: int, now: Optional[float] = None) -> tuple:
+        """
+        某一分辨率最近 num 个桶的时间序列 (看板画折线图用)
+
+        Returns:
+            (桶起始时间 (num,), 计数 (num, 线数, 类别数, 2))
+        """
+        level = next((lv for lv in self.levels if lv.resolution == resolution), None)
+        if level is None:
+            raise ValueError(f"没有 {resolution}s 分辨率的时间桶，可选: {[lv.resolution for lv in self.levels]}")
+        num = min(num, level.capacity)
+        last = level.bucket_of(self.clock() if now is None else now)
+        starts = np.arange(last - num + 1, last + 1) * level.resolution
+        return starts, level.series(last, num)
+
+    def summary(self, seconds: float, now: Optional[float] = None) -> dict:
+        """最近 seconds 秒的计数，按 {线: {方向: {类别名: 数量}}} 展开 (只保留非零项)"""
+        counts = self.query(seconds, now)
+        summary = {}
+        for l, line in enumerate(self.line_names):
+            summary[line] = {
+                d: {self.class_names[c]: int(counts[l, c, k]) for c in np.nonzero(counts[l, :, k])[0].tolist()}
+                for k, d in enumerate(DIRECTIONS)
+            }
+        return summary
+
+    def _rows(self, level: _RingBuckets, last_closed: int) -> list:
+        """尚未落盘、且已经结束的桶 → 稀疏行 (只输出非零计数)"""
+        mask = (level.bucket_ids > level.flushed_until) & (level.bucket_ids <= last_closed)
+        slots = np.nonzero(mask)[0]
+        slots = slots[np.argsort(level.bucket_ids[slots])]
+        s, l, c, d = np.nonzero(level.counts[slots])
+        buckets = level.bucket_ids[slots][s]
+        return [
+            {
+                "bucket_start": float(b * level.resolution),
+                "resolution_s": level.resolution,
+                "line": self.line_names[li],
+                "class": self.class_names[ci],
+                "direction": DIRECTIONS[di],
+                "count": int(level.counts[slots[si], li, ci, di]),
+            }
+            for b, si, li, ci, di in zip(buckets.tolist(), s.tolist(), l.tolist(), c.tolist(), d.tolist())
+        ]
+
+    def flush(self, now: Optional[float] = None, final: bool = False) -> list:
+        """
+        把各级分辨率中已经结束、尚未落盘的桶追加写入 flush_dir
+        final=True 时当前未结束的桶也一并写入 (视频处理结束时调用)
+
+        CSV 每种分辨率一个文件 (traffic_<分辨率>s.csv，追加写入)；
+        Parquet 不支持追加，每次写一个分片 (traffic_<分辨率>s_<首个桶编号>.parquet)
+
+        Returns:
+            本次写入的文件路径列表
+        """
+        if self.flush_dir is None:
+            raise ValueError("未设置 flush_dir")
+        self.flush_dir.mkdir(parents=True, exist_ok=True)
+        now = self.clock() if now is None else now
+        self._last_flush = now
+
+        written = []
+        for level in self.levels:
+            last_closed = level.bucket_of(now) - (0 if final else 1)
+            rows = self._rows(level, last_closed)
+            tag = f"{level.resolution:g}s"
+            if rows:
+                if self.fmt == "csv":
+                    path = self.flush_dir / f"traffic_{tag}.csv"
+                    new_file = not path.exists()
+                    with open(path, "a", newline="", encoding="utf-8") as f:
+                        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                        if new_file:
+                            writer.writeheader()
+                        writer.writerows(rows)
+                else:
+                    first_bucket = int(rows[0]["bucket_start"] // level.resolution)
+                    path = self.flush_dir / f"traffic_{tag}_{first_bucket}.parquet"
+                    pd.DataFrame(rows).to_parquet(path, index=False)
+                written.append(path)
+            level.flushed_until = max(level.flushed_until, last_closed)
+        return written
+
+    def maybe_flush(self, now: Optional[float] = None) -> list:
+        """距上次落盘超过 flush_interval 秒时调用 flush (放在处理循环里每帧调用即可)"""
+        now = self.clock() if now is None else now
+        if self.flush_dir is None or now - self._last_flush < self.flush_interval:
+            return []
+        return self.flush(now)
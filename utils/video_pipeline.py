@@ -0,0 +1,339 @@
+"""
+多线程视频处理流水线
+解码 → 推理 → 标注/编码 三个阶段并行执行，阶段之间使用有界队列连接
+
+- 解码线程: cap.read()
+- 推理阶段: 在调用线程中运行模型 (模型只在一个线程中使用)
+- 编码线程: 绘制结果并写入视频
+
+每个阶段都是单生产者 / 单消费者的 FIFO，因此输出帧顺序与输入一致。
+解码和编码的耗时与推理重叠，总耗时接近纯推理耗时。
+
+推理阶段支持批量模式: 攒够 N 帧后一次前向，再按帧顺序分发结果
+(N 可以固定，也可以在运行开始时自动调优)
+
+可选的场景变化门控 (utils/frame_gate.py): 画面没有明显变化的帧不推理，
+直接复用上一次的检测结果
+"""
+
+from typing import Callable, Optional, Union
+import queue
+import statistics
+import threading
+import time
+
+
+# 流结束标记
+_SENTINEL = object()
+
+
+class StageStats:
+    """单个阶段的统计: 处理帧数、忙碌时间、下游队列深度"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.frames = 0
+        self.calls = 0
+        self.busy_time = 0.0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.max_depth = 0
+
+    def record(self, frames: int, seconds: float):
+        """记录一次处理 (批量推理时一次调用包含多帧)"""
+        self.frames += frames
+        self.calls += 1
+        self.busy_time += seconds
+
+    def sample_queue(self, q: queue.Queue):
+        """采样输出队列深度"""
+        depth = q.qsize()
+        self.depth_sum += depth
+        self.depth_samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "calls": self.calls,
+            "busy_time": self.busy_time,
+            # 阶段本身的吞吐 (不含等待时间)
+            "fps": self.frames / self.busy_time if self.busy_time > 0 else 0.0,
+            "queue_mean": self.depth_sum / self.depth_samples if self.depth_samples else 0.0,
+            "queue_max": self.max_depth,
+        }
+
+
+class BatchSizeTuner:
+    """
+    批大小自动调优
+
+    依次用候选批大小运行若干批 (使用真实视频帧，不浪费)，
+    比较每帧平均耗时，选出最快的批大小后固定下来。
+    某个候选明显变慢时提前停止 (更大的批通常只会更慢、更占内存)。
+    """
+
+    def __init__(self, candidates: tuple = (1, 2, 4, 8, 16), trials: int = 3, patience: float = 1.1):
+        """
+        Args:
+            candidates: 候选批大小 (从小到大)
+            trials: 每个候选测量的批数 (第一批视为预热，不计入)
+            patience: 每帧耗时超过当前最优的倍数时停止尝试更大的批
+        """
+        self.candidates = list(candidates)
+        self.trials = max(trials, 2)
+        self.patience = patience
+        self.per_frame = {}
+        self.chosen = None
+        self._idx = 0
+        self._samples = []
+
+    @property
+    def current(self) -> int:
+        """下一批应使用的批大小"""
+        return self.chosen if self.chosen is not None else self.candidates[self._idx]
+
+    def report(self, batch_size: int, seconds: float):
+        """上报一批的耗时 (末尾不满的批不参与调优)"""
+        if self.chosen is not None or batch_size != self.current:
+            return
+
+        self._samples.append(seconds / batch_size)
+        if len(self._samples) < self.trials:
+            return
+
+        self.per_frame[batch_size] = statistics.median(self._samples[1:])
+        self._samples = []
+
+        best = min(self.per_frame, key=self.per_frame.get)
+        self._idx += 1
+        if self._idx >= len(self.candidates) or self.per_frame[batch_size] > self.per_frame[best] * self.patience:
+            self.chosen = best
+
+
+class VideoPipeline:
+    """
+    解码 / 推理 / 编码 三阶段流水线
+
+    Examples:
+        >>> pipeline = VideoPipeline(model, queue_size=8)
+        >>> stats = pipeline.run(cap, writer)
+        >>> print(stats["fps"], stats["stages"]["infer"]["fps"])
+    """
+
+    def __init__(
+        self,
+        model,
+        queue_size: int = 8,
+        annotate: Optional[Callable] = None,
+        batch_size: Union[int, str] = 1,
+        gate=None,
+        **infer_kwargs
+    ):
+        """
+        Args:
+            model: YOLO 模型 (或任何 `model(frames, **kwargs) -> results` 的可调用对象)
+            queue_size: 阶段之间队列的最大长度 (限制内存占用)
+            batch_size: 每次前向的帧数，"auto" 表示运行开始时自动调优
+            gate: 场景变化门控 (如 SceneChangeGate)，`gate.should_infer(frame)` 为 False 时复用上一次结果
+            annotate: 绘制函数 `annotate(frame, result) -> frame`，默认 result.plot(img=frame)
+            **infer_kwargs: 传给模型的推理参数 (conf、imgsz、device 等)
+        """
+        self.model = model
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.gate = gate
+        # 复用的结果属于更早的帧，必须画在当前帧上
+        self.annotate = annotate or (lambda frame, result: result.plot(img=frame))
+        self.infer_kwargs = {"verbose": False, **infer_kwargs}
+
+    # ------------------------------------------
+    # 队列操作 (带停止检查，避免某个阶段出错后其它阶段永久阻塞)
+    # ------------------------------------------
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _SENTINEL
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    # ------------------------------------------
+    # 阶段
+    # ------------------------------------------
+
+    def _decode_loop(self, cap):
+        stats = self._stats["decode"]
+        try:
+            idx = 0
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                stats.record(1, time.perf_counter() - t0)
+
+                if not self._put(self._decoded, (idx, frame)):
+                    break
+                stats.sample_queue(self._decoded)
+                idx += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._decoded, _SENTINEL)
+
+    def _infer_loop(self):
+        # 缓冲区按帧顺序保存 (idx, frame, 是否需要推理)，
+        # 门控跳过的帧要等前面的推理帧出结果后才能复用
+        pending = []
+        num_infer = 0
+        done = False
+        while not done:
+            item = self._get(self._decoded)
+            if item is _SENTINEL:
+                done = True
+            else:
+                idx, frame = item
+                needs_infer = self.gate is None or self.gate.should_infer(frame)
+                pending.append((idx, frame, needs_infer))
+                num_infer += needs_infer
+
+            # 攒够一批，或视频结束时处理剩余的不满一批；
+            # 门控连续跳过时缓冲区的帧数也不超过 max(queue_size, 批大小)，保持内存有界
+            target = self._tuner.current if self._tuner else self.batch_size
+            if pending and (done or num_infer >= target or len(pending) >= max(self.queue_size, target)):
+                if not self._infer_batch(pending):
+                    break
+                pending = []
+                num_infer = 0
+
+    def _infer_batch(self, pending: list) -> bool:
+        """一次前向处理一批帧，并按帧顺序 (含复用帧) 放入编码队列"""
+        stats = self._stats["infer"]
+        frames = [frame for _, frame, needs_infer in pending if needs_infer]
+
+        results = iter(())
+        if frames:
+            t0 = time.perf_counter()
+            results = iter(self.model(frames if len(frames) > 1 else frames[0], **self.infer_kwargs))
+            elapsed = time.perf_counter() - t0
+            stats.record(len(frames), elapsed)
+            if self._tuner:
+                self._tuner.report(len(frames), elapsed)
+
+        for idx, frame, needs_infer in pending:
+            if needs_infer:
+                self._last_result = next(results)
+            if not self._put(self._inferred, (idx, frame, self._last_result)):
+                return False
+            stats.sample_queue(self._inferred)
+        return True
+
+    def _encode_loop(self, writer, on_frame: Optional[Callable]):
+        stats = self._stats["encode"]
+        try:
+            while True:
+                item = self._get(self._inferred)
+                if item is _SENTINEL:
+                    break
+
+                idx, frame, result = item
+                t0 = time.perf_counter()
+                annotated = self.annotate(frame, result)
+                writer.write(annotated)
+                stats.record(1, time.perf_counter() - t0)
+
+                if on_frame is not None:
+                    on_frame(idx + 1)
+        except BaseException as e:
+            self._fail(e)
+
+    # ------------------------------------------
+    # 运行
+    # ------------------------------------------
+
+    def run(self, cap, writer, on_frame: Optional[Callable] = None) -> dict:
+        """
+        处理整个视频流
+
+        Args:
+            cap: 已打开的 cv2.VideoCapture
+            writer: 已打开的 cv2.VideoWriter (或任何有 write(frame) 方法的对象)
+            on_frame: 每写出一帧后调用 `on_frame(已写帧数)` (在编码线程中执行)
+
+        Returns:
+            统计字典: 总帧数、总耗时、整体 FPS、各阶段吞吐与队列深度、瓶颈阶段
+        """
+        self._stop = threading.Event()
+        self._error = None
+        self._decoded = queue.Queue(maxsize=self.queue_size)
+        self._inferred = queue.Queue(maxsize=self.queue_size)
+        self._stats = {name: StageStats(name) for name in ("decode", "infer", "encode")}
+        self._tuner = BatchSizeTuner() if self.batch_size == "auto" else None
+        self._last_result = None
+
+        decoder = threading.Thread(target=self._decode_loop, args=(cap,), name="decode", daemon=True)
+        encoder = threading.Thread(target=self._encode_loop, args=(writer, on_frame), name="encode", daemon=True)
+
+        start = time.perf_counter()
+        decoder.start()
+        encoder.start()
+        try:
+            self._infer_loop()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._inferred, _SENTINEL)
+            decoder.join()
+            encoder.join()
+        wall_time = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+
+        frames = self._stats["encode"].frames
+        stages = {name: s.as_dict() for name, s in self._stats.items()}
+        if self._tuner:
+            # 视频太短、调优未结束时取已测量中最快的
+            tuned = self._tuner.chosen or min(self._tuner.per_frame, key=self._tuner.per_frame.get, default=1)
+        return {
+            "frames": frames,
+            "batch_size": tuned if self._tuner else self.batch_size,
+            "wall_time": wall_time,
+            "fps": frames / wall_time if wall_time > 0 else 0.0,
+            "stages": stages,
+            "bottleneck": max(stages, key=lambda name: stages[name]["busy_time"]),
+            "gate": self.gate.stats() if self.gate is not None else None,
+        }
+
+
+def print_pipeline_stats(stats: dict):
+    """打印流水线统计"""
+    print(f"\n📊 流水线统计 (瓶颈: {stats['bottleneck']}，batch={stats['batch_size']})")
+    print(f"  {'阶段':<8}{'帧数':>8}{'忙碌(s)':>10}{'FPS':>10}{'队列均值':>10}{'队列峰值':>10}")
+    for name, s in stats["stages"].items():
+        print(
+            f"  {name:<8}{s['frames']:>8}{s['busy_time']:>10.2f}{s['fps']:>10.1f}"
+            f"{s['queue_mean']:>10.1f}{s['queue_max']:>10}"
+        )
+    gate = stats.get("gate")
+    if gate:
+        print(
+            f"  🚦 场景门控: 推理 {gate['inferred']} 帧，跳过 {gate['skipped']} 帧 "
+            f"({gate['skip_ratio']:.1%})，强制刷新 {gate['forced']} 次"
+        )
@@ -0,0 +1,233 @@
+"""
+区域空间索引: 栅格化的区域标签图
+每个点都和每个多边形做射线法测试，代价是 点数 × 所有多边形的边数，区域一多就成了瓶颈。
+
+这里把画面划成 cell × cell 像素的网格，预先把每个区域栅格化到网格上，
+每个格子用位掩码 (每 64 个区域一个 uint64) 记录:
+- inside: 完全落在区域内部的格子
+- boundary: 区域边界经过的格子
+
+查询时点 → 格子是 O(1) 的数组索引。只有落在边界格子里的点才对它的候选区域逐对做精确的射线法测试，
+所以结果和逐个多边形测试完全一致。区域修改后可以单独重建某一个区域 (update_zone)，
+新索引构建完成后整体替换，处理循环中的查询不会读到一半更新的状态。
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+_SHIFT = 4  # fillPoly / polylines 的亚像素精度 (2^4)
+_PAD = 2    # 栅格化时画布四周多留的格子数
+
+
+def _padded_edges(polygons: list) -> np.ndarray:
+    """
+    所有多边形的边，补齐到相同边数: (Z, K, 2, 2)
+    补齐用的是退化边 (起点 = 终点)，射线法中永远不会与水平射线相交
+    """
+    max_edges = max((len(p) for p in polygons), default=0)
+    edges = np.zeros((len(polygons), max_edges, 2, 2))
+    for z, poly in enumerate(polygons):
+        edges[z, :len(poly)] = np.stack([poly, np.roll(poly, -1, axis=0)], axis=1)
+        edges[z, len(poly):] = poly[0]
+    return edges
+
+
+def _points_in_zones(points: np.ndarray, zones: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    逐对精确测试: 点 points[i] 是否在多边形 zones[i] 内 (射线法)
+
+    Args:
+        points: (P, 2)
+        zones: (P,) 区域索引
+        edges: (Z, K, 2, 2) _padded_edges 的结果
+
+    Returns:
+        (P,) bool
+    """
+    e = edges[zones]                                  # (P, K, 2, 2)
+    px, py = points[:, 0:1], points[:, 1:2]           # (P, 1)
+    x0, y0, x1, y1 = e[..., 0, 0], e[..., 0, 1], e[..., 1, 0], e[..., 1, 1]
+    straddle = (y0 > py) != (y1 > py)
+    dy = np.where(y1 == y0, 1.0, y1 - y0)
+    x_at = x0 + (py - y0) * (x1 - x0) / dy
+    return (straddle & (px < x_at)).sum(axis=1) % 2 == 1
+
+
+def _unpack(words: np.ndarray, num_zones: int) -> np.ndarray:
+    """(N, W) uint64 位掩码 → (N, Z) bool"""
+    bits = words.view(np.uint8).reshape(len(words), -1)
+    return np.unpackbits(bits, axis=1, bitorder="little")[:, :num_zones].astype(bool)
+
+
+class _IndexState:
+    """一次构建的完整索引 (整体替换，不原地修改)"""
+
+    def __init__(self, polygons: list, inside: np.ndarray, boundary: np.ndarray, frame_shape: Tuple[int, int]):
+        self.polygons = polygons
+        self.inside = inside
+        self.boundary = boundary
+        self.edges = _padded_edges(polygons)
+        # 超出画面的区域: 画面外的点只需要和它们做精确测试
+        h, w = frame_shape
+        self.beyond_frame = np.array(
+            [(p.min(axis=0) < 0).any() or p[:, 0].max() >= w or p[:, 1].max() >= h for p in polygons], dtype=bool
+        )
+
+
+class ZoneIndex:
+    """
+    区域索引: 点 → 所在区域
+
+    Examples:
+        >>> index = ZoneIndex([poly_a, poly_b, poly_c], frame.shape, cell=8)
+        >>> inside = index.lookup(det.centers)       # (N, Z) bool
+        >>> zone = index.first_zone(foot_points)     # (N,) 第一个命中的区域，-1 表示不在任何区域
+        >>> index.update_zone(1, new_poly_b)         # 运行时修改某个区域
+    """
+
+    def __init__(self, polygons: Sequence, frame_shape: Tuple[int, int], cell: int = 8):
+        """
+        Args:
+            polygons: 区域多边形列表，每个为 (K, 2) 像素坐标
+            frame_shape: 画面尺寸 (h, w, ...)
+            cell: 网格大小 (像素)。越小边界格子越少 (需要精确测试的点越少)，但索引占用内存越大
+        """
+        self.frame_shape = tuple(frame_shape[:2])
+        self.cell = cell
+        h, w = self.frame_shape
+        self.grid_shape = (int(np.ceil(h / cell)), int(np.ceil(w / cell)))
+        self.grid_frame = (self.grid_shape[0] * cell, self.grid_shape[1] * cell)  # 网格覆盖的像素范围
+        self.exact_tests = 0
+        self.set_zones(polygons)
+
+    @property
+    def num_zones(self) -> int:
+        return len(self._state.polygons)
+
+    @property
+    def polygons(self) -> list:
+        return self._state.polygons
+
+    def _rasterize(self, poly: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """一个多边形 → (inside, boundary) 两张网格掩码"""
+        gh, gw = self.grid_shape
+        # 网格坐标: 格子 (i, j) 覆盖像素 [j*cell, (j+1)*cell)，格子中心对应整数坐标。
+        # 四周留 _PAD 格: OpenCV 会先把细线裁剪到图像内再加粗，紧贴画面外侧的边否则会被漏画
+        pts = np.round((poly / self.cell - 0.5 + _PAD) * (1 << _SHIFT)).astype(np.int32)
+        canvas = (gh + 2 * _PAD, gw + 2 * _PAD)
+
+        filled = np.zeros(canvas, dtype=np.uint8)
+        cv2.fillPoly(filled, [pts], 1, lineType=cv2.LINE_8, shift=_SHIFT)
+
+        # 边界经过的格子 (线宽 3 保守覆盖，宁多勿漏: 多出的格子只是多做精确测试)
+        boundary = np.zeros(canvas, dtype=np.uint8)
+        cv2.polylines(boundary, [pts], True, 1, thickness=3, lineType=cv2.LINE_8, shift=_SHIFT)
+
+        crop = (slice(_PAD, _PAD + gh), slice(_PAD, _PAD + gw))
+        boundary = boundary[crop].astype(bool)
+        return filled[crop].astype(bool) & ~boundary, boundary
+
+    def _build(self, polygons: list) -> _IndexState:
+        num_words = max((len(polygons) + 63) // 64, 1)
+        inside = np.zeros(self.grid_shape + (num_words,), dtype=np.uint64)
+        boundary = np.zeros_like(inside)
+        for z, poly in enumerate(polygons):
+            zone_inside, zone_boundary = self._rasterize(poly)
+            bit = np.uint64(1) << np.uint64(z % 64)
+            inside[..., z // 64][zone_inside] |= bit
+            boundary[..., z // 64][zone_boundary] |= bit
+        return _IndexState(polygons, inside, boundary, self.grid_frame)
+
+    def set_zones(self, polygons: Sequence):
+        """重建全部区域 (构建完成后整体替换)"""
+        polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polygons]
+        self._state = self._build(polygons)
+
+    def update_zone(self, zone: int, polygon: Optional[Sequence] = None):
+        """
+        修改或新增一个区域，只重新栅格化这一个区域
+
+        Args:
+            zone: 区域索引，等于 num_zones 时表示新增
+            polygon: 新的多边形
+        """
+        state = self._state
+        polygons = list(state.polygons)
+        poly = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if zone == len(polygons):
+            polygons.append(poly)
+        elif 0 <= zone < len(polygons):
+            polygons[zone] = poly
+        else:
+            raise IndexError(f"区域索引越界: {zone} (当前 {len(polygons)} 个区域)")
+
+        num_words = max((len(polygons) + 63) // 64, 1)
+        inside, boundary = state.inside.copy(), state.boundary.copy()
+        if num_words > inside.shape[-1]:
+            pad = [(0, 0), (0, 0), (0, num_words - inside.shape[-1])]
+            inside, boundary = np.pad(inside, pad), np.pad(boundary, pad)
+
+        word, bit = zone // 64, np.uint64(1) << np.uint64(zone % 64)
+        inside[..., word] &= ~bit
+        boundary[..., word] &= ~bit
+        zone_inside, zone_boundary = self._rasterize(poly)
+        inside[..., word][zone_inside] |= bit
+        boundary[..., word][zone_boundary] |= bit
+        self._state = _IndexState(polygons, inside, boundary, self.grid_frame)
+
+    def lookup(self, points: np.ndarray) -> np.ndarray:
+        """
+        点所在的区域
+
+        Args:
+            points: (N, 2) 像素坐标 (如框中心 / 底边中点)
+
+        Returns:
+            (N, Z) bool，与对每个多边形做射线法测试的结果一致
+        """
+        state = self._state  # 取一次引用，查询期间不受 update_zone 影响
+        num_zones = len(state.polygons)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0 or num_zones == 0:
+            return np.zeros((len(points), num_zones), dtype=bool)
+
+        gh, gw = self.grid_shape
+        gx = np.clip((points[:, 0] // self.cell).astype(np.int64), 0, gw - 1)
+        gy = np.clip((points[:, 1] // self.cell).astype(np.int64), 0, gh - 1)
+        result = _unpack(state.inside[gy, gx], num_zones)
+
+        # 画面外的点: 网格只覆盖画面，交给精确测试
+        outside = (points[:, 0] < 0) | (points[:, 1] < 0) | (points[:, 0] >= self.grid_frame[1]) | (points[:, 1] >= self.grid_frame[0])
+        result[outside] = False
+        boundary_words = state.boundary[gy, gx]
+        need = boundary_words.any(axis=1) | outside
+        if need.any():
+            # 只对 (点, 候选区域) 对做精确测试
+            need_idx = np.nonzero(need)[0]
+            candidates = _unpack(boundary_words[need], num_zones)
+            candidates[outside[need]] = state.beyond_frame
+            p_idx, z_idx = np.nonzero(candidates)
+            inside = _points_in_zones(points[need_idx[p_idx]], z_idx, state.edges)
+            result[need_idx[p_idx[inside]], z_idx[inside]] = True
+            self.exact_tests += len(p_idx)
+        return result
+
+    def first_zone(self, points: np.ndarray) -> np.ndarray:
+        """(N,) 每个点命中的第一个区域索引，不在任何区域内为 -1"""
+        inside = self.lookup(points)
+        if inside.shape[1] == 0:
+            return np.full(len(inside), -1, dtype=np.int64)
+        return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+    def label_map(self) -> np.ndarray:
+        """(gh, gw) 网格标签图: 每个格子所在的第一个区域 (含边界格子)，-1 表示没有 (可视化 / 调试用)"""
+        state = self._state
+        words = state.inside | state.boundary
+        gh, gw = self.grid_shape
+        bits = _unpack(words.reshape(gh * gw, -1), len(state.polygons))
+        if bits.shape[1] == 0:
+            return np.full((gh, gw), -1, dtype=np.int64)
+        return np.where(bits.any(axis=1), bits.argmax(axis=1), -1).reshape(gh, gw)